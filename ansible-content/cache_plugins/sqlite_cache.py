@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible cache plugin: persistent fact and inventory cache in a local SQLite file.
+
+With the memory cache, every ansible-playbook run (step1, step5 and step7 are
+often separate runs) started without facts and re-queried NetBox for the whole
+inventory. This cache keeps both in a SQLite file on the controller. Each entry
+carries its own expiry, so a host's facts age from the time that host was last
+gathered rather than with the whole cache. Large values such as
+ansible_network_resources are stored zlib-compressed. The database runs in WAL
+mode, so concurrent ansible-playbook runs read while one writes and writers
+wait for each other instead of failing.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: sqlite_cache
+short_description: Facts and inventory in a local SQLite file
+description:
+  - Stores cache entries in a SQLite database, one row per key (host name for facts).
+  - Each entry expires C(_timeout) seconds after it was written; expired entries are
+    ignored and removed. A C(_timeout) of 0 keeps entries until they are flushed.
+  - Values of at least C(compress_min_bytes) bytes of JSON are stored zlib-compressed.
+  - Safe for concurrent use by several ansible-playbook runs and forked workers
+    (WAL journal, per-process connections, writers wait up to C(busy_timeout)).
+options:
+  _uri:
+    required: true
+    description: Path of the SQLite database file; its directory is created when missing.
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+    ini:
+      - key: fact_caching_connection
+        section: defaults
+    type: path
+  _prefix:
+    description: Prefix of the keys of this cache, so several caches can share one database.
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+    ini:
+      - key: fact_caching_prefix
+        section: defaults
+  _timeout:
+    default: 86400
+    description: Seconds an entry stays valid after it was written (0 = never expires).
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+    ini:
+      - key: fact_caching_timeout
+        section: defaults
+    type: integer
+  compress_min_bytes:
+    default: 4096
+    description: Values whose JSON is at least this many bytes are stored zlib-compressed.
+    env:
+      - name: ANSIBLE_SQLITE_CACHE_COMPRESS_MIN_BYTES
+    ini:
+      - key: compress_min_bytes
+        section: sqlite_cache
+    type: integer
+  busy_timeout:
+    default: 30
+    description: Seconds a write waits for a concurrent writer before failing.
+    env:
+      - name: ANSIBLE_SQLITE_CACHE_BUSY_TIMEOUT
+    ini:
+      - key: busy_timeout
+        section: sqlite_cache
+    type: integer
+author: Network Operations
+'''
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.parsing.ajson import AnsibleJSONDecoder, AnsibleJSONEncoder
+from ansible.plugins.cache import BaseCacheModule
+from ansible.utils.display import Display
+
+display = Display()
+
+SCHEMA_VERSION = 1
+CODEC_JSON = 0
+CODEC_ZLIB_JSON = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    codec INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    expires REAL
+)
+'''
+
+
+def encode_value(value, compress_min_bytes):
+    """JSON-encode value, zlib-compressed when it is compress_min_bytes or larger."""
+    data = json.dumps(value, cls=AnsibleJSONEncoder, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    if len(data) >= compress_min_bytes:
+        return zlib.compress(data, 6), CODEC_ZLIB_JSON
+    return data, CODEC_JSON
+
+
+def decode_value(data, codec):
+    """Inverse of encode_value."""
+    data = bytes(data)
+    if codec == CODEC_ZLIB_JSON:
+        data = zlib.decompress(data)
+    return json.loads(data.decode('utf-8'), cls=AnsibleJSONDecoder)
+
+
+class CacheModule(BaseCacheModule):
+    """
+    A caching module backed by a SQLite database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CacheModule, self).__init__(*args, **kwargs)
+        path = self.get_option('_uri')
+        if not path:
+            raise AnsibleError("error, 'sqlite_cache' cache plugin requires the 'fact_caching_connection' "
+                               "config option to be set (to a database file path)")
+        self._path = os.path.expanduser(os.path.expandvars(path))
+        self._timeout = int(self.get_option('_timeout') or 0)
+        self._prefix = self.get_option('_prefix') or ''
+        self._compress_min_bytes = int(self.get_option('compress_min_bytes'))
+        self._busy_timeout = int(self.get_option('busy_timeout'))
+        self._conn = None
+        self._conn_pid = None
+        self._cache = {}
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            self._connection()
+        except (OSError, sqlite3.Error) as e:
+            raise AnsibleError("error in 'sqlite_cache' cache plugin while opening %s: %s"
+                               % (self._path, to_native(e)))
+
+    def _connection(self):
+        # Connections must not cross a fork; each worker process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                with conn:
+                    conn.execute('DROP TABLE IF EXISTS cache')
+                    conn.execute(SCHEMA)
+                    conn.execute('PRAGMA user_version=%d' % SCHEMA_VERSION)
+            with conn:
+                conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            self._conn = conn
+            self._conn_pid = os.getpid()
+            self._cache = {}
+        return self._conn
+
+    def _key(self, key):
+        return self._prefix + key
+
+    def _execute(self, sql, params=()):
+        try:
+            conn = self._connection()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise AnsibleError("error in 'sqlite_cache' cache plugin (%s): %s" % (self._path, to_native(e)))
+
+    def get(self, key):
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached is not None and (cached[1] is None or cached[1] > now):
+            return cached[0]
+
+        rows = self._execute('SELECT value, codec, expires FROM cache WHERE key = ?', (self._key(key),))
+        if not rows or (rows[0][2] is not None and rows[0][2] <= now):
+            self._cache.pop(key, None)
+            raise KeyError(key)
+        try:
+            value = decode_value(rows[0][0], rows[0][1])
+        except (ValueError, zlib.error) as e:
+            display.warning("error in 'sqlite_cache' cache plugin while reading %s, discarding it: %s"
+                            % (key, to_native(e)))
+            self.delete(key)
+            raise KeyError(key)
+        self._cache[key] = (value, rows[0][2])
+        return value
+
+    def set(self, key, value):
+        data, codec = encode_value(value, self._compress_min_bytes)
+        now = time.time()
+        expires = now + self._timeout if self._timeout > 0 else None
+        self._execute('INSERT OR REPLACE INTO cache (key, value, codec, updated, expires) VALUES (?, ?, ?, ?, ?)',
+                      (self._key(key), sqlite3.Binary(data), codec, now, expires))
+        self._cache[key] = (value, expires)
+
+    def keys(self):
+        rows = self._execute('SELECT key FROM cache WHERE (expires IS NULL OR expires > ?) AND substr(key, 1, ?) = ?',
+                             (time.time(), len(self._prefix), self._prefix))
+        return [row[0][len(self._prefix):] for row in rows]
+
+    def contains(self, key):
+        rows = self._execute('SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                             (self._key(key), time.time()))
+        return bool(rows)
+
+    def delete(self, key):
+        self._cache.pop(key, None)
+        self._execute('DELETE FROM cache WHERE key = ?', (self._key(key),))
+
+    def flush(self):
+        self._cache = {}
+        self._execute('DELETE FROM cache WHERE substr(key, 1, ?) = ?', (len(self._prefix), self._prefix))
+
+    def copy(self):
+        ret = dict()
+        for key in self.keys():
+            try:
+                ret[key] = self.get(key)
+            except KeyError:
+                pass
+        return ret
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_conn_pid'] = None
+        return state
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Custom Ansible filters for resumable, chunk-verified firmware transfers.
+
+The firmware_chunks module (roles/image-validation) splits an image into
+chunk files with per-chunk digests. These filters match that manifest
+against device output, so a retried transfer only sends the chunks that
+are not already on the device with the expected content.
+"""
+
+import re
+
+DIGEST_LENGTHS = {
+    'md5': 32,
+    'sha256': 64,
+    'sha512': 128,
+}
+
+
+def landed_chunks(chunks, dir_output):
+    """
+    Select the chunks listed in a device directory listing with their full size.
+
+    A listing line matches a chunk when its last field is the chunk name and one
+    of its fields is the chunk size in bytes. This covers both the NX-OS
+    ("<size> <date> <name>") and the IOS-XE ("<idx> <perm> <size> <date> <name>")
+    dir formats. Partially written chunks have a smaller size and are not selected.
+
+    Args:
+        chunks (list): Chunk dicts from the firmware_chunks module (name, size, ...)
+        dir_output (str): Output of "dir bootflash:" on the device
+
+    Returns:
+        list: The chunks present on the device, in manifest order
+
+    Examples:
+        >>> chunks = [{'name': 'a.bin.part0001', 'size': 4}, {'name': 'a.bin.part0002', 'size': 4}]
+        >>> [c['name'] for c in landed_chunks(chunks, '   4  Jan 01 00:00:00 2024  a.bin.part0001\\n'
+        ...                                              '   2  Jan 01 00:00:00 2024  a.bin.part0002')]
+        ['a.bin.part0001']
+
+    Usage in Ansible playbooks:
+        present: "{{ firmware_chunk_manifest.chunks | landed_chunks(dir_result.stdout[0]) }}"
+    """
+    listed = {}
+    for line in (dir_output or '').splitlines():
+        fields = line.split()
+        if fields:
+            listed.setdefault(fields[-1], set()).update(fields[:-1])
+    return [chunk for chunk in chunks or [] if str(chunk['size']) in listed.get(chunk['name'], ())]
+
+
+def verified_chunks(chunks, digest_outputs, algorithm='sha512'):
+    """
+    Select the chunks whose on-device digest matches the manifest.
+
+    Args:
+        chunks (list): Chunk dicts from the firmware_chunks module
+        digest_outputs (list): Digest command outputs, one per chunk in the same
+            order ("show file ... sha512sum" on NX-OS, "verify /md5 ..." on IOS-XE)
+        algorithm (str): Manifest digest to compare against ('sha512' or 'md5')
+
+    Returns:
+        list: The chunks that do not need to be sent again
+
+    Examples:
+        >>> verified_chunks([{'name': 'a', 'md5': 'd41d8cd98f00b204e9800998ecf8427e'}],
+        ...                 ['verify /md5 (bootflash:a) = d41d8cd98f00b204e9800998ecf8427e'], 'md5')
+        [{'name': 'a', 'md5': 'd41d8cd98f00b204e9800998ecf8427e'}]
+
+    Usage in Ansible playbooks:
+        verified: "{{ present | verified_chunks(digest_result.stdout, 'sha512') }}"
+    """
+    pattern = re.compile(r'\b[0-9a-f]{%d}\b' % DIGEST_LENGTHS[algorithm])
+    verified = []
+    for chunk, output in zip(chunks or [], digest_outputs or []):
+        digests = pattern.findall(str(output).lower())
+        # The digest is printed last (after the file name on IOS-XE)
+        if digests and digests[-1] == chunk[algorithm]:
+            verified.append(chunk)
+    return verified
+
+
+def chunks_to_send(chunks, verified):
+    """
+    Select the chunks that still have to be transferred.
+
+    Args:
+        chunks (list): All chunk dicts from the firmware_chunks module
+        verified (list): Chunks already on the device with a matching digest
+
+    Returns:
+        list: Missing or corrupt chunks, in manifest order
+
+    Examples:
+        >>> chunks_to_send([{'name': 'a'}, {'name': 'b'}], [{'name': 'a'}])
+        [{'name': 'b'}]
+    """
+    done = set(chunk['name'] for chunk in verified or [])
+    return [chunk for chunk in chunks or [] if chunk['name'] not in done]
+
+
+class FilterModule:
+    """Ansible filter plugin class."""
+
+    def filters(self):
+        """Return available filters."""
+        return {
+            'landed_chunks': landed_chunks,
+            'verified_chunks': verified_chunks,
+            'chunks_to_send': chunks_to_send,
+        }
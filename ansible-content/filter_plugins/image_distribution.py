@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Custom Ansible filters for site-local firmware image distribution.
+
+Pushing the same image from the controller to every device of a site sends it
+over the site's WAN link once per device. With image_distribution_mode
+'site_staging', the image is pushed once to a staging host at the site and the
+site's devices are then pushed from there over the local network.
+"""
+
+from ansible.module_utils.parsing.convert_bool import boolean
+
+STAGING_PLATFORMS = ('nxos', 'ios')
+
+
+def site_staging_plan(hosts, hostvars, candidates, min_devices=2):
+    """
+    Pick one staging host per site for the target devices.
+
+    Devices are grouped by their site_slug. A site uses staging when it has at
+    least min_devices NX-OS or IOS-XE target devices and an inventory host with
+    image_staging_host set at the same site_slug (the first by name when there are
+    several). Other devices keep the direct push from the controller.
+
+    Args:
+        hosts (list): Target device names (e.g. query('inventory_hostnames', target_hosts))
+        hostvars (dict): Ansible hostvars
+        candidates (list): Hosts that may be staging hosts (e.g. groups['all'])
+        min_devices (int): Minimum devices at a site for staging to pay off
+
+    Returns:
+        dict: site_slug -> {'staging_host': name, 'devices': [names]}
+
+    Examples:
+        >>> hostvars = {
+        ...     'sw1': {'site_slug': 'lon', 'platform': 'nxos'},
+        ...     'sw2': {'site_slug': 'lon', 'platform': 'ios'},
+        ...     'sw3': {'site_slug': 'par', 'platform': 'nxos'},
+        ...     'stg-lon': {'site_slug': 'lon', 'image_staging_host': True},
+        ... }
+        >>> site_staging_plan(['sw1', 'sw2', 'sw3'], hostvars, list(hostvars))
+        {'lon': {'staging_host': 'stg-lon', 'devices': ['sw1', 'sw2']}}
+
+    Usage in Ansible playbooks:
+        site_image_staging: >-
+          {{ query('inventory_hostnames', target_hosts)
+             | site_staging_plan(hostvars, groups['all'], image_staging_min_devices) }}
+    """
+    staging = {}
+    for name in sorted(candidates or []):
+        host_vars = hostvars.get(name, {})
+        site = host_vars.get('site_slug')
+        if site and boolean(host_vars.get('image_staging_host', False), strict=False):
+            staging.setdefault(site, name)
+
+    sites = {}
+    for name in sorted(hosts or []):
+        host_vars = hostvars.get(name, {})
+        site = host_vars.get('site_slug')
+        if site and host_vars.get('platform') in STAGING_PLATFORMS and name != staging.get(site):
+            sites.setdefault(site, []).append(name)
+
+    return {
+        site: {'staging_host': staging[site], 'devices': devices}
+        for site, devices in sorted(sites.items())
+        if site in staging and len(devices) >= max(int(min_devices), 1)
+    }
+
+
+class FilterModule:
+    """Ansible filter plugin class."""
+
+    def filters(self):
+        """Return available filters."""
+        return {
+            'site_staging_plan': site_staging_plan,
+        }
@@ -6,6 +6,7 @@ This module provides filters to simplify platform-specific conditional logic,
 recursive data operations, and proper JSON formatting in playbooks and roles.
 """
 
+import gc
 import json
 
 
@@ -62,19 +63,176 @@ def is_platform(network_os, platform_name):
     return network_os.lower() in [name.lower() for name in valid_names]
 
 
+class _ExclusionSpec:
+    """
+    Precompiled exclusion spec used by remove_excluded_fields_recursive.
+
+    Plain field names are kept in a frozenset and match at any depth.
+    Dotted names are path patterns matched from the top of the data: each
+    segment matches one dict key or list index, '*' matches any single
+    segment and '**' matches any number of segments (including none).
+
+    Path matching runs as a small NFA. A state is a frozenset of
+    (pattern index, segment position) pairs; transitions are memoized in a
+    per-state table so repeated NX-OS row layouts cost one dict lookup per key.
+    """
+
+    __slots__ = ('names', 'patterns', 'initial', '_transitions')
+
+    def __init__(self, excluded_fields):
+        names = set()
+        patterns = []
+        for field in excluded_fields:
+            if isinstance(field, str) and '.' in field:
+                patterns.append(tuple(field.split('.')))
+            else:
+                names.add(field)
+        self.names = frozenset(names)
+        self.patterns = tuple(patterns)
+        self._transitions = {}
+        self.initial = self._closure((index, 0) for index in range(len(self.patterns)))
+
+    def _closure(self, states):
+        """Expand '**' positions, which may also match zero segments."""
+        pending = list(states)
+        closed = set()
+        while pending:
+            state = pending.pop()
+            if state in closed:
+                continue
+            closed.add(state)
+            index, position = state
+            pattern = self.patterns[index]
+            if position < len(pattern) and pattern[position] == '**':
+                pending.append((index, position + 1))
+        return frozenset(closed)
+
+    def step(self, states, key):
+        """
+        Advance a container's path state to one of its keys or list indices.
+
+        Returns:
+            (excluded, child_states) - excluded is True when a path pattern
+            ends at key, so the key is dropped together with its subtree
+        """
+        table = self.table(states)
+        transition = table.get(key)
+        if transition is None:
+            segment_key = key if isinstance(key, str) else str(key)
+            advanced = []
+            for index, position in states:
+                pattern = self.patterns[index]
+                if position >= len(pattern):
+                    continue
+                segment = pattern[position]
+                if segment == '**':
+                    advanced.append((index, position))
+                elif segment == '*' or segment == segment_key:
+                    advanced.append((index, position + 1))
+            child_states = self._closure(advanced)
+            excluded = any(position == len(self.patterns[index]) for index, position in child_states)
+            transition = (excluded, child_states)
+            table[key] = transition
+        return transition
+
+    def table(self, states):
+        """Return the memoized key -> (excluded, child_states) table for states."""
+        table = self._transitions.get(states)
+        if table is None:
+            table = self._transitions[states] = {}
+        return table
+
+
+_EXCLUSION_SPEC_CACHE = {}
+
+
+def _compile_exclusions(excluded_fields):
+    """Return the cached _ExclusionSpec for a field name or list of field names."""
+    if not isinstance(excluded_fields, (list, tuple)):
+        excluded_fields = [excluded_fields]
+    cache_key = tuple(excluded_fields)
+    spec = _EXCLUSION_SPEC_CACHE.get(cache_key)
+    if spec is None:
+        spec = _EXCLUSION_SPEC_CACHE[cache_key] = _ExclusionSpec(cache_key)
+    return spec
+
+
+def _strip_excluded(data, spec, states):
+    """
+    Copy data without the fields excluded by spec, using an explicit stack.
+
+    Args:
+        data: The data structure to filter (dict, list, or primitive)
+        spec: Compiled _ExclusionSpec
+        states: Path state of data itself (spec.initial for a document root)
+
+    Returns:
+        Filtered copy of data; primitives are returned as-is
+    """
+    if isinstance(data, dict):
+        root = {}
+    elif isinstance(data, list):
+        root = []
+    else:
+        return data
+
+    names = spec.names
+    step = spec.step
+    stack = [(data, root, states)]
+    # The copy allocates one container per input container; pause the cyclic
+    # garbage collector so it does not rescan the growing tree on every pass
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while stack:
+            source, target, states = stack.pop()
+            is_dict = isinstance(source, dict)
+            transitions = spec.table(states) if states else None
+            for key, value in (source.items() if is_dict else enumerate(source)):
+                if is_dict and key in names:
+                    continue
+                value_states = states
+                if states:
+                    excluded, value_states = transitions.get(key) or step(states, key)
+                    if excluded:
+                        continue
+                if isinstance(value, dict):
+                    value_copy = {}
+                    stack.append((value, value_copy, value_states))
+                elif isinstance(value, list):
+                    value_copy = []
+                    stack.append((value, value_copy, value_states))
+                else:
+                    value_copy = value
+                if is_dict:
+                    target[key] = value_copy
+                else:
+                    target.append(value_copy)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return root
+
+
 def remove_excluded_fields_recursive(data, excluded_fields):
     """
     Recursively remove excluded fields from data at all nesting levels.
 
-    Handles dictionaries, lists, and nested structures. Removes specified
-    fields from any dictionary at any depth in the data structure.
+    Handles dictionaries, lists, and nested structures. Plain field names are
+    removed from any dictionary at any depth. Dotted names are path-qualified
+    and only match at that path: each segment is a dict key or list index,
+    '*' matches any single segment and '**' any number of segments.
+
+    The exclusion spec is compiled once per distinct excluded_fields and the
+    walk uses an explicit stack, so deeply nested tables do not hit the
+    Python recursion limit.
 
     Args:
         data: The data structure to filter (dict, list, or primitive)
-        excluded_fields: List of field names to remove at any level
+        excluded_fields: Field name or list of field names / dotted paths to remove
 
     Returns:
-        The filtered data structure with excluded fields removed at all levels
+        The filtered data structure with excluded fields removed
 
     Examples:
         >>> data = {'name': 'test', 'age': 30, 'nested': {'time': '2025-01-01', 'value': 42}}
@@ -84,23 +242,119 @@ def remove_excluded_fields_recursive(data, excluded_fields):
         >>> data = [{'id': 1, 'time': '2025-01-01'}, {'id': 2, 'time': '2025-01-02'}]
         >>> remove_excluded_fields_recursive(data, ['time'])
         [{'id': 1}, {'id': 2}]
+
+        >>> data = {'TABLE_vrf': {'ROW_vrf': [{'uptime': 'P1D', 'TABLE_x': {'uptime': 'P2D'}}]}}
+        >>> remove_excluded_fields_recursive(data, ['TABLE_vrf.ROW_vrf.*.uptime'])
+        {'TABLE_vrf': {'ROW_vrf': [{'TABLE_x': {'uptime': 'P2D'}}]}}
     """
-    if not isinstance(excluded_fields, (list, tuple)):
-        excluded_fields = [excluded_fields]
+    spec = _compile_exclusions(excluded_fields)
+    return _strip_excluded(data, spec, spec.initial)
+
 
-    def _remove_recursive(obj):
-        """Inner recursive function."""
-        if isinstance(obj, dict):
-            # Remove excluded keys and recursively process values
-            return {k: _remove_recursive(v) for k, v in obj.items() if k not in excluded_fields}
-        elif isinstance(obj, list):
-            # Recursively process each list item
-            return [_remove_recursive(item) for item in obj]
+def _canonical_key(obj):
+    """
+    Build a hashable canonical form of a nested data structure.
+
+    Two structures produce equal keys exactly when they compare equal with
+    ``==``, so the key can stand in for the structure in sets and dicts.
+    Dict key order is ignored, list order is preserved, and dicts/lists are
+    tagged so a dict never collides with a list of its items.
+
+    Args:
+        obj: The data structure to canonicalize (dict, list, or primitive)
+
+    Returns:
+        A hashable representation of obj
+
+    Raises:
+        TypeError: If obj contains a value that cannot be hashed
+    """
+    if isinstance(obj, dict):
+        try:
+            # Fast path: flat dicts of scalars (the common ARP/MAC row shape)
+            return (dict, frozenset(obj.items()))
+        except TypeError:
+            pass
+    elif not isinstance(obj, list):
+        hash(obj)
+        return obj
+
+    # Explicit stack of [node, remaining children, child keys, pending dict key]
+    # so deeply nested data does not hit the Python recursion limit
+    stack = [[obj, iter(obj.items()) if isinstance(obj, dict) else iter(obj), [], None]]
+    while True:
+        frame = stack[-1]
+        node, children, parts = frame[0], frame[1], frame[2]
+        is_dict = isinstance(node, dict)
+        for child in children:
+            name, value = child if is_dict else (None, child)
+            if isinstance(value, dict):
+                try:
+                    key = (dict, frozenset(value.items()))
+                except TypeError:
+                    frame[3] = name
+                    stack.append([value, iter(value.items()), [], None])
+                    break
+            elif isinstance(value, list):
+                frame[3] = name
+                stack.append([value, iter(value), [], None])
+                break
+            else:
+                hash(value)
+                key = value
+            parts.append((name, key) if is_dict else key)
         else:
-            # Return primitives as-is
-            return obj
+            stack.pop()
+            key = (dict, frozenset(parts)) if is_dict else (list, tuple(parts))
+            if not stack:
+                return key
+            parent = stack[-1]
+            parent[2].append((parent[3], key) if isinstance(parent[0], dict) else key)
+
 
-    return _remove_recursive(data)
+def _list_difference_indexed(data1, data2):
+    """
+    Return items of data1 that are not present in data2, preserving order.
+
+    Indexes data2 by canonical key so each membership test is O(1), making
+    the whole difference O(n + m) instead of O(n * m). Items whose canonical
+    key cannot be built are compared with a linear scan as before.
+
+    Args:
+        data1: List of items to filter
+        data2: List of items to compare against
+
+    Returns:
+        List of items from data1 (in original order, duplicates kept) that
+        are not equal to any item in data2
+    """
+    # Building the index allocates one key per item; pause the cyclic garbage
+    # collector so it does not rescan the (acyclic) baseline on every gen0 pass
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        index = set()
+        unhashable = []
+        for item2 in data2:
+            try:
+                index.add(_canonical_key(item2))
+            except TypeError:
+                unhashable.append(item2)
+
+        result = []
+        for item1 in data1:
+            try:
+                if _canonical_key(item1) in index:
+                    continue
+            except TypeError:
+                pass
+            if unhashable and item1 in unhashable:
+                continue
+            result.append(item1)
+        return result
+    finally:
+        if gc_was_enabled:
+            gc.enable()
 
 
 def difference_recursive(data1, data2):
@@ -109,6 +363,8 @@ def difference_recursive(data1, data2):
 
     Compares nested dictionaries and lists recursively. Returns items/values
     that exist in data1 but not in data2, handling nested structures.
+    Lists of dicts are diffed through a hash index of data2, so large ARP/MAC
+    tables are compared in linear time while keeping data1's order.
 
     Args:
         data1: The first data structure
@@ -158,16 +414,7 @@ def difference_recursive(data1, data2):
         # or compare dict items recursively
         if data1 and isinstance(data1[0], dict) and data2 and isinstance(data2[0], dict):
             # List of dicts: find dicts in data1 that aren't in data2
-            result = []
-            for item1 in data1:
-                found = False
-                for item2 in data2:
-                    if item1 == item2:
-                        found = True
-                        break
-                if not found:
-                    result.append(item1)
-            return result
+            return _list_difference_indexed(data1, data2)
         else:
             # List of primitives: use standard set difference
             try:
@@ -177,13 +424,297 @@ def difference_recursive(data1, data2):
                 return [list(x) if isinstance(x, tuple) else x for x in diff]
             except TypeError:
                 # Fallback for unhashable types
-                return [item for item in data1 if item not in data2]
+                return _list_difference_indexed(data1, data2)
 
     else:
         # For non-dict/list types, return data1 if different from data2
         return data1 if data1 != data2 else []
 
 
+def _keyed_entries(data, key_fields, excluded_fields=()):
+    """
+    Flatten a nested show-command table into identity-keyed entries.
+
+    Walks NX-OS style TABLE_x/ROW_x hierarchies (or any nesting of dicts and
+    lists). Scalar fields of every dict are inherited by its descendants, so a
+    row deep in the tree can be identified by fields held by its ancestors
+    (e.g. VRF name on ROW_vrf plus prefix on ROW_prefix). The first dict on a
+    branch whose inherited fields cover all key_fields becomes one entry, and
+    its whole subtree (next-hops, paths, ...) is the entry value.
+
+    Branches where the key never resolves are keyed by their full content, so
+    nothing is dropped from the comparison; they can only show up as
+    added/removed, never as modified.
+
+    Excluded fields are skipped during the walk and stripped from entry
+    values, so no separately normalized copy of the table is needed.
+
+    Args:
+        data: Nested table data (dict, list, or primitive)
+        key_fields: List of field names forming the entry identity
+        excluded_fields: Field names to ignore at any level, or dotted
+            path patterns (see remove_excluded_fields_recursive)
+
+    Returns:
+        Ordered dict of identity -> (key dict, entry value)
+    """
+    entries = {}
+    spec = _compile_exclusions(list(excluded_fields or []))
+    names = spec.names
+
+    def _add(identity, key, value):
+        # Disambiguate duplicate identities by occurrence so none are lost
+        unique = identity
+        occurrence = 1
+        while unique in entries:
+            unique = identity + (occurrence,)
+            occurrence += 1
+        entries[unique] = (key, value)
+
+    def _kept(node, states):
+        # Yield (key, value, value_states) for children that are not excluded
+        is_dict = isinstance(node, dict)
+        for key, value in (node.items() if is_dict else enumerate(node)):
+            if is_dict and key in names:
+                continue
+            value_states = states
+            if states:
+                excluded, value_states = spec.step(states, key)
+                if excluded:
+                    continue
+            yield key, value, value_states
+
+    # Explicit stack of [dict node or None for a list, context, states, path,
+    # context of the children, remaining container children, entries found]
+    # so deeply nested tables do not hit the Python recursion limit
+    stack = []
+
+    def _visit(node, context, path, states):
+        # Add the entry of a keyed dict or scalar and return 1, or push a frame
+        # for a container whose entries come from its children and return None
+        if isinstance(node, dict):
+            children = {k: (v, child_states) for k, v, child_states in _kept(node, states)}
+            scalars = {k: v for k, (v, _) in children.items() if not isinstance(v, (dict, list))}
+            inherited = dict(context, **scalars)
+            if key_fields and all(field in inherited for field in key_fields):
+                key = {field: inherited[field] for field in key_fields}
+                value = dict({k: v for k, v in context.items() if k not in children},
+                             **_strip_excluded(node, spec, states))
+                _add(('key', path) + tuple(key[field] for field in key_fields), key, value)
+                return 1
+            containers = ((child, path + (name,), child_states) for name, (child, child_states) in children.items()
+                          if isinstance(child, (dict, list)))
+            stack.append([node, context, states, path, inherited, containers, 0])
+            return None
+        elif isinstance(node, list):
+            items = ((item, path, item_states) for _, item, item_states in _kept(node, states))
+            stack.append([None, context, states, path, context, items, 0])
+            return None
+        else:
+            _add(('content', path, _canonical_key(node)), {}, node)
+            return 1
+
+    _visit(data, {}, (), spec.initial)
+    while stack:
+        frame = stack[-1]
+        for child, child_path, child_states in frame[5]:
+            found = _visit(child, frame[4], child_path, child_states)
+            if found is None:
+                break
+            frame[6] += found
+        else:
+            stack.pop()
+            node, context, states, path, _, _, found = frame
+            if node is not None and not found:
+                # No entry below this dict: key it by its full content
+                value = dict(context, **_strip_excluded(node, spec, states))
+                _add(('content', path, _canonical_key(value)), {}, value)
+                found = 1
+            if stack:
+                stack[-1][6] += found
+    return entries
+
+
+def _equal(value1, value2):
+    """
+    Compare two data structures like ``==``, without the recursion limit.
+
+    The built-in comparison is tried first; structures nested deeper than the
+    recursion limit are compared with an explicit stack instead.
+    """
+    try:
+        return value1 == value2
+    except RecursionError:
+        pass
+    stack = [(value1, value2)]
+    while stack:
+        left, right = stack.pop()
+        if isinstance(left, dict) and isinstance(right, dict):
+            if left.keys() != right.keys():
+                return False
+            stack.extend((left[key], right[key]) for key in left)
+        elif isinstance(left, list) and isinstance(right, list):
+            if len(left) != len(right):
+                return False
+            stack.extend(zip(left, right))
+        elif left != right:
+            return False
+    return True
+
+
+def _diff_keyed_entries(post_entries, pre_entries):
+    """
+    Diff two identity-keyed entry indexes built by _keyed_entries.
+
+    Consumes pre_entries (entries matched against post_entries are popped).
+
+    Returns:
+        dict with added, removed, modified and match keys (see keyed_diff)
+    """
+    added = []
+    modified = []
+    for identity, (key, post_value) in post_entries.items():
+        pre_entry = pre_entries.pop(identity, None)
+        if pre_entry is None:
+            added.append(post_value)
+            continue
+        pre_value = pre_entry[1]
+        if _equal(pre_value, post_value):
+            continue
+        if isinstance(pre_value, dict) and isinstance(post_value, dict):
+            changes = {}
+            for field in list(pre_value) + [f for f in post_value if f not in pre_value]:
+                before = pre_value.get(field)
+                after = post_value.get(field)
+                if not _equal(before, after):
+                    changes[field] = {'before': before, 'after': after}
+        else:
+            changes = {'value': {'before': pre_value, 'after': post_value}}
+        modified.append({'key': key, 'changes': changes})
+
+    removed = [value for _, value in pre_entries.values()]
+
+    return {
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'match': not (added or removed or modified),
+    }
+
+
+def _as_field_list(fields):
+    """Normalize a field name or list of field names to a list."""
+    if fields is None:
+        return []
+    if not isinstance(fields, (list, tuple)):
+        return [fields]
+    return list(fields)
+
+
+def keyed_diff(post_data, pre_data, key_fields=None, excluded_fields=None):
+    """
+    Compare two tables entry-by-entry using a per-table identity key.
+
+    Builds an identity index of pre_data, then walks post_data once, so
+    added, removed and modified entries come out of a single pass over each
+    input. An entry present on both sides with different content is reported
+    once as modified (with only the changed fields), rather than as a
+    remove plus an add.
+
+    Args:
+        post_data: Post-upgrade table (e.g. network_baseline_post.rib_data)
+        pre_data: Pre-upgrade table to compare against
+        key_fields: Field name(s) that identify an entry, e.g.
+            ['vrf-name-out', 'ipprefix'] for RIB or ['disp_vlan', 'disp_mac_addr']
+            for MAC. Empty/None compares entries by full content.
+        excluded_fields: Optional field name(s) to ignore at any level
+
+    Returns:
+        dict with keys:
+            added: entries only in post_data (key fields merged in)
+            removed: entries only in pre_data (key fields merged in)
+            modified: list of {'key': {...}, 'changes': {field: {'before', 'after'}}}
+            match: True when the tables are equal entry-for-entry
+
+    Examples:
+        >>> pre = [{'vrf': 'default', 'prefix': '10.0.0.0/24', 'nh': '1.1.1.1'}]
+        >>> post = [{'vrf': 'default', 'prefix': '10.0.0.0/24', 'nh': '2.2.2.2'}]
+        >>> delta = keyed_diff(post, pre, ['vrf', 'prefix'])
+        >>> delta['added'], delta['removed'], delta['match']
+        ([], [], False)
+        >>> delta['modified'][0]['changes']
+        {'nh': {'before': '1.1.1.1', 'after': '2.2.2.2'}}
+    """
+    key_fields = _as_field_list(key_fields)
+    excluded_fields = _as_field_list(excluded_fields)
+
+    pre_entries = _keyed_entries(pre_data, key_fields, excluded_fields)
+    post_entries = _keyed_entries(post_data, key_fields, excluded_fields)
+
+    return _diff_keyed_entries(post_entries, pre_entries)
+
+
+def baseline_diff(post_baseline, pre_baseline, excluded_fields_map=None, keys_map=None, tables=None):
+    """
+    Normalize and diff every table of two network baselines in one pass.
+
+    Replaces the per-table normalize/compare sequence: each table is walked
+    once per side with its excluded fields stripped on the fly, and only the
+    resulting deltas are returned, so no normalized copies of the tables need
+    to be stored as facts.
+
+    Args:
+        post_baseline: Post-upgrade baseline (network_baseline_post)
+        pre_baseline: Pre-upgrade baseline (network_baseline_pre)
+        excluded_fields_map: Table name -> fields to ignore
+            (baseline_comparison_excluded_fields). Tables not listed are
+            compared raw.
+        keys_map: Table name -> identity key fields (baseline_comparison_keys).
+            Tables not listed are compared by full entry content.
+        tables: Optional list of table names to compare. Defaults to every
+            table named in excluded_fields_map or keys_map.
+
+    Returns:
+        dict with keys:
+            tables: table name -> {added, removed, modified, match,
+                pre_count, post_count} for each table present in both
+                baselines
+            match: True when every compared table matches
+
+    Examples:
+        >>> pre = {'mac_data': [{'mac': 'a', 'vlan': 1, 'age': 5}]}
+        >>> post = {'mac_data': [{'mac': 'a', 'vlan': 1, 'age': 9}]}
+        >>> baseline_diff(post, pre, {'mac_data': ['age']}, {'mac_data': ['vlan', 'mac']})['match']
+        True
+    """
+    excluded_fields_map = excluded_fields_map or {}
+    keys_map = keys_map or {}
+    if tables is None:
+        tables = list(excluded_fields_map) + [t for t in keys_map if t not in excluded_fields_map]
+
+    results = {}
+    for table in tables:
+        if table not in pre_baseline or table not in post_baseline:
+            continue
+        key_fields = _as_field_list(keys_map.get(table))
+        excluded_fields = _as_field_list(excluded_fields_map.get(table))
+
+        pre_entries = _keyed_entries(pre_baseline[table], key_fields, excluded_fields)
+        post_entries = _keyed_entries(post_baseline[table], key_fields, excluded_fields)
+        pre_count = len(pre_entries)
+        post_count = len(post_entries)
+
+        delta = _diff_keyed_entries(post_entries, pre_entries)
+        delta['pre_count'] = pre_count
+        delta['post_count'] = post_count
+        results[table] = delta
+
+    return {
+        'tables': results,
+        'match': all(delta['match'] for delta in results.values()),
+    }
+
+
 def to_proper_json(data, indent=2):
     """
     Convert data to properly formatted JSON with proper newline handling.
@@ -215,5 +746,7 @@ class FilterModule:
             'is_platform': is_platform,
             'remove_excluded_fields_recursive': remove_excluded_fields_recursive,
             'difference_recursive': difference_recursive,
+            'keyed_diff': keyed_diff,
+            'baseline_diff': baseline_diff,
             'to_proper_json': to_proper_json,
         }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Custom Ansible filter for topology-aware upgrade wave planning.
+
+Groups target devices into the fewest waves that can safely be upgraded in
+parallel, using the topology attributes the inventory already carries:
+vPC peers and HA cluster members are never upgraded together, and at most
+K devices per site or network tier are in flight at once. The resulting plan
+is written to disk by main-upgrade-workflow.yml and enforced at run time by
+the rolling_window strategy (strategy_plugins/rolling_window.py).
+"""
+
+import math
+from collections import Counter
+
+from ansible.module_utils.parsing.convert_bool import boolean
+
+# FortiOS reports primary/secondary (older releases master/slave); the
+# primary is upgraded last, matching roles/fortios-upgrade ha-cluster-upgrade.yml
+HA_PRIMARY_ROLES = ('primary', 'master')
+
+
+def _text(value):
+    """Return a stripped string, or '' for missing values."""
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _network_tier(host_vars):
+    """Tier from a network_tier host var, else from the netbox network_tier_* keyed group."""
+    tier = _text(host_vars.get('network_tier'))
+    if tier:
+        return tier
+    for group in host_vars.get('group_names') or ():
+        if group.startswith('network_tier_'):
+            return group[len('network_tier_'):]
+    return ''
+
+
+def _tier_limit(max_per_tier, tier):
+    """Per-tier limit from an int (all tiers) or a dict keyed by tier ('default' fallback)."""
+    if isinstance(max_per_tier, dict):
+        return int(max_per_tier.get(tier, max_per_tier.get('default', 0)) or 0)
+    return int(max_per_tier or 0)
+
+
+def host_constraints(host_vars, max_per_site=0, max_per_tier=0):
+    """
+    Build the concurrency constraints for one device.
+
+    Args:
+        host_vars (dict): The device's variables (hostvars[host])
+        max_per_site (int): Devices per site in flight at once (0 = unlimited)
+        max_per_tier (int|dict): Devices per network tier in flight at once (0 = unlimited)
+
+    Returns:
+        dict: Constraint key -> maximum number of devices sharing the key in flight
+
+    Examples:
+        >>> host_constraints({'vpc_enabled': True, 'vpc_domain_id': 10, 'site_slug': 'nyc1'}, 2)
+        {'vpc:nyc1:10': 1, 'site:nyc1': 2}
+
+    vPC domain IDs and HA group IDs are only unique within a site, so both are
+    scoped by site. A vPC or HA device without a domain/cluster ID is grouped with
+    every other such device in its site, which is safe but serialises them.
+    """
+    constraints = {}
+    site = _text(host_vars.get('site_slug')) or _text(host_vars.get('site_name')) or 'unknown'
+
+    if boolean(host_vars.get('vpc_enabled', False), strict=False):
+        domain = _text(host_vars.get('vpc_domain_id'))
+        constraints['vpc:%s:%s' % (site, domain) if domain else 'vpc:%s' % site] = 1
+
+    cluster = _text(host_vars.get('ha_cluster_id'))
+    if cluster:
+        constraints['ha:%s:%s' % (site, cluster)] = 1
+    elif boolean(host_vars.get('ha_enabled', False), strict=False):
+        constraints['ha:%s' % site] = 1
+
+    if max_per_site and int(max_per_site) > 0 and site != 'unknown':
+        constraints['site:%s' % site] = int(max_per_site)
+
+    tier = _network_tier(host_vars)
+    tier_limit = _tier_limit(max_per_tier, tier) if tier else 0
+    if tier_limit > 0:
+        constraints['tier:%s' % tier] = tier_limit
+
+    return constraints
+
+
+def upgrade_wave_plan(hosts, hostvars, max_wave_size=0, max_per_site=0, max_per_tier=0):
+    """
+    Plan the fewest parallel upgrade waves that respect the topology constraints.
+
+    Devices are placed first-fit, most constrained first (the device whose
+    tightest group needs the most waves), into the earliest wave where none of
+    its constraint groups is full. HA primaries are placed in a later wave than
+    every other member of their cluster and are recorded as depending on them.
+
+    Args:
+        hosts (list): Inventory hostnames to plan (e.g. query('inventory_hostnames', target_hosts))
+        hostvars (dict): Ansible hostvars
+        max_wave_size (int): Devices per wave (normally max_concurrent; 0 = unlimited)
+        max_per_site (int): Devices per site in flight at once (0 = unlimited)
+        max_per_tier (int|dict): Devices per tier in flight at once, or a dict of
+            tier -> limit with an optional 'default' key (0 = unlimited)
+
+    Returns:
+        dict: {
+            'waves': [[hostnames in wave 1], [wave 2], ...],
+            'hosts': {hostname: {'wave': n, 'constraints': {key: limit}, 'after': [hostnames]}},
+            'limits': {...},
+            'summary': {'hosts': n, 'waves': n, 'lower_bound': n, 'largest_wave': n}
+        }
+
+    Usage in Ansible playbooks:
+        upgrade_plan: >-
+          {{ query('inventory_hostnames', target_hosts)
+             | upgrade_wave_plan(hostvars, max_concurrent, max_concurrent_per_site, max_concurrent_per_tier) }}
+    """
+    hosts = list(dict.fromkeys(hosts or []))
+    max_wave_size = int(max_wave_size or 0)
+    position = {name: index for index, name in enumerate(hosts)}
+
+    constraints = {}
+    ha_roles = {}
+    for name in hosts:
+        host_vars = hostvars[name]
+        constraints[name] = host_constraints(host_vars, max_per_site, max_per_tier)
+        ha_roles[name] = _text(host_vars.get('ha_role')).lower()
+
+    group_members = {}
+    for name in hosts:
+        for key in constraints[name]:
+            group_members.setdefault(key, []).append(name)
+
+    # HA primaries go after the other members of their cluster
+    after = {name: [] for name in hosts}
+    for key, members in group_members.items():
+        if not key.startswith('ha:'):
+            continue
+        primaries = [name for name in members if ha_roles[name] in HA_PRIMARY_ROLES]
+        others = [name for name in members if ha_roles[name] not in HA_PRIMARY_ROLES]
+        for name in primaries:
+            after[name].extend(others)
+
+    def waves_needed(key):
+        return int(math.ceil(len(group_members[key]) / float(constraints[group_members[key][0]][key])))
+
+    def pressure(name):
+        return max([waves_needed(key) for key in constraints[name]] or [0])
+
+    order = sorted(hosts, key=lambda name: (-pressure(name), ha_roles[name] in HA_PRIMARY_ROLES, position[name]))
+
+    waves = []
+    assigned = {}
+    pending = order
+    while pending:
+        deferred = []
+        for name in pending:
+            predecessors = after[name]
+            if any(pred not in assigned for pred in predecessors):
+                deferred.append(name)
+                continue
+            wave = 1 + max([assigned[pred] for pred in predecessors if pred in assigned] or [0])
+            while True:
+                if wave > len(waves):
+                    waves.append({'members': [], 'counts': Counter()})
+                slot = waves[wave - 1]
+                fits = not max_wave_size or len(slot['members']) < max_wave_size
+                if fits and all(slot['counts'][key] < limit for key, limit in constraints[name].items()):
+                    break
+                wave += 1
+            slot['members'].append(name)
+            slot['counts'].update(constraints[name].keys())
+            assigned[name] = wave
+        if len(deferred) == len(pending):
+            # Unreachable only through a dependency cycle; drop the unplaced predecessors
+            for name in deferred:
+                after[name] = [pred for pred in after[name] if pred in assigned]
+        pending = deferred
+
+    lower_bound = max([waves_needed(key) for key in group_members] or [0])
+    if max_wave_size and hosts:
+        lower_bound = max(lower_bound, int(math.ceil(len(hosts) / float(max_wave_size))))
+
+    wave_lists = [sorted(slot['members'], key=position.get) for slot in waves]
+    return {
+        'waves': wave_lists,
+        'hosts': {
+            name: {
+                'wave': assigned[name],
+                'constraints': constraints[name],
+                'after': after[name],
+            }
+            for name in hosts
+        },
+        'limits': {
+            'max_wave_size': max_wave_size,
+            'max_per_site': int(max_per_site or 0),
+            'max_per_tier': max_per_tier or 0,
+        },
+        'summary': {
+            'hosts': len(hosts),
+            'waves': len(wave_lists),
+            'lower_bound': lower_bound,
+            'largest_wave': max([len(wave) for wave in wave_lists] or [0]),
+        },
+    }
+
+
+class FilterModule:
+    """Ansible filter plugin class."""
+
+    def filters(self):
+        """Return available filters."""
+        return {
+            'upgrade_wave_plan': upgrade_wave_plan,
+        }
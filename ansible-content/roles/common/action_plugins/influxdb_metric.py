@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible action plugin: queue an InfluxDB line-protocol point for batched export.
+
+Ansible runs every task in a short-lived worker fork, so an in-memory queue
+would die with the worker. Points are therefore appended to a controller-side
+spool file (microseconds, no network I/O) and a single detached flusher
+process per spool directory drains it in gzip-compressed batches. Batches are
+bounded by size (batch_size lines) and time (flush_interval seconds). Batches
+that fail to send stay in the spool and are retried, so an InfluxDB outage
+never loses points and never blocks an upgrade task.
+
+The same file is the flusher entry point:
+    python influxdb_metric.py --flush <spool_dir> <lock_fd>   (config JSON on stdin)
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import fcntl
+import glob
+import gzip
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.action import ActionBase
+
+DOCUMENTATION = r'''
+---
+action: influxdb_metric
+short_description: Queue a metric point for batched, gzip-compressed InfluxDB v2 export
+description:
+  - Builds one InfluxDB line-protocol point and appends it to a controller-side spool.
+  - A detached flusher process sends spooled points in size- and time-bounded
+    gzip batches, retrying failed batches from the spool.
+  - The task never waits on InfluxDB.
+options:
+  measurement:
+    description: Measurement name (metric_type).
+    type: str
+    required: true
+  tags:
+    description: Tag set (e.g. device_id, platform).
+    type: dict
+  fields:
+    description:
+      - Field set. Numbers and numeric strings are written as floats, C(true)/C(false)
+        as booleans, anything else as a string field.
+    type: dict
+    required: true
+  url:
+    description: InfluxDB base URL.
+    type: str
+    required: true
+  token:
+    description: InfluxDB v2 API token.
+    type: str
+    required: true
+  org:
+    description: InfluxDB organization.
+    type: str
+    required: true
+  bucket:
+    description: InfluxDB bucket.
+    type: str
+    required: true
+  spool_dir:
+    description: Controller directory holding pending and unsent points.
+    type: path
+    required: true
+  batch_size:
+    description: Maximum points per write request; a full batch is flushed immediately.
+    type: int
+    default: 5000
+  flush_interval:
+    description: Maximum seconds a point waits in the spool before it is sent.
+    type: float
+    default: 5
+  max_spool_mb:
+    description: Oldest unsent batches are dropped once the spool exceeds this size.
+    type: int
+    default: 256
+'''
+
+EXAMPLES = r'''
+- name: Queue metrics for batched InfluxDB export
+  influxdb_metric:
+    measurement: "{{ metric_type }}"
+    tags:
+      device_id: "{{ inventory_hostname }}"
+      platform: "{{ platform }}"
+    fields: "{{ metric_data }}"
+    url: "{{ influxdb_url }}"
+    token: "{{ influxdb_token }}"
+    org: "{{ influxdb_org }}"
+    bucket: "{{ influxdb_bucket }}"
+    spool_dir: "{{ influxdb_spool_path }}"
+'''
+
+PENDING_FILE = 'pending.lp'
+BATCH_GLOB = 'batch-*.lp'
+FLUSHER_LOCK = 'flusher.lock'
+FLUSHER_LOG = 'flusher.log'
+POLL_SECONDS = 0.5
+IDLE_EXIT_SECONDS = 30
+REQUEST_TIMEOUT = 10
+MAX_RETRY_BACKOFF = 60
+
+
+def _escape_key(value):
+    """Escape a tag key, tag value or field key."""
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+
+def _format_field_value(value):
+    """Format a field value, keeping the float typing used by earlier exports."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        number = float(value)
+        return repr(number) if math.isfinite(number) else None
+    text = str(value)
+    if text.lower() in ('true', 'false'):
+        return text.lower()
+    try:
+        number = float(text)
+    except ValueError:
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return repr(number) if math.isfinite(number) else None
+
+
+def format_point(measurement, tags, fields, timestamp_ns):
+    """
+    Build one InfluxDB line-protocol point.
+
+    Returns:
+        The point as a string, or None when no field has a writable value
+    """
+    field_parts = []
+    for key, value in (fields or {}).items():
+        if value is None:
+            continue
+        formatted = _format_field_value(value)
+        if formatted is not None:
+            field_parts.append(_escape_key(key) + '=' + formatted)
+    if not field_parts:
+        return None
+
+    series = str(measurement).replace('\\', '\\\\').replace(',', '\\,').replace(' ', '\\ ')
+    for key, value in sorted((tags or {}).items()):
+        if value is None or str(value) == '':
+            continue
+        series += ',' + _escape_key(key) + '=' + _escape_key(value)
+    return series + ' ' + ','.join(field_parts) + ' ' + str(timestamp_ns)
+
+
+def append_points(spool_dir, lines):
+    """Append points to the pending spool file under an exclusive lock."""
+    os.makedirs(spool_dir, mode=0o750, exist_ok=True)
+    payload = ''.join(line + '\n' for line in lines).encode('utf-8')
+    path = os.path.join(spool_dir, PENDING_FILE)
+    while True:
+        with open(path, 'ab') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                # The flusher may have rotated the file while we waited for the lock
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if current.st_ino != os.fstat(handle.fileno()).st_ino:
+                    continue
+                handle.write(payload)
+                return
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def ensure_flusher(spool_dir, config):
+    """
+    Start a detached flusher unless one already holds the spool's flusher lock.
+
+    The lock is taken here and handed to the child as an inherited file
+    descriptor, so concurrent workers cannot both start a flusher. The token
+    is passed on stdin, never on the command line.
+
+    Returns:
+        The new flusher's PID, or None when a flusher was already running
+    """
+    with open(os.path.join(spool_dir, FLUSHER_LOCK), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--flush', spool_dir, str(lock.fileno())],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            pass_fds=(lock.fileno(),),
+            start_new_session=True,
+        )
+    process.stdin.write(json.dumps(config).encode('utf-8'))
+    process.stdin.close()
+    return process.pid
+
+
+class SpoolFlusher:
+    """Drain a spool directory to InfluxDB in gzip batches until it stays idle."""
+
+    def __init__(self, spool_dir, config):
+        self.spool_dir = spool_dir
+        self.batch_size = max(1, int(config.get('batch_size', 5000)))
+        self.flush_interval = max(POLL_SECONDS, float(config.get('flush_interval', 5)))
+        self.max_spool_bytes = int(config.get('max_spool_mb', 256)) * 1024 * 1024
+        self.write_url = '%s/api/v2/write?%s' % (
+            config['url'].rstrip('/'),
+            urllib.parse.urlencode({'org': config['org'], 'bucket': config['bucket'], 'precision': 'ns'}))
+        self.headers = {
+            'Authorization': 'Token %s' % config['token'],
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Encoding': 'gzip',
+        }
+        self.retry_backoff = 0
+        self.next_attempt = 0.0
+
+    def log(self, message):
+        with open(os.path.join(self.spool_dir, FLUSHER_LOG), 'a') as handle:
+            handle.write('%s %s\n' % (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), message))
+
+    def pending_path(self):
+        return os.path.join(self.spool_dir, PENDING_FILE)
+
+    def pending_bytes(self):
+        try:
+            return os.path.getsize(self.pending_path())
+        except OSError:
+            return 0
+
+    def pending_lines_estimate(self):
+        # Points are ~100-200 bytes; a cheap size check avoids reading the file
+        return self.pending_bytes() // 128
+
+    def rotate_pending(self):
+        """Move pending points into an immutable batch file under the append lock."""
+        path = self.pending_path()
+        if not os.path.exists(path):
+            return
+        with open(path, 'ab') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                if os.fstat(handle.fileno()).st_size:
+                    os.rename(path, os.path.join(self.spool_dir, 'batch-%020d.lp' % time.time_ns()))
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def enforce_spool_limit(self, batch_files):
+        """Drop the oldest unsent batches once the spool exceeds max_spool_bytes."""
+        total = sum(os.path.getsize(path) for path in batch_files)
+        while batch_files and total > self.max_spool_bytes:
+            oldest = batch_files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.unlink(oldest)
+            self.log('spool limit exceeded, dropped %s' % os.path.basename(oldest))
+        return batch_files
+
+    def post(self, lines):
+        body = gzip.compress(''.join(lines).encode('utf-8'), compresslevel=5)
+        request = urllib.request.Request(self.write_url, data=body, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return response.status
+
+    def send_batch_file(self, path):
+        """Send one batch file; on failure keep the unsent remainder and return False."""
+        with open(path, 'r', encoding='utf-8') as handle:
+            lines = handle.readlines()
+        for start in range(0, len(lines), self.batch_size):
+            chunk = lines[start:start + self.batch_size]
+            try:
+                self.post(chunk)
+            except urllib.error.HTTPError as e:
+                if 400 <= e.code < 500 and e.code not in (401, 403, 408, 429):
+                    # Rejected points will never succeed; drop them instead of retrying forever
+                    self.log('InfluxDB rejected %d points (HTTP %d): %s'
+                             % (len(chunk), e.code, e.read(512).decode('utf-8', 'replace')))
+                    continue
+                return self.keep_remainder(path, lines[start:], 'HTTP %d' % e.code)
+            except (urllib.error.URLError, OSError) as e:
+                return self.keep_remainder(path, lines[start:], str(e))
+        os.unlink(path)
+        return True
+
+    def keep_remainder(self, path, remaining, reason):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            handle.writelines(remaining)
+        os.replace(tmp_path, path)
+        self.retry_backoff = min(MAX_RETRY_BACKOFF, max(1, self.retry_backoff * 2))
+        self.next_attempt = time.monotonic() + self.retry_backoff
+        self.log('InfluxDB write failed (%s), %d points spooled, retry in %ds'
+                 % (reason, len(remaining), self.retry_backoff))
+        return False
+
+    def flush(self):
+        """Rotate pending points and send every batch in the spool, oldest first."""
+        if time.monotonic() < self.next_attempt:
+            return
+        self.rotate_pending()
+        batch_files = self.enforce_spool_limit(sorted(glob.glob(os.path.join(self.spool_dir, BATCH_GLOB))))
+        for path in batch_files:
+            if not self.send_batch_file(path):
+                return
+        self.retry_backoff = 0
+
+    def spool_empty(self):
+        return not self.pending_bytes() and not glob.glob(os.path.join(self.spool_dir, BATCH_GLOB))
+
+    def run(self):
+        last_flush = time.monotonic()
+        idle_since = None
+        while True:
+            time.sleep(POLL_SECONDS)
+            now = time.monotonic()
+            if self.pending_lines_estimate() >= self.batch_size or now - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = now
+            if self.spool_empty():
+                idle_since = idle_since or now
+                if now - idle_since >= IDLE_EXIT_SECONDS:
+                    return
+            else:
+                idle_since = None
+
+
+def flusher_main(spool_dir, lock_fd):
+    """Entry point of the detached flusher process; lock_fd is the inherited, held flusher lock."""
+    config = json.loads(sys.stdin.read())
+    pending_path = os.path.join(spool_dir, PENDING_FILE)
+    with os.fdopen(lock_fd, 'a') as lock:
+        while True:
+            SpoolFlusher(spool_dir, config).run()
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            # A point queued while we were exiting saw the lock held and did not
+            # start a flusher; pick it up rather than leaving it stranded
+            if not os.path.exists(pending_path) or not os.path.getsize(pending_path):
+                return 0
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset((
+        'measurement', 'tags', 'fields', 'url', 'token', 'org', 'bucket',
+        'spool_dir', 'batch_size', 'flush_interval', 'max_spool_mb',
+    ))
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        args = self._task.args
+        missing = [name for name in ('measurement', 'fields', 'url', 'token', 'org', 'bucket', 'spool_dir')
+                   if not args.get(name)]
+        if missing:
+            raise AnsibleActionFail('influxdb_metric missing required arguments: %s' % ', '.join(missing))
+        if not isinstance(args['fields'], dict):
+            raise AnsibleActionFail('influxdb_metric fields must be a dict')
+
+        point = format_point(args['measurement'], args.get('tags'), args['fields'], time.time_ns())
+        if point is None:
+            result.update(changed=False, queued=False, msg='No writable fields; nothing queued')
+            return result
+
+        spool_dir = os.path.expanduser(args['spool_dir'])
+        try:
+            append_points(spool_dir, [point])
+            ensure_flusher(spool_dir, {
+                'url': args['url'],
+                'token': args['token'],
+                'org': args['org'],
+                'bucket': args['bucket'],
+                'batch_size': args.get('batch_size', 5000),
+                'flush_interval': args.get('flush_interval', 5),
+                'max_spool_mb': args.get('max_spool_mb', 256),
+            })
+        except (OSError, ValueError) as e:
+            raise AnsibleActionFail('Failed to queue InfluxDB point: %s' % to_native(e))
+
+        result.update(changed=False, queued=True, point=point, spool_dir=spool_dir)
+        return result
+
+
+if __name__ == '__main__' and len(sys.argv) == 4 and sys.argv[1] == '--flush':
+    sys.exit(flusher_main(sys.argv[2], int(sys.argv[3])))
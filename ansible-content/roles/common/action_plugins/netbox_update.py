@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible action plugin: queue NetBox device custom field updates and send them in bulk.
+
+Devices that finish a step together used to send one synchronous PATCH each,
+every fork waiting on NetBox. Instead, each update is appended to a
+controller-side spool file (no network I/O). At step boundaries a flush merges
+the queued updates per device (later values win), looks up the device IDs by
+name, and sends them as bulk PATCH lists to /api/dcim/devices/.
+
+Only one fork flushes at a time; a fork that finds a flush in progress returns
+at once, and the running flush picks up its updates before it exits. The
+flushing fork first waits I(flush_delay) seconds so that forks reaching the same
+step boundary a moment later land in the same bulk request. Updates
+that fail to send are kept, merged, in the spool and retried by the next flush.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import fcntl
+import json
+import os
+import ssl
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.action import ActionBase
+
+DOCUMENTATION = r'''
+---
+action: netbox_update
+short_description: Queue NetBox device custom field updates and flush them as bulk PATCH requests
+description:
+  - With I(custom_fields), appends an update for I(device) to a controller-side spool.
+  - With I(flush=true), merges the spooled updates per device and sends them to
+    NetBox as bulk PATCH lists; updates that fail to send stay spooled for the next flush.
+  - Both can be given in one task; the update is queued before the flush.
+options:
+  device:
+    description: NetBox device name (inventory_hostname).
+    type: str
+  custom_fields:
+    description: Custom field values to set on the device.
+    type: dict
+  flush:
+    description: Send all queued updates to NetBox.
+    type: bool
+    default: false
+  url:
+    description: NetBox base URL. Required with I(flush).
+    type: str
+  token:
+    description: NetBox API token. Required with I(flush).
+    type: str
+  validate_certs:
+    description: Verify the NetBox TLS certificate.
+    type: bool
+    default: true
+  spool_dir:
+    description: Controller directory holding queued and unsent updates.
+    type: path
+    required: true
+  batch_size:
+    description: Maximum devices per bulk PATCH request.
+    type: int
+    default: 100
+  flush_delay:
+    description:
+      - Seconds the flushing fork waits before taking the queue, so that updates
+        from forks reaching the same step boundary go out in the same request.
+    type: float
+    default: 0
+'''
+
+EXAMPLES = r'''
+- name: Queue NetBox upgrade status
+  netbox_update:
+    device: "{{ inventory_hostname }}"
+    custom_fields:
+      upgrade_status: completed
+      current_firmware: "{{ firmware_version }}"
+    spool_dir: "{{ netbox_update_spool_path }}"
+
+- name: Send queued NetBox updates (step boundary)
+  netbox_update:
+    flush: true
+    url: "{{ netbox_url }}"
+    token: "{{ netbox_token }}"
+    spool_dir: "{{ netbox_update_spool_path }}"
+'''
+
+RETURN = r'''
+queued:
+  description: Whether an update was queued for I(device).
+  type: bool
+flushed:
+  description: Whether this task ran a flush (false when another fork was already flushing).
+  type: bool
+sent:
+  description: Number of devices updated in NetBox.
+  type: int
+requests:
+  description: Number of NetBox API requests made by the flush.
+  type: int
+unknown_devices:
+  description: Queued device names not found in NetBox; their updates are dropped.
+  type: list
+rejected_devices:
+  description: Devices whose update NetBox rejected (e.g. unknown custom field); dropped.
+  type: list
+unsent:
+  description: Number of devices whose updates stay spooled after a failed request.
+  type: int
+'''
+
+PENDING_FILE = 'pending.jsonl'
+UNSENT_FILE = 'unsent.json'
+FLUSH_LOCK = 'flush.lock'
+NAME_LOOKUP_BATCH = 100
+REQUEST_TIMEOUT = 30
+
+
+def append_update(spool_dir, device, custom_fields):
+    """Append one device update to the pending spool file under an exclusive lock."""
+    os.makedirs(spool_dir, mode=0o750, exist_ok=True)
+    line = json.dumps({'device': device, 'custom_fields': custom_fields}, sort_keys=True) + '\n'
+    with open(os.path.join(spool_dir, PENDING_FILE), 'a', encoding='utf-8') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            handle.write(line)
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def merge_updates(merged, updates):
+    """
+    Merge device updates in queue order; a later value for the same field wins.
+
+    Args:
+        merged: dict of device name -> custom fields, updated in place
+        updates: iterable of {'device': ..., 'custom_fields': {...}}
+
+    Returns:
+        merged
+    """
+    for update in updates:
+        merged.setdefault(update['device'], {}).update(update['custom_fields'])
+    return merged
+
+
+def take_pending(spool_dir):
+    """Read and truncate the pending spool file under its lock; skip unreadable lines."""
+    path = os.path.join(spool_dir, PENDING_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r+', encoding='utf-8') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            lines = handle.readlines()
+            handle.seek(0)
+            handle.truncate()
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+    updates = []
+    for line in lines:
+        try:
+            updates.append(json.loads(line))
+        except ValueError:
+            continue
+    return updates
+
+
+def pending_exists(spool_dir):
+    try:
+        return os.path.getsize(os.path.join(spool_dir, PENDING_FILE)) > 0
+    except OSError:
+        return False
+
+
+def load_unsent(spool_dir):
+    try:
+        with open(os.path.join(spool_dir, UNSENT_FILE), 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_unsent(spool_dir, unsent):
+    path = os.path.join(spool_dir, UNSENT_FILE)
+    if not unsent:
+        if os.path.exists(path):
+            os.unlink(path)
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(unsent, handle, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class NetBoxWriter:
+    """Bulk custom field updates against the NetBox devices endpoint."""
+
+    def __init__(self, url, token, validate_certs=True, batch_size=100):
+        self.devices_url = url.rstrip('/') + '/api/dcim/devices/'
+        self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        if token:
+            self.headers['Authorization'] = 'Token %s' % token
+        self.context = None if validate_certs else ssl._create_unverified_context()
+        self.batch_size = max(1, int(batch_size))
+        self.requests = 0
+
+    def call(self, method, url, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(url, data=data, headers=self.headers, method=method)
+        self.requests += 1
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT, context=self.context) as response:
+            return json.loads(response.read() or b'null')
+
+    def device_ids(self, names):
+        """Map device names to NetBox IDs, one brief listing per NAME_LOOKUP_BATCH names."""
+        ids = {}
+        for start in range(0, len(names), NAME_LOOKUP_BATCH):
+            batch = names[start:start + NAME_LOOKUP_BATCH]
+            query = urllib.parse.urlencode([('name', name) for name in batch]
+                                           + [('brief', 'true'), ('limit', len(batch))])
+            for device in self.call('GET', self.devices_url + '?' + query).get('results', []):
+                ids[device['name']] = device['id']
+        return ids
+
+    def patch(self, objects):
+        return self.call('PATCH', self.devices_url, objects)
+
+    def send(self, merged):
+        """
+        Send merged updates in bulk PATCH batches.
+
+        NetBox applies a bulk request in one transaction, so a batch it rejects
+        (HTTP 400) is retried one device at a time and only the rejected devices
+        are dropped. Transport errors and other HTTP errors stop the flush.
+
+        Returns:
+            dict with sent, unknown_devices, rejected_devices and unsent (device -> fields)
+        """
+        result = {'sent': 0, 'unknown_devices': [], 'rejected_devices': [], 'unsent': {}}
+        names = sorted(merged)
+        try:
+            ids = self.device_ids(names)
+        except (urllib.error.URLError, OSError, ValueError):
+            result['unsent'] = dict(merged)
+            return result
+        result['unknown_devices'] = [name for name in names if name not in ids]
+        known = [name for name in names if name in ids]
+
+        for start in range(0, len(known), self.batch_size):
+            batch = known[start:start + self.batch_size]
+            objects = [{'id': ids[name], 'custom_fields': merged[name]} for name in batch]
+            try:
+                self.patch(objects)
+                result['sent'] += len(batch)
+                continue
+            except urllib.error.HTTPError as e:
+                if e.code != 400:
+                    result['unsent'] = {name: merged[name] for name in known[start:]}
+                    return result
+            except (urllib.error.URLError, OSError, ValueError):
+                result['unsent'] = {name: merged[name] for name in known[start:]}
+                return result
+            for name, obj in zip(batch, objects):
+                try:
+                    self.patch([obj])
+                    result['sent'] += 1
+                except urllib.error.HTTPError as e:
+                    if e.code != 400:
+                        result['unsent'][name] = merged[name]
+                    else:
+                        result['rejected_devices'].append(name)
+                except (urllib.error.URLError, OSError, ValueError):
+                    result['unsent'][name] = merged[name]
+        return result
+
+
+def flush(spool_dir, writer, delay=0):
+    """
+    Send every queued update unless another fork is already flushing.
+    The first pass waits delay seconds (holding the lock) to collect updates
+    from other forks.
+
+    Returns:
+        dict with flushed, sent, requests, unknown_devices, rejected_devices and unsent
+    """
+    os.makedirs(spool_dir, mode=0o750, exist_ok=True)
+    summary = {'flushed': False, 'sent': 0, 'unknown_devices': [], 'rejected_devices': [], 'unsent': 0}
+    with open(os.path.join(spool_dir, FLUSH_LOCK), 'a') as lock:
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                break
+            try:
+                if delay and not summary['flushed']:
+                    time.sleep(delay)
+                merged = merge_updates(load_unsent(spool_dir), take_pending(spool_dir))
+                # Keep the taken updates on disk until NetBox has them
+                save_unsent(spool_dir, merged)
+                outcome = writer.send(merged)
+                save_unsent(spool_dir, outcome['unsent'])
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            summary['flushed'] = True
+            summary['sent'] += outcome['sent']
+            summary['unknown_devices'] += outcome['unknown_devices']
+            summary['rejected_devices'] += outcome['rejected_devices']
+            summary['unsent'] = len(outcome['unsent'])
+            # Updates queued while we held the lock saw a flush in progress and
+            # returned; send them now rather than leaving them to the next boundary
+            if outcome['unsent'] or not pending_exists(spool_dir):
+                break
+    summary['requests'] = writer.requests
+    return summary
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    ARGUMENT_SPEC = dict(
+        device=dict(type='str'),
+        custom_fields=dict(type='dict'),
+        flush=dict(type='bool', default=False),
+        url=dict(type='str'),
+        token=dict(type='str', no_log=True),
+        validate_certs=dict(type='bool', default=True),
+        spool_dir=dict(type='path', required=True),
+        batch_size=dict(type='int', default=100),
+        flush_delay=dict(type='float', default=0),
+    )
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=self.ARGUMENT_SPEC)
+
+        if args['custom_fields'] is None and not args['flush']:
+            raise AnsibleActionFail('netbox_update needs custom_fields, flush=true, or both')
+        if args['custom_fields'] is not None and not args['device']:
+            raise AnsibleActionFail('netbox_update custom_fields requires device')
+        if args['flush'] and not args['url']:
+            raise AnsibleActionFail('netbox_update flush requires url')
+
+        result.update(changed=False, queued=False, flushed=False, spool_dir=args['spool_dir'])
+        if self._play_context.check_mode:
+            result['msg'] = 'NetBox update skipped in check mode'
+            return result
+
+        try:
+            if args['custom_fields']:
+                append_update(args['spool_dir'], args['device'], args['custom_fields'])
+                result['queued'] = True
+            if args['flush']:
+                writer = NetBoxWriter(args['url'], args['token'], validate_certs=args['validate_certs'],
+                                      batch_size=args['batch_size'])
+                start = time.monotonic()
+                result.update(flush(args['spool_dir'], writer, delay=max(0, args['flush_delay'])))
+                result['flush_seconds'] = round(time.monotonic() - start, 3)
+                result['changed'] = result['sent'] > 0
+        except (OSError, ValueError) as e:
+            raise AnsibleActionFail('NetBox update spool error: %s' % to_native(e))
+        return result
@@ -0,0 +1,482 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible action plugin: detect reboot completion instead of sleeping a fixed time.
+
+After a reload the plugin waits for the management ports to close, then polls
+the SSH banner (the HTTP(S) port for httpapi connections, and optionally the
+API port) from the controller with exponential backoff and jitter. Once they answer, a readiness probe runs through
+the task's own connection; the device is "up" as soon as the probe shows a reset
+uptime and every module in a ready state. Each reboot therefore costs only the
+time the hardware needs, and the observed durations are recorded per model so
+reboot timeouts can be tuned from real data.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import fcntl
+import json
+import math
+import os
+import random
+import re
+import socket
+import tempfile
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+DOCUMENTATION = r'''
+---
+action: reboot_detector
+short_description: Wait for a device to finish rebooting using port polling and a readiness probe
+description:
+  - Waits for the SSH port to close (the reload took effect), then polls the SSH
+    banner and optional API port with exponential backoff and jitter.
+  - For httpapi connections (FortiOS) the HTTP(S) port from I(ansible_httpapi_port)
+    is polled instead, and a TCP connect replaces the SSH banner check.
+  - When the ports answer, runs I(probe_commands) through the task connection and
+    declares the device ready when the uptime has reset and every module reported
+    by C(show module) is in one of I(ready_module_states).
+  - Records down, up and ready durations per model in I(history_path) and returns
+    statistics for that model, including a suggested timeout.
+  - With I(expect_reboot=false) only waits for the device to become reachable.
+options:
+  host:
+    description: Address polled from the controller. Defaults to ansible_host.
+    type: str
+  ssh_port:
+    description:
+      - SSH port. Defaults to ansible_port or 22.
+      - Not used for httpapi connections, which are polled on ansible_httpapi_port
+        (default 443 with ansible_httpapi_use_ssl, otherwise 80).
+    type: int
+  api_port:
+    description: Optional API port (for example NX-API on 443) that must accept connections too.
+    type: int
+  tcp_probe:
+    description:
+      - Poll the ports directly from the controller.
+      - Disable when devices are only reachable through a jump host; the readiness
+        probe is then retried with the same backoff.
+    type: bool
+    default: true
+  expect_reboot:
+    description: Wait for the device to go down first and require a reset uptime.
+    type: bool
+    default: true
+  readiness_probe:
+    description: Run I(probe_commands) before declaring the device up.
+    type: bool
+    default: true
+  probe_module:
+    description: Command module used for the readiness probe.
+    type: str
+    default: cisco.nxos.nxos_command
+  probe_commands:
+    description: Commands whose output must show a reset uptime and ready modules.
+    type: list
+    elements: str
+    default: [show system uptime, show module]
+  ready_module_states:
+    description: C(show module) status values that count as ready.
+    type: list
+    elements: str
+    default: [ok, active, ha-standby, standby]
+  timeout:
+    description: Maximum seconds from the start of the task until the device is ready.
+    type: int
+    default: 900
+  down_timeout:
+    description: Maximum seconds to wait for the ports to close after the reload.
+    type: int
+    default: 120
+  initial_delay:
+    description: Seconds to wait before the first check.
+    type: float
+    default: 0
+  initial_interval:
+    description: First backoff interval in seconds.
+    type: float
+    default: 2
+  max_interval:
+    description: Backoff interval cap in seconds.
+    type: float
+    default: 20
+  backoff_factor:
+    description: Multiplier applied to the interval after each unsuccessful check.
+    type: float
+    default: 1.5
+  jitter:
+    description: Fraction of each interval that is randomized so forks do not poll in lockstep.
+    type: float
+    default: 0.2
+  model:
+    description: Device model used to key the recorded durations.
+    type: str
+    default: unknown
+  history_path:
+    description: Controller JSON file holding recent reboot durations per model.
+    type: path
+'''
+
+EXAMPLES = r'''
+- name: Wait for the reload to complete
+  reboot_detector:
+    timeout: "{{ nxos_reboot_timeout }}"
+    api_port: 443
+    model: "{{ ansible_net_model | default('unknown') }}"
+    history_path: "{{ reboot_history_path }}"
+  register: reboot_detection
+'''
+
+RETURN = r'''
+ready:
+  description: True when the device passed the readiness probe before the timeout.
+  returned: always
+  type: bool
+down_observed:
+  description: True when the ports were seen closing after the reload.
+  returned: always
+  type: bool
+uptime_seconds:
+  description: Device uptime reported by the successful probe.
+  returned: when parsed
+  type: int
+timings:
+  description: Seconds from task start until down, up (ports answer) and ready.
+  returned: always
+  type: dict
+checks:
+  description: Number of port checks and probe runs.
+  returned: always
+  type: dict
+port:
+  description: Management port polled from the controller.
+  returned: always
+  type: int
+port_check:
+  description: How the port was polled, C(ssh_banner) or C(tcp) (httpapi connections).
+  returned: always
+  type: str
+model_stats:
+  description: Sample count, median, p95 and max ready seconds for the model, and a suggested timeout.
+  returned: when history_path is set and the device became ready
+  type: dict
+'''
+
+HISTORY_VERSION = 1
+HISTORY_SAMPLES = 50
+DOWN_POLL_SECONDS = 2
+CONNECT_TIMEOUT = 3
+# Uptime may lag the task start by clock granularity and command latency
+UPTIME_SLACK_SECONDS = 30
+
+UPTIME_SECTION = re.compile(r'(?:system uptime\s*:|uptime is)\s*(?P<value>[^\n]+)', re.IGNORECASE)
+UPTIME_UNITS = re.compile(r'(\d+)\s*(years?|weeks?|days?|hours?|minutes?|seconds?|[ywdhms])(?![a-z])', re.IGNORECASE)
+UNIT_SECONDS = {'y': 31536000, 'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+MODULE_HEADER = re.compile(r'^\s*Mod\s+Ports\s+.*\bStatus\s*$', re.IGNORECASE)
+MODULE_ROW = re.compile(r'^\s*(\d+)\s+\d+\s+.*?\s(\S+)(?:\s+\*)?\s*$')
+
+
+def parse_uptime_seconds(text):
+    """
+    Parse a device uptime into seconds.
+
+    Handles NX-OS "System uptime: 0 days, 0 hours, 5 minutes, 12 seconds",
+    IOS "uptime is 1 week, 2 days, 3 hours, 4 minutes" and compact "15d8h23m42s".
+
+    Returns:
+        Seconds, or None when no uptime is found
+    """
+    match = UPTIME_SECTION.search(text or '')
+    if not match:
+        return None
+    units = UPTIME_UNITS.findall(match.group('value'))
+    if not units:
+        return None
+    return sum(int(count) * UNIT_SECONDS[unit[0].lower()] for count, unit in units)
+
+
+def parse_module_states(text):
+    """
+    Return {module: status} from the first "Mod Ports ... Status" table of show module.
+
+    Examples:
+        1    48   48x25G + 6x100G Ethernet Module  N9K-X9788TC-FX  ok
+        27   0    Supervisor Module                N9K-SUP-A       active *
+    """
+    states = {}
+    in_table = False
+    for line in (text or '').splitlines():
+        if MODULE_HEADER.match(line):
+            in_table = True
+            continue
+        if not in_table or line.startswith('---'):
+            continue
+        if not line.strip():
+            if states:
+                break
+            continue
+        row = MODULE_ROW.match(line)
+        if row:
+            states[row.group(1)] = row.group(2).lower()
+    return states
+
+
+def backoff_intervals(initial, factor, maximum, jitter, rng=random):
+    """Yield exponentially growing, capped and jittered sleep intervals."""
+    interval = max(0.1, initial)
+    while True:
+        capped = min(interval, maximum)
+        yield capped * rng.uniform(1.0 - jitter, 1.0 + jitter)
+        interval *= factor
+
+
+def port_open(host, port, timeout=CONNECT_TIMEOUT):
+    """True if a TCP connection to host:port succeeds."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def ssh_banner(host, port, timeout=CONNECT_TIMEOUT):
+    """Return the SSH identification string, or None if sshd is not answering yet."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            data = sock.recv(256)
+    except OSError:
+        return None
+    if not data.startswith(b'SSH-'):
+        return None
+    return data.split(b'\n', 1)[0].strip().decode('ascii', 'replace')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def record_duration(history_path, model, sample):
+    """
+    Append a reboot sample for model under an exclusive lock and return its statistics.
+
+    Returns:
+        dict with samples, median, p95, max (ready seconds) and suggested_timeout
+    """
+    directory = os.path.dirname(os.path.abspath(history_path))
+    os.makedirs(directory, exist_ok=True)
+    with open(history_path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(history_path, 'r') as handle:
+                history = json.load(handle)
+            if history.get('version') != HISTORY_VERSION:
+                history = {}
+        except (OSError, ValueError):
+            history = {}
+        models = history.setdefault('models', {})
+        samples = models.setdefault(model, [])
+        samples.append(sample)
+        del samples[:-HISTORY_SAMPLES]
+        history['version'] = HISTORY_VERSION
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.reboot-history-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(history, handle, indent=2, sort_keys=True)
+        os.replace(tmp_path, history_path)
+
+    ready = [entry['ready_seconds'] for entry in samples]
+    p95 = percentile(ready, 0.95)
+    return {
+        'samples': len(ready),
+        'median': percentile(ready, 0.5),
+        'p95': p95,
+        'max': max(ready),
+        # Headroom over the slow tail, rounded up to whole minutes
+        'suggested_timeout': int(math.ceil(p95 * 1.5 / 60.0) * 60),
+    }
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _supports_check_mode = True
+
+    ARGUMENT_SPEC = dict(
+        host=dict(type='str'),
+        ssh_port=dict(type='int'),
+        api_port=dict(type='int'),
+        tcp_probe=dict(type='bool', default=True),
+        expect_reboot=dict(type='bool', default=True),
+        readiness_probe=dict(type='bool', default=True),
+        probe_module=dict(type='str', default='cisco.nxos.nxos_command'),
+        probe_commands=dict(type='list', elements='str', default=['show system uptime', 'show module']),
+        ready_module_states=dict(type='list', elements='str', default=['ok', 'active', 'ha-standby', 'standby']),
+        timeout=dict(type='int', default=900),
+        down_timeout=dict(type='int', default=120),
+        initial_delay=dict(type='float', default=0),
+        initial_interval=dict(type='float', default=2),
+        max_interval=dict(type='float', default=20),
+        backoff_factor=dict(type='float', default=1.5),
+        jitter=dict(type='float', default=0.2),
+        model=dict(type='str', default='unknown'),
+        history_path=dict(type='path'),
+    )
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=self.ARGUMENT_SPEC)
+        if not 0 <= args['jitter'] < 1:
+            raise AnsibleActionFail('reboot_detector jitter must be between 0 and 1')
+
+        if self._play_context.check_mode:
+            result.update(skipped=True, ready=False, msg='Reboot detection skipped in check mode')
+            return result
+
+        connection_vars = self._templar.template({
+            name: task_vars.get(name) for name in ('ansible_connection', 'ansible_host', 'ansible_port',
+                                                   'ansible_httpapi_port', 'ansible_httpapi_use_ssl')})
+        connection = connection_vars['ansible_connection'] or ''
+        tcp_probe = args['tcp_probe'] and connection != 'local'
+        host = args['host'] or connection_vars['ansible_host'] or task_vars.get('inventory_hostname')
+        # httpapi devices (FortiOS) serve HTTPS, not SSH: poll that port and accept any TCP connect
+        httpapi = connection.rsplit('.', 1)[-1] == 'httpapi'
+        if httpapi:
+            use_ssl = boolean(connection_vars['ansible_httpapi_use_ssl'] or False, strict=False)
+            port = int(connection_vars['ansible_httpapi_port'] or (443 if use_ssl else 80))
+        else:
+            port = args['ssh_port'] or int(connection_vars['ansible_port'] or 22)
+
+        start = time.monotonic()
+        deadline = start + args['timeout']
+        timings = {'down': None, 'up': None, 'ready': None}
+        checks = {'port': 0, 'probe': 0}
+        state = {'down_observed': False, 'uptime_seconds': None, 'last_error': None}
+
+        def elapsed():
+            return round(time.monotonic() - start, 1)
+
+        def sleep_until(seconds):
+            time.sleep(max(0.0, min(seconds, deadline - time.monotonic())))
+
+        sleep_until(args['initial_delay'])
+
+        # Phase 1: the reload only counts once the ports actually close
+        if args['expect_reboot'] and tcp_probe:
+            down_deadline = min(deadline, start + args['down_timeout'])
+            while time.monotonic() < down_deadline:
+                checks['port'] += 1
+                if not port_open(host, port):
+                    state['down_observed'] = True
+                    timings['down'] = elapsed()
+                    break
+                sleep_until(DOWN_POLL_SECONDS)
+
+        # Phase 2: ports answer again; phase 3: readiness probe passes
+        intervals = backoff_intervals(args['initial_interval'], args['backoff_factor'],
+                                      args['max_interval'], args['jitter'])
+        while time.monotonic() < deadline:
+            if timings['up'] is None:
+                if tcp_probe:
+                    checks['port'] += 1
+                    answered = port_open(host, port) if httpapi else ssh_banner(host, port) is not None
+                    if not answered or (args['api_port'] and not port_open(host, args['api_port'])):
+                        sleep_until(next(intervals))
+                        continue
+                timings['up'] = elapsed()
+                # Restart the backoff so the first probes follow the port coming up closely
+                intervals = backoff_intervals(args['initial_interval'], args['backoff_factor'],
+                                              args['max_interval'], args['jitter'])
+
+            if not args['readiness_probe'] or self._probe(args, start, state, task_vars):
+                timings['ready'] = elapsed()
+                break
+            checks['probe'] += 1
+            sleep_until(next(intervals))
+
+        ready = timings['ready'] is not None
+        result.update(
+            changed=False,
+            ready=ready,
+            down_observed=state['down_observed'],
+            timings=timings,
+            checks=checks,
+            port=port,
+            port_check='tcp' if httpapi else 'ssh_banner',
+        )
+        if state['uptime_seconds'] is not None:
+            result['uptime_seconds'] = state['uptime_seconds']
+
+        if not ready:
+            result['failed'] = True
+            result['msg'] = 'Device %s was not ready after %ss (%s)' % (
+                host, args['timeout'],
+                'ports never answered' if timings['up'] is None
+                else 'readiness probe failed: %s' % state['last_error'])
+            return result
+
+        if args['expect_reboot'] and args['history_path']:
+            sample = {
+                'host': task_vars.get('inventory_hostname'),
+                'recorded_at': int(time.time()),
+                'down_seconds': timings['down'],
+                'up_seconds': timings['up'],
+                'ready_seconds': timings['ready'],
+            }
+            try:
+                result['model_stats'] = record_duration(args['history_path'], args['model'], sample)
+            except OSError as e:
+                self._display.warning('Could not record reboot duration: %s' % to_native(e))
+        return result
+
+    def _probe(self, args, start, state, task_vars):
+        """Run the readiness commands; True once uptime has reset and all modules are ready."""
+        # The persistent connection from before the reload is dead; force a new session
+        try:
+            self._connection.reset()
+        except AttributeError:
+            pass
+        try:
+            probe = self._execute_module(module_name=args['probe_module'],
+                                         module_args={'commands': args['probe_commands']},
+                                         task_vars=task_vars)
+        except Exception as e:
+            state['last_error'] = to_native(e)
+            return False
+        if probe.get('failed'):
+            state['last_error'] = probe.get('msg', 'probe command failed')
+            return False
+
+        outputs = [to_native(output) for output in probe.get('stdout', [])]
+        if args['expect_reboot']:
+            uptimes = [seconds for seconds in map(parse_uptime_seconds, outputs) if seconds is not None]
+            if uptimes:
+                state['uptime_seconds'] = uptimes[0]
+                if uptimes[0] > time.monotonic() - start + UPTIME_SLACK_SECONDS:
+                    state['last_error'] = 'uptime %ss has not reset' % uptimes[0]
+                    return False
+            elif not state['down_observed']:
+                state['last_error'] = 'reboot not confirmed (no uptime in probe output, ports never closed)'
+                return False
+
+        ready_states = set(s.lower() for s in args['ready_module_states'])
+        for output in outputs:
+            pending = {module: status for module, status in parse_module_states(output).items()
+                       if status not in ready_states}
+            if pending:
+                state['last_error'] = 'modules not ready: %s' % ', '.join(
+                    '%s=%s' % item for item in sorted(pending.items()))
+                return False
+        return True
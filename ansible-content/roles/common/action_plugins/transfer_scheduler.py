@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible action plugin: reserve controller and site bandwidth before a firmware push.
+
+Every fork used to push its image as soon as it reached the transfer step, so
+with 50 forks the controller uplink and the WAN links to remote sites were
+oversubscribed, every transfer crawled and SCP sessions hit file_transfer_timeout.
+Pushes now reserve bandwidth in a controller-side ledger first: a reservation
+is granted only while the global and per-site budgets have room, so the pushes
+that run do so at full speed and the rest queue. Waiting pushes are served
+fairly across sites (the site with the fewest active transfers goes first,
+first come first served within a site), and leases of crashed runs expire.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import fcntl
+import json
+import os
+import socket
+import tempfile
+import time
+import uuid
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+DOCUMENTATION = r'''
+---
+action: transfer_scheduler
+short_description: Reserve or release bandwidth for a firmware transfer
+description:
+  - With I(state=acquire), queues a reservation of I(mbps) for I(site) and waits
+    until the global and site budgets have room for it, then returns a reservation ID.
+  - Waiting reservations are granted fairly across sites; a site whose budget is full
+    does not hold back other sites.
+  - With I(state=release), returns the reservation's bandwidth to the budgets.
+  - Reservations of controller processes that died, and leases older than
+    I(lease_seconds), are purged automatically.
+options:
+  state:
+    description: Acquire a reservation or release one.
+    type: str
+    choices: [acquire, release]
+    default: acquire
+  reservation_id:
+    description: Reservation to release (returned by I(state=acquire)).
+    type: str
+  site:
+    description: Site whose WAN budget the transfer uses.
+    type: str
+    default: default
+  mbps:
+    description: Bandwidth to reserve, capped at the site and global budgets.
+    type: float
+    default: 100
+  global_mbps:
+    description: Controller uplink budget shared by all transfers.
+    type: float
+    default: 1000
+  site_mbps:
+    description: WAN budget of I(site).
+    type: float
+    default: 200
+  ledger_path:
+    description: Controller JSON file holding active and waiting reservations.
+    type: path
+    required: true
+  timeout:
+    description: Maximum seconds to wait for the reservation.
+    type: int
+    default: 7200
+  lease_seconds:
+    description: Seconds after which an unreleased reservation is considered abandoned.
+    type: int
+    default: 14400
+  poll_interval:
+    description: Seconds between checks while waiting.
+    type: float
+    default: 2
+  size_bytes:
+    description: Size of the file to transfer, used to return the expected duration.
+    type: int
+'''
+
+EXAMPLES = r'''
+- name: Reserve transfer bandwidth
+  transfer_scheduler:
+    site: "{{ site_slug | default('default') }}"
+    mbps: "{{ transfer_bandwidth_per_transfer_mbps }}"
+    global_mbps: "{{ transfer_global_bandwidth_mbps }}"
+    site_mbps: "{{ transfer_site_bandwidth_mbps }}"
+    ledger_path: "{{ transfer_ledger_path }}"
+  register: transfer_reservation
+
+- name: Release transfer bandwidth
+  transfer_scheduler:
+    state: release
+    reservation_id: "{{ transfer_reservation.reservation_id }}"
+    ledger_path: "{{ transfer_ledger_path }}"
+'''
+
+RETURN = r'''
+reservation_id:
+  description: ID to pass to I(state=release).
+  returned: state=acquire
+  type: str
+mbps:
+  description: Bandwidth reserved for the transfer.
+  returned: state=acquire
+  type: float
+waited:
+  description: Seconds spent queued for bandwidth.
+  returned: state=acquire
+  type: float
+expected_seconds:
+  description: Transfer duration at the reserved rate.
+  returned: state=acquire and size_bytes is set
+  type: float
+active:
+  description: Active transfers and reserved Mbps, globally and for the site, after the grant.
+  returned: state=acquire
+  type: dict
+'''
+
+LEDGER_VERSION = 1
+# Waiting entries whose process stopped polling for this long are dropped
+WAITING_STALE_SECONDS = 60
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def _entry_alive(entry, now, node):
+    """False for leases past their expiry or owned by a process that no longer exists on this node."""
+    if entry.get('expires', now) < now:
+        return False
+    if entry.get('node') == node and not _pid_alive(entry.get('pid', 0)):
+        return False
+    return True
+
+
+def _usage(active, site=None):
+    entries = [entry for entry in active.values() if site is None or entry['site'] == site]
+    return len(entries), sum(entry['mbps'] for entry in entries)
+
+
+def grantable(ledger, reservation_id):
+    """
+    True if reservation_id gets bandwidth now.
+
+    Waiting reservations are served round-robin across sites: the next one
+    always comes from the site with the fewest transfers (active plus granted
+    in this pass), first come first served within a site. Each one that fits
+    the remaining budgets takes its share; one that does not fit is skipped, so
+    a full site never blocks a site that still has room.
+    """
+    global_used = 0.0
+    site_used = {}
+    site_load = {}
+    for entry in ledger['active'].values():
+        global_used += entry['mbps']
+        site_used[entry['site']] = site_used.get(entry['site'], 0) + entry['mbps']
+        site_load[entry['site']] = site_load.get(entry['site'], 0) + 1
+
+    queues = {}
+    waiting = ledger['waiting']
+    for rid in sorted(waiting, key=lambda rid: (waiting[rid]['since'], rid)):
+        queues.setdefault(waiting[rid]['site'], []).append(rid)
+    for queue in queues.values():
+        queue.reverse()
+
+    while queues:
+        site = min(queues, key=lambda name: (site_load.get(name, 0), waiting[queues[name][-1]]['since'], name))
+        rid = queues[site].pop()
+        if not queues[site]:
+            del queues[site]
+        entry = waiting[rid]
+        used = site_used.get(site, 0)
+        # mbps never exceeds the budgets, so the first request always fits an idle ledger
+        fits_global = global_used + entry['mbps'] <= entry['global_mbps'] + 1e-9
+        if fits_global and used + entry['mbps'] <= entry['site_mbps'] + 1e-9:
+            if rid == reservation_id:
+                return True
+            global_used += entry['mbps']
+            site_used[site] = used + entry['mbps']
+            site_load[site] = site_load.get(site, 0) + 1
+    return False
+
+
+class Ledger(object):
+    """Reservation ledger shared by all forks and concurrent runs on the controller."""
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.node = socket.gethostname()
+        self._lock = None
+        self.data = None
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = open(self.path + '.lock', 'a')
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        try:
+            with open(self.path, 'r') as handle:
+                self.data = json.load(handle)
+            if self.data.get('version') != LEDGER_VERSION:
+                self.data = {}
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault('active', {})
+        self.data.setdefault('waiting', {})
+        self.data['version'] = LEDGER_VERSION
+        self._purge()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.transfer-ledger-', suffix='.tmp')
+                with os.fdopen(fd, 'w') as handle:
+                    json.dump(self.data, handle, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+            self._lock.close()
+        return False
+
+    def _purge(self):
+        now = time.time()
+        for section in ('active', 'waiting'):
+            entries = self.data[section]
+            for rid in [rid for rid, entry in entries.items() if not _entry_alive(entry, now, self.node)]:
+                del entries[rid]
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _supports_check_mode = True
+
+    ARGUMENT_SPEC = dict(
+        state=dict(type='str', choices=['acquire', 'release'], default='acquire'),
+        reservation_id=dict(type='str'),
+        site=dict(type='str', default='default'),
+        mbps=dict(type='float', default=100),
+        global_mbps=dict(type='float', default=1000),
+        site_mbps=dict(type='float', default=200),
+        ledger_path=dict(type='path', required=True),
+        timeout=dict(type='int', default=7200),
+        lease_seconds=dict(type='int', default=14400),
+        poll_interval=dict(type='float', default=2),
+        size_bytes=dict(type='int'),
+    )
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=self.ARGUMENT_SPEC)
+
+        if args['state'] == 'release':
+            if not args['reservation_id']:
+                raise AnsibleActionFail('transfer_scheduler state=release requires reservation_id')
+            result.update(self._release(args))
+            return result
+
+        if min(args['mbps'], args['global_mbps'], args['site_mbps']) <= 0:
+            raise AnsibleActionFail('transfer_scheduler mbps, global_mbps and site_mbps must be positive')
+        mbps = min(args['mbps'], args['global_mbps'], args['site_mbps'])
+
+        if self._play_context.check_mode:
+            result.update(changed=False, reservation_id=None, mbps=mbps, waited=0.0,
+                          msg='Bandwidth reservation skipped in check mode')
+            return result
+
+        result.update(self._acquire(args, mbps, task_vars.get('inventory_hostname')))
+        if args['size_bytes'] and not result.get('failed'):
+            result['expected_seconds'] = round(args['size_bytes'] * 8 / (mbps * 1000000.0), 1)
+        return result
+
+    def _acquire(self, args, mbps, host):
+        reservation_id = uuid.uuid4().hex
+        start = time.monotonic()
+        deadline = start + args['timeout']
+        request = {
+            'host': host,
+            'site': args['site'],
+            'mbps': mbps,
+            'global_mbps': args['global_mbps'],
+            'site_mbps': args['site_mbps'],
+            'since': time.time(),
+            'node': socket.gethostname(),
+        }
+
+        while True:
+            with Ledger(args['ledger_path']) as ledger:
+                now = time.time()
+                waiting = ledger.data['waiting']
+                # The polling worker owns the request; once granted the lease belongs to the
+                # ansible-playbook process, which outlives the worker until the release task
+                waiting[reservation_id] = dict(request, pid=os.getpid(), expires=now + WAITING_STALE_SECONDS)
+                if grantable(ledger.data, reservation_id):
+                    del waiting[reservation_id]
+                    ledger.data['active'][reservation_id] = dict(
+                        request, pid=os.getppid(), granted=now, expires=now + args['lease_seconds'])
+                    count, reserved = _usage(ledger.data['active'])
+                    site_count, site_reserved = _usage(ledger.data['active'], args['site'])
+                    return dict(
+                        changed=True,
+                        reservation_id=reservation_id,
+                        site=args['site'],
+                        mbps=mbps,
+                        waited=round(time.monotonic() - start, 1),
+                        active={'transfers': count, 'mbps': reserved,
+                                'site_transfers': site_count, 'site_mbps': site_reserved},
+                    )
+                if time.monotonic() >= deadline:
+                    del waiting[reservation_id]
+                    count, reserved = _usage(ledger.data['active'])
+                    return dict(
+                        failed=True,
+                        reservation_id=None,
+                        waited=round(time.monotonic() - start, 1),
+                        msg='No transfer bandwidth for site %s within %ss (%d transfers using %s Mbps)'
+                            % (args['site'], args['timeout'], count, reserved),
+                    )
+            time.sleep(max(0.1, min(args['poll_interval'], deadline - time.monotonic())))
+
+    def _release(self, args):
+        with Ledger(args['ledger_path']) as ledger:
+            released = False
+            for section in ('active', 'waiting'):
+                if ledger.data[section].pop(args['reservation_id'], None) is not None:
+                    released = True
+        return dict(changed=released, released=released)
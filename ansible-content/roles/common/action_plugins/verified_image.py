@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible action plugin: controller-side record of firmware images verified on devices.
+
+Deciding whether an image already on bootflash can be used meant a full
+on-device SHA512 of the file on every run, which takes minutes of device CPU
+for a 2 GB NX-OS image. After each successful verification the device, file
+name, size, listing timestamp and SHA512 are recorded on the controller. A
+re-run only lists the file: when the listing still shows the recorded size and
+timestamp and the source image has the recorded SHA512, the image is known good
+and neither uploaded nor hashed again.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import fcntl
+import json
+import os
+import re
+import tempfile
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+DOCUMENTATION = r'''
+---
+action: verified_image
+short_description: Query or record firmware images verified on a device
+description:
+  - With I(state=record), stores I(filename) on I(device) as verified against the
+    source image digest I(sha512), with the size and timestamp shown for it in I(listing).
+  - With I(state=query), returns C(verified=true) when a record exists for the file,
+    I(listing) still shows the recorded size and timestamp, and I(sha512) matches
+    the recorded digest. Replacing or rewriting the file on the device changes its
+    listing, so a stale record is never used.
+  - I(listing) is the output of C(dir bootflash:) (or a filtered part of it) in
+    NX-OS or IOS-XE format.
+options:
+  state:
+    description: Query or record a verified image.
+    type: str
+    choices: [query, record]
+    default: query
+  device:
+    description: Device holding the image.
+    type: str
+    default: inventory_hostname
+  filename:
+    description: Image file name on the device.
+    type: str
+    required: true
+  listing:
+    description: Directory listing of the device file system.
+    type: str
+    required: true
+  sha512:
+    description: SHA512 of the source image on the controller.
+    type: str
+    required: true
+  device_digest:
+    description: Digest calculated on the device during verification (I(state=record)).
+    type: str
+  algorithm:
+    description: Algorithm of I(device_digest).
+    type: str
+    default: sha512
+  record_path:
+    description: Controller JSON file holding the records.
+    type: path
+    required: true
+'''
+
+EXAMPLES = r'''
+- name: Check for a previously verified image
+  verified_image:
+    filename: "{{ target_firmware }}"
+    listing: "{{ bootflash_listing.stdout[0] }}"
+    sha512: "{{ calculated_hash }}"
+    record_path: "{{ verified_image_record_path }}"
+  register: verified_image_query
+
+- name: Record verified image
+  verified_image:
+    state: record
+    filename: "{{ target_firmware }}"
+    listing: "{{ bootflash_listing.stdout[0] }}"
+    sha512: "{{ calculated_hash }}"
+    device_digest: "{{ transferred_file_hash }}"
+    record_path: "{{ verified_image_record_path }}"
+'''
+
+RETURN = r'''
+verified:
+  description: True when the image on the device matches a verified record.
+  returned: state=query
+  type: bool
+present:
+  description: True when I(filename) is in I(listing).
+  returned: always
+  type: bool
+reason:
+  description: Why the image is or is not verified (match, not_listed, no_record, source_changed, listing_changed).
+  returned: state=query
+  type: str
+record:
+  description: The stored record (device, filename, size, modified, sha512, device_digest, algorithm, verified_at).
+  returned: when a record exists or was written
+  type: dict
+'''
+
+RECORD_VERSION = 1
+MONTH = re.compile(r'^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)$')
+
+
+def listing_entry(listing, filename):
+    """
+    Size and timestamp of filename in a dir listing, or None when it is not listed.
+
+    NX-OS lines read "<size> <Mon> <dd> <hh:mm:ss> <yyyy> <name>" and IOS-XE lines
+    "<idx> <perm> <size> <Mon> <dd> <yyyy> <hh:mm:ss> <tz> <name>": the size is the
+    field before the month and the timestamp runs from the month to the name.
+    """
+    for line in (listing or '').splitlines():
+        fields = line.split()
+        if len(fields) < 3 or fields[-1] != filename:
+            continue
+        for index, field in enumerate(fields[:-1]):
+            if index and MONTH.match(field) and fields[index - 1].isdigit():
+                return {'size': int(fields[index - 1]), 'modified': ' '.join(fields[index:-1])}
+    return None
+
+
+class RecordStore(object):
+    """Verified image records shared by all forks and runs on the controller."""
+
+    def __init__(self, path, write=False):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.write = write
+        self._lock = None
+        self.data = None
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = open(self.path + '.lock', 'a')
+        fcntl.flock(self._lock, fcntl.LOCK_EX if self.write else fcntl.LOCK_SH)
+        try:
+            with open(self.path, 'r') as handle:
+                self.data = json.load(handle)
+            if self.data.get('version') != RECORD_VERSION:
+                self.data = {}
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault('devices', {})
+        self.data['version'] = RECORD_VERSION
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.write and exc_type is None:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.verified-images-', suffix='.tmp')
+                with os.fdopen(fd, 'w') as handle:
+                    json.dump(self.data, handle, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+            self._lock.close()
+        return False
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _supports_check_mode = True
+
+    ARGUMENT_SPEC = dict(
+        state=dict(type='str', choices=['query', 'record'], default='query'),
+        device=dict(type='str'),
+        filename=dict(type='str', required=True),
+        listing=dict(type='str', required=True),
+        sha512=dict(type='str', required=True),
+        device_digest=dict(type='str'),
+        algorithm=dict(type='str', default='sha512'),
+        record_path=dict(type='path', required=True),
+    )
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=self.ARGUMENT_SPEC)
+        device = args['device'] or task_vars.get('inventory_hostname')
+        entry = listing_entry(args['listing'], args['filename'])
+        result['present'] = entry is not None
+
+        if args['state'] == 'query':
+            with RecordStore(args['record_path']) as store:
+                record = store.data['devices'].get(device, {}).get(args['filename'])
+            result.update(changed=False, verified=False, record=record)
+            if entry is None:
+                result['reason'] = 'not_listed'
+            elif record is None:
+                result['reason'] = 'no_record'
+            elif record['sha512'] != args['sha512'].lower():
+                result['reason'] = 'source_changed'
+            elif (record['size'], record['modified']) != (entry['size'], entry['modified']):
+                result['reason'] = 'listing_changed'
+            else:
+                result.update(verified=True, reason='match')
+            return result
+
+        if entry is None:
+            raise AnsibleActionFail('verified_image cannot record %s: not in the %s listing'
+                                    % (args['filename'], device))
+        record = dict(
+            entry,
+            device=device,
+            filename=args['filename'],
+            sha512=args['sha512'].lower(),
+            device_digest=(args['device_digest'] or args['sha512']).lower(),
+            algorithm=args['algorithm'],
+            verified_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        )
+        if self._play_context.check_mode:
+            result.update(changed=False, record=record, msg='Verified image record skipped in check mode')
+            return result
+        with RecordStore(args['record_path'], write=True) as store:
+            store.data['devices'].setdefault(device, {})[args['filename']] = record
+        result.update(changed=True, record=record)
+        return result
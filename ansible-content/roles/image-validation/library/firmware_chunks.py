@@ -0,0 +1,327 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Ansible module: split a firmware image into digest-verified chunks on the controller.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: firmware_chunks
+short_description: Split a firmware image into fixed-size chunk files with per-chunk digests
+description:
+  - Splits a firmware image into I(chunk_size_mb) chunk files named
+    C(<image>.partNNNN) and records the offset, size, SHA512 and MD5 of every
+    chunk, plus the digests of the whole image, in a manifest.
+  - The chunk set is stored under I(store_dir) keyed by the image's real path,
+    inode, size and mtime_ns, so it is built once and reused by every host and
+    later run until the image changes.
+  - Concurrent forks serialize on a per-image lock, so the image is read at most once.
+  - Used by the resumable chunked transfer mode of the NX-OS and IOS-XE roles:
+    chunks already on the device are verified against the manifest and only
+    missing or corrupt chunks are sent again.
+  - With I(state=absent) the chunk set of the image is removed from I(store_dir).
+    Chunk sets are shared by all hosts sending the image, so remove them only
+    once every host has finished (image-validation chunk-cleanup.yml).
+  - In check mode no chunk files are written or removed; a missing chunk set is
+    planned by reading the image, so the returned chunks and digests are complete.
+  - Intended to run on the controller (C(delegate_to: localhost)).
+options:
+  path:
+    description: Path to the firmware image.
+    type: path
+    required: true
+  chunk_size_mb:
+    description: Chunk size in MiB.
+    type: int
+    default: 64
+  store_dir:
+    description: Directory holding chunk sets.
+    type: path
+    required: true
+  hash_cache_dir:
+    description:
+      - Firmware hash cache (see the firmware_hash module) to store the whole-image
+        SHA512 in, so it is not computed again.
+    type: path
+  state:
+    description: C(present) builds or reuses the chunk set, C(absent) removes it.
+    type: str
+    choices: [present, absent]
+    default: present
+'''
+
+EXAMPLES = r'''
+- name: Build firmware chunk manifest
+  firmware_chunks:
+    path: "{{ firmware_base_path }}/{{ target_firmware }}"
+    chunk_size_mb: "{{ firmware_chunk_size_mb }}"
+    store_dir: "{{ firmware_chunk_store_path }}"
+    hash_cache_dir: "{{ firmware_hash_cache_path }}"
+  register: firmware_chunk_manifest
+  delegate_to: localhost
+
+- name: Remove the chunk set after every host has sent the image
+  firmware_chunks:
+    path: "{{ firmware_base_path }}/{{ target_firmware }}"
+    chunk_size_mb: "{{ firmware_chunk_size_mb }}"
+    store_dir: "{{ firmware_chunk_store_path }}"
+    state: absent
+  delegate_to: localhost
+'''
+
+RETURN = r'''
+chunks:
+  description:
+    - Chunks in order, each with index, name, path (controller), offset, size, sha512 and md5.
+    - In check mode the paths of a chunk set that was not built yet do not exist.
+  returned: state=present
+  type: list
+  elements: dict
+size:
+  description: Image size in bytes.
+  returned: state=present
+  type: int
+chunk_size:
+  description: Chunk size in bytes.
+  returned: state=present
+  type: int
+sha512:
+  description: SHA512 of the whole image.
+  returned: state=present
+  type: str
+md5:
+  description: MD5 of the whole image.
+  returned: state=present
+  type: str
+cached:
+  description: True when an existing chunk set was reused and the image was not read.
+  returned: state=present
+  type: bool
+'''
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.firmware_hash_cache import READ_CHUNK_SIZE, file_identity, write_entry
+
+CHUNK_MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def chunk_set_dir(store_dir, identity):
+    """Directory of the chunk set for an image identity."""
+    key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(store_dir, key)
+
+
+def load_chunk_set(directory, identity):
+    """Return the manifest of a complete chunk set for identity, or None."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CHUNK_MANIFEST_VERSION or manifest.get('identity') != identity:
+        return None
+    for chunk in manifest['chunks']:
+        try:
+            if os.path.getsize(os.path.join(directory, chunk['name'])) != chunk['size']:
+                return None
+        except OSError:
+            return None
+    return manifest
+
+
+def split_image(path, identity, chunk_size, target_dir=None):
+    """
+    Read path in chunk_size pieces and return its manifest.
+
+    Chunk files are written to target_dir when given; without it the image is
+    only read (check mode).
+
+    Returns:
+        The manifest dict
+    """
+    name = os.path.basename(path)
+    chunks = []
+    whole_sha512 = hashlib.sha512()
+    whole_md5 = hashlib.md5()
+    with open(path, 'rb') as source:
+        offset = 0
+        while offset < identity['size'] or not chunks:
+            chunk_name = '%s.part%04d' % (name, len(chunks) + 1)
+            sha512 = hashlib.sha512()
+            md5 = hashlib.md5()
+            written = 0
+            target = open(os.path.join(target_dir, chunk_name), 'wb') if target_dir else None
+            try:
+                while written < chunk_size:
+                    data = source.read(min(READ_CHUNK_SIZE, chunk_size - written))
+                    if not data:
+                        break
+                    if target:
+                        target.write(data)
+                    for digest in (sha512, md5, whole_sha512, whole_md5):
+                        digest.update(data)
+                    written += len(data)
+            finally:
+                if target:
+                    target.close()
+            chunks.append({
+                'index': len(chunks) + 1,
+                'name': chunk_name,
+                'offset': offset,
+                'size': written,
+                'sha512': sha512.hexdigest(),
+                'md5': md5.hexdigest(),
+            })
+            offset += written
+            if not written:
+                break
+
+    return {
+        'version': CHUNK_MANIFEST_VERSION,
+        'identity': identity,
+        'chunk_size': chunk_size,
+        'size': identity['size'],
+        'sha512': whole_sha512.hexdigest(),
+        'md5': whole_md5.hexdigest(),
+        'chunks': chunks,
+    }
+
+
+def build_chunk_set(path, directory, identity, chunk_size):
+    """
+    Split path into chunk files in a temporary directory, then move it into place.
+
+    Returns:
+        The manifest dict
+    """
+    parent = os.path.dirname(directory)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.chunks-')
+    try:
+        manifest = split_image(path, identity, chunk_size, staging)
+        with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+        os.chmod(staging, 0o755)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.rename(staging, directory)
+        return manifest
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def get_chunk_set(path, chunk_size, store_dir, check_mode=False):
+    """
+    Return (manifest, directory, cached) for path, building the chunk set on a miss.
+
+    In check mode a missing chunk set is only planned; nothing is written.
+    """
+    identity = file_identity(path, 'chunks-%d' % chunk_size)
+    directory = chunk_set_dir(store_dir, identity)
+    manifest = load_chunk_set(directory, identity)
+    if manifest:
+        return manifest, directory, True
+    if check_mode:
+        return split_image(identity['path'], identity, chunk_size), directory, False
+
+    os.makedirs(store_dir, mode=0o755, exist_ok=True)
+    with open(directory + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another fork may have built the set while we waited for the lock
+            manifest = load_chunk_set(directory, identity)
+            if manifest:
+                return manifest, directory, True
+            manifest = build_chunk_set(identity['path'], directory, identity, chunk_size)
+            return manifest, directory, False
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def remove_chunk_set(path, chunk_size, store_dir, check_mode=False):
+    """
+    Remove the chunk set of path from store_dir.
+
+    Returns:
+        True if a chunk set was (or in check mode would be) removed
+    """
+    directory = chunk_set_dir(store_dir, file_identity(path, 'chunks-%d' % chunk_size))
+    if not os.path.isdir(directory):
+        return False
+    if check_mode:
+        return True
+    # The lock file is kept: removing it could let two forks build the same set at once
+    with open(directory + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.isdir(directory):
+                return False
+            shutil.rmtree(directory)
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', required=True),
+            chunk_size_mb=dict(type='int', default=64),
+            store_dir=dict(type='path', required=True),
+            hash_cache_dir=dict(type='path'),
+            state=dict(type='str', default='present', choices=['present', 'absent']),
+        ),
+        supports_check_mode=True,
+    )
+
+    path = module.params['path']
+    if not os.path.isfile(path):
+        module.fail_json(msg="Firmware file not found: %s" % path)
+    if module.params['chunk_size_mb'] < 1:
+        module.fail_json(msg="chunk_size_mb must be at least 1")
+    chunk_size = module.params['chunk_size_mb'] * 1024 * 1024
+
+    if module.params['state'] == 'absent':
+        try:
+            removed = remove_chunk_set(path, chunk_size, module.params['store_dir'], module.check_mode)
+        except OSError as e:
+            module.fail_json(msg="Failed to remove the chunk set of %s: %s" % (path, e))
+        module.exit_json(changed=removed)
+
+    try:
+        manifest, directory, cached = get_chunk_set(path, chunk_size, module.params['store_dir'], module.check_mode)
+        if not cached and not module.check_mode and module.params['hash_cache_dir']:
+            hash_identity = file_identity(path, 'sha512')
+            # Only when the image did not change while it was being split
+            identity = manifest['identity']
+            if (hash_identity['size'], hash_identity['mtime_ns']) == (identity['size'], identity['mtime_ns']):
+                os.makedirs(module.params['hash_cache_dir'], mode=0o755, exist_ok=True)
+                write_entry(module.params['hash_cache_dir'], hash_identity, manifest['sha512'])
+    except OSError as e:
+        module.fail_json(msg="Failed to split %s into chunks: %s" % (path, e))
+
+    chunks = [dict(chunk, path=os.path.join(directory, chunk['name'])) for chunk in manifest['chunks']]
+    module.exit_json(
+        changed=not cached,
+        cached=cached,
+        chunks=chunks,
+        size=manifest['size'],
+        chunk_size=manifest['chunk_size'],
+        sha512=manifest['sha512'],
+        md5=manifest['md5'],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Ansible module: compute a firmware image digest through the controller-side hash cache.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: firmware_hash
+short_description: Return the digest of a firmware image using a persistent hash cache
+description:
+  - Hashes a firmware image once and stores the digest in a content-addressed
+    cache keyed by the file's real path, inode, size and mtime_ns.
+  - Later lookups for the same unchanged file, from any host or later run,
+    return the cached digest without reading the image.
+  - Concurrent forks hashing the same image serialize on a per-entry lock, so
+    the image is read at most once.
+  - When a firmware manifest (written by
+    deployment/scripts/firmware-hash-precompute.py) has an entry for the
+    unchanged file, its digest is used instead of hashing.
+  - Intended to run on the controller (C(delegate_to: localhost)).
+options:
+  path:
+    description: Path to the firmware image.
+    type: path
+    required: true
+  algorithm:
+    description: Digest algorithm.
+    type: str
+    default: sha512
+    choices: [sha1, sha256, sha512]
+  cache_dir:
+    description:
+      - Directory holding cache entries.
+      - When omitted the image is hashed on every call.
+    type: path
+  manifest:
+    description:
+      - Firmware manifest consulted before hashing on a cache miss.
+      - Entries are only used when path, inode, size and mtime_ns all match.
+    type: path
+'''
+
+EXAMPLES = r'''
+- name: Calculate SHA512 hash of firmware file
+  firmware_hash:
+    path: "{{ firmware_base_path }}/{{ target_firmware }}"
+    cache_dir: "{{ firmware_hash_cache_path }}"
+    manifest: "{{ firmware_hash_manifest_path }}"
+  register: firmware_file_hash
+  delegate_to: localhost
+'''
+
+RETURN = r'''
+checksum:
+  description: Hex digest of the file.
+  returned: success
+  type: str
+cached:
+  description: True when the digest came from the cache or manifest and the image was not read.
+  returned: success
+  type: bool
+source:
+  description: Where the digest came from.
+  returned: success
+  type: str
+  choices: [cache, manifest, computed]
+size:
+  description: File size in bytes.
+  returned: success
+  type: int
+inode:
+  description: File inode number.
+  returned: success
+  type: int
+mtime_ns:
+  description: File modification time in nanoseconds.
+  returned: success
+  type: int
+'''
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.firmware_hash_cache import get_file_hash
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', required=True),
+            algorithm=dict(type='str', default='sha512', choices=['sha1', 'sha256', 'sha512']),
+            cache_dir=dict(type='path'),
+            manifest=dict(type='path'),
+        ),
+        supports_check_mode=True,
+    )
+
+    path = module.params['path']
+    if not os.path.isfile(path):
+        module.fail_json(msg="Firmware file not found: %s" % path)
+
+    try:
+        checksum, source, identity = get_file_hash(path, module.params['algorithm'],
+                                                   module.params['cache_dir'], module.params['manifest'])
+    except OSError as e:
+        module.fail_json(msg="Failed to hash %s: %s" % (path, e))
+
+    module.exit_json(
+        changed=False,
+        checksum=checksum,
+        cached=source != 'computed',
+        source=source,
+        size=identity['size'],
+        inode=identity['inode'],
+        mtime_ns=identity['mtime_ns'],
+    )
+
+
+if __name__ == '__main__':
+    main()
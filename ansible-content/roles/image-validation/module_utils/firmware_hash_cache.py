@@ -0,0 +1,193 @@
+"""
+Controller-side, content-addressed cache of firmware image digests.
+
+Each cache entry is a small JSON file named after the file identity
+(real path, device, inode, size, mtime_ns and algorithm). A firmware
+image is hashed once; later lookups from any host or run only cost an
+os.stat() and one small file read. Replacing or touching the image
+changes its identity, so stale digests are never returned.
+
+Concurrent Ansible forks serialize on a per-entry flock() lock, so only
+the first fork reads the image and the others pick up its result.
+
+A firmware manifest written by deployment/scripts/firmware-hash-precompute.py
+is consulted before hashing, so images pre-computed there are never re-read.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+CACHE_FORMAT_VERSION = 1
+MANIFEST_FORMAT_VERSION = 1
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def file_identity(path, algorithm, st=None):
+    """
+    Build the cache identity of a file.
+
+    Args:
+        path: Path to the file
+        algorithm: hashlib algorithm name (e.g. 'sha512')
+        st: Optional os.stat_result already taken for path
+
+    Returns:
+        dict with path, device, inode, size, mtime_ns and algorithm
+    """
+    real_path = os.path.realpath(path)
+    if st is None:
+        st = os.stat(real_path)
+    return {
+        'path': real_path,
+        'device': st.st_dev,
+        'inode': st.st_ino,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'algorithm': algorithm,
+    }
+
+
+def entry_path(cache_dir, identity):
+    """Return the cache entry file path for an identity."""
+    name = hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name + '.json')
+
+
+def read_entry(cache_dir, identity):
+    """
+    Look up a cached digest.
+
+    Returns:
+        The hex digest, or None when there is no valid entry for identity
+    """
+    try:
+        with open(entry_path(cache_dir, identity), 'r', encoding='utf-8') as handle:
+            entry = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if entry.get('version') != CACHE_FORMAT_VERSION or entry.get('identity') != identity:
+        return None
+    return entry.get('digest')
+
+
+def write_entry(cache_dir, identity, digest):
+    """Atomically store a digest for identity (write to temp file, then rename)."""
+    target = entry_path(cache_dir, identity)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.entry-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            json.dump({'version': CACHE_FORMAT_VERSION, 'identity': identity, 'digest': digest}, handle)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def hash_file(path, algorithm, chunk_size=READ_CHUNK_SIZE):
+    """
+    Hash a file in fixed-size chunks and return the hex digest.
+
+    The file is memory-mapped where possible so chunks are hashed straight
+    from the page cache without copying; otherwise it is read in chunk_size
+    buffers.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except (OSError, ValueError):
+            mapped = None
+        if mapped is None:
+            for chunk in iter(lambda: handle.read(chunk_size), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+        with mapped:
+            if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, chunk_size):
+                    digest.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def read_manifest_digest(manifest_path, identity):
+    """
+    Look up a digest in a firmware manifest.
+
+    Returns:
+        The hex digest, or None when the manifest is missing, unreadable or
+        has no entry whose identity matches the file exactly
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_FORMAT_VERSION:
+        return None
+    entry = manifest.get('files', {}).get(identity['path'])
+    if not entry or entry.get('identity') != identity:
+        return None
+    return entry.get('digest')
+
+
+def get_file_hash(path, algorithm='sha512', cache_dir=None, manifest_path=None):
+    """
+    Return the digest of path, reading the file only on a cache miss.
+
+    Args:
+        path: Path to the firmware file
+        algorithm: hashlib algorithm name
+        cache_dir: Cache directory; when None the file is not cached
+        manifest_path: Optional firmware manifest consulted before hashing
+
+    Returns:
+        tuple (digest, source, identity) - source is 'cache', 'manifest' or
+        'computed'; only 'computed' means file content was read by this call
+    """
+    identity = file_identity(path, algorithm)
+    if not cache_dir:
+        digest = read_manifest_digest(manifest_path, identity) if manifest_path else None
+        if digest:
+            return digest, 'manifest', identity
+        return hash_file(identity['path'], algorithm), 'computed', identity
+
+    digest = read_entry(cache_dir, identity)
+    if digest:
+        return digest, 'cache', identity
+
+    os.makedirs(cache_dir, mode=0o755, exist_ok=True)
+    lock_path = os.path.splitext(entry_path(cache_dir, identity))[0] + '.lock'
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another fork may have filled the entry while we waited for the lock
+            digest = read_entry(cache_dir, identity)
+            if digest:
+                return digest, 'cache', identity
+
+            digest = read_manifest_digest(manifest_path, identity) if manifest_path else None
+            if digest:
+                write_entry(cache_dir, identity, digest)
+                return digest, 'manifest', identity
+
+            digest = hash_file(identity['path'], algorithm)
+
+            # Only cache the digest if the file did not change while it was read
+            if file_identity(identity['path'], algorithm) == identity:
+                write_entry(cache_dir, identity, digest)
+            return digest, 'computed', identity
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
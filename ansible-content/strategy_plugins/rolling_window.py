@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Ansible strategy plugin: keep a sliding window of N devices in flight.
+
+With serial: N a play runs fixed batches, so one slow device holds back the
+next batch until it finishes. This strategy runs hosts independently (like the
+built-in free strategy) but admits at most max_concurrent of them at a time, and
+starts the next queued device as soon as any one finishes. Tags, blocks/rescue
+and includes behave exactly as with the free strategy.
+
+Queue wait (seconds between the start of the play and the device being admitted)
+is reported per device and exposed as the host variable rolling_window_queue_wait.
+
+When upgrade_plan_file points at a plan written by the upgrade_wave_plan filter
+(filter_plugins/upgrade_waves.py), devices are queued in plan wave order and a
+device is only admitted while none of its topology constraints (vPC pair, HA
+cluster, per-site and per-tier limits) is full and every device it must follow
+has finished. A device whose predecessor failed is held back, not started.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import time
+from collections import Counter
+
+from ansible.errors import AnsibleError
+from ansible.plugins.strategy.free import StrategyModule as FreeStrategyModule
+from ansible.template import Templar
+from ansible.utils.display import Display
+
+DOCUMENTATION = r'''
+---
+name: rolling_window
+short_description: Run hosts independently with at most max_concurrent in flight
+description:
+  - Like the C(free) strategy, each host runs through the play at its own pace.
+  - At most C(max_concurrent) hosts are in flight; when one finishes (or fails)
+    the next queued host starts immediately instead of waiting for a whole batch.
+  - Hosts are admitted in inventory order.
+  - Each host's queue wait is displayed and stored in the host variable
+    C(rolling_window_queue_wait), and a summary is shown at the end of the play.
+  - Do not combine with C(serial); the window replaces it.
+  - With an C(upgrade_plan_file), hosts start in plan wave order and only while their
+    topology constraints allow; hosts missing from the plan are queued last, unconstrained.
+options:
+  max_concurrent:
+    description: Window size, read from the play/inventory variable of the same name.
+    default: 5
+  upgrade_plan_file:
+    description: Path of an upgrade_wave_plan JSON plan, read from the variable of the same name.
+    default: null
+author: Network Operations
+'''
+
+display = Display()
+
+DEFAULT_WINDOW = 5
+
+
+class StrategyModule(FreeStrategyModule):
+
+    def __init__(self, tqm):
+        super(StrategyModule, self).__init__(tqm)
+        self._window_size = None
+        self._play_started = None
+        self._queued = []
+        self._slots = []
+        self._active = set()
+        self._queue_wait = {}
+        self._plan = {}
+        self._in_flight = Counter()
+        self._unfinished = set()
+        self._held = []
+        self._changed = True
+
+    def run(self, iterator, play_context):
+        self._play_started = time.monotonic()
+        self._set_hosts_cache(iterator._play)
+        task_vars = self._play_vars(iterator)
+        self._window_size = self._resolve_window_size(task_vars)
+        self._plan = self._load_plan(task_vars)
+        self._queued = list(super(StrategyModule, self).get_hosts_left(iterator))
+        if self._plan:
+            last = max([entry['wave'] for entry in self._plan.values()] or [0]) + 1
+            self._queued.sort(key=lambda host: self._plan.get(host.get_name(), {}).get('wave', last))
+        self._slots = []
+        self._active = set()
+        self._queue_wait = {}
+        self._in_flight = Counter()
+        self._unfinished = set(host.get_name() for host in self._queued)
+        self._held = []
+        self._changed = True
+
+        display.display('rolling_window: %d hosts, at most %d in flight%s'
+                        % (len(self._queued), self._window_size, ', following upgrade plan' if self._plan else ''))
+        result = super(StrategyModule, self).run(iterator, play_context)
+        self._display_summary()
+        return result
+
+    def _play_vars(self, iterator):
+        """Variables of the play's first host (extra vars > play vars > inventory)."""
+        hosts = super(StrategyModule, self).get_hosts_left(iterator)
+        return self._variable_manager.get_vars(play=iterator._play, host=hosts[0] if hosts else None,
+                                               _hosts=self._hosts_cache, _hosts_all=self._hosts_cache_all)
+
+    def _resolve_window_size(self, task_vars):
+        templar = Templar(loader=self._loader, variables=task_vars)
+        try:
+            size = int(templar.template(task_vars.get('max_concurrent', DEFAULT_WINDOW)))
+        except (TypeError, ValueError) as e:
+            display.warning('rolling_window: invalid max_concurrent (%s), using %d' % (e, DEFAULT_WINDOW))
+            size = DEFAULT_WINDOW
+        return max(1, size)
+
+    def _load_plan(self, task_vars):
+        """Per-host plan entries from upgrade_plan_file, or {} when no plan is configured."""
+        templar = Templar(loader=self._loader, variables=task_vars)
+        path = templar.template(task_vars.get('upgrade_plan_file') or '')
+        if not path:
+            return {}
+        if not os.path.exists(path):
+            display.warning('rolling_window: upgrade plan %s not found, running without topology constraints' % path)
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)['hosts']
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            raise AnsibleError('rolling_window: cannot read upgrade plan %s: %s' % (path, e))
+
+    def _host_done(self, iterator, host):
+        """A host leaves the window once it has no task left and none in flight."""
+        name = host.get_name()
+        if self._tqm._unreachable_hosts.get(name, False):
+            return True
+        if self._blocked_hosts.get(name, False):
+            return False
+        _, task = iterator.get_next_task_for_host(host, peek=True)
+        return task is None
+
+    def _failed(self, name):
+        return self._tqm._unreachable_hosts.get(name, False) or self._tqm._failed_hosts.get(name, False)
+
+    def _can_admit(self, host):
+        """Admission constraints beyond the window size, from the upgrade plan."""
+        entry = self._plan.get(host.get_name())
+        if not entry:
+            return True
+        if any(pred in self._unfinished for pred in entry.get('after', ())):
+            return False
+        return all(self._in_flight[key] < limit for key, limit in entry.get('constraints', {}).items())
+
+    def _must_hold(self, host):
+        """A host waiting on a device that failed is not started at all."""
+        entry = self._plan.get(host.get_name(), {})
+        return any(self._failed(pred) for pred in entry.get('after', ()))
+
+    def _admit(self, host):
+        name = host.get_name()
+        waited = time.monotonic() - self._play_started
+        self._queue_wait[name] = waited
+        self._variable_manager.set_host_variable(name, 'rolling_window_queue_wait', round(waited, 1))
+        self._active.add(name)
+        self._in_flight.update(self._plan.get(name, {}).get('constraints', {}).keys())
+        if name in self._plan:
+            self._variable_manager.set_host_variable(name, 'upgrade_wave', self._plan[name]['wave'])
+        display.display('rolling_window: starting %s after %.1fs in queue (%d in flight, %d queued)'
+                        % (name, waited, len(self._active), len(self._queued)))
+
+    def _release(self, host):
+        name = host.get_name()
+        self._active.discard(name)
+        self._unfinished.discard(name)
+        self._in_flight.subtract(self._plan.get(name, {}).get('constraints', {}).keys())
+        self._changed = True
+
+    def get_hosts_left(self, iterator):
+        # Each slot holds an in-flight host, or a finished one until a queued host
+        # replaces it; the list never shrinks because the free strategy keeps its
+        # round-robin position between calls
+        for index, host in enumerate(self._slots):
+            if host.get_name() in self._active and self._host_done(iterator, host):
+                self._release(host)
+            if host.get_name() not in self._active:
+                replacement = self._next_admissible()
+                if replacement is not None:
+                    self._slots[index] = replacement
+                    self._admit(replacement)
+
+        while len(self._slots) < self._window_size:
+            replacement = self._next_admissible()
+            if replacement is None:
+                break
+            self._slots.append(replacement)
+            self._admit(replacement)
+
+        return list(self._slots)
+
+    def _next_admissible(self):
+        """Pop the first queued host allowed to start, or None."""
+        # Admission only changes when a host finishes, so skip rescanning the queue until then
+        if not self._changed:
+            return None
+        for host in list(self._queued):
+            name = host.get_name()
+            if self._tqm._unreachable_hosts.get(name, False):
+                continue
+            if self._must_hold(host):
+                self._queued.remove(host)
+                self._unfinished.discard(name)
+                self._held.append(host)
+                display.warning('rolling_window: holding back %s, a device it must follow failed' % name)
+                continue
+            # Never leave the window idle: with nothing in flight the first queued host starts regardless
+            if not self._active or self._can_admit(host):
+                self._queued.remove(host)
+                return host
+        self._changed = False
+        return None
+
+    def _display_summary(self):
+        if not self._queue_wait:
+            return
+        waits = sorted(self._queue_wait.values())
+        display.display('rolling_window: %d hosts, window %d, queue wait avg %.1fs, max %.1fs'
+                        % (len(waits), self._window_size, sum(waits) / len(waits), waits[-1]))
+        if self._held:
+            display.warning('rolling_window: %d hosts held back by the upgrade plan: %s'
+                            % (len(self._held), ', '.join(host.get_name() for host in self._held)))
+        if self._queued:
+            display.warning('rolling_window: %d hosts were never started: %s'
+                            % (len(self._queued), ', '.join(host.get_name() for host in self._queued)))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Firmware repository SHA512 pre-computation
+Hashes every image under firmware_base_path in parallel, verifies existing
+.sha512sum sidecars and writes the manifest read by image-validation's
+firmware_hash module, so upgrades never re-hash a pre-computed image.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'ansible-content', 'roles', 'image-validation', 'module_utils'))
+
+from firmware_hash_cache import (  # noqa: E402
+    MANIFEST_FORMAT_VERSION,
+    file_identity,
+    hash_file,
+)
+
+
+DEFAULT_FIRMWARE_PATH = "/var/lib/network-upgrade/firmware"
+DEFAULT_MANIFEST_NAME = "firmware-manifest.json"
+DEFAULT_SIDECAR_EXTENSION = "sha512sum"
+ALGORITHM = "sha512"
+
+
+def hash_worker(path, chunk_size):
+    """Hash one image in a pool worker and return its timing for per-worker reporting"""
+    start = time.perf_counter()
+    identity = file_identity(path, ALGORITHM)
+    digest = hash_file(identity['path'], ALGORITHM, chunk_size)
+    elapsed = time.perf_counter() - start
+    # Never record a digest for a file that changed while it was being read
+    if file_identity(identity['path'], ALGORITHM) != identity:
+        raise RuntimeError(f"{path} changed while it was being hashed")
+    return {
+        'identity': identity,
+        'digest': digest,
+        'worker': os.getpid(),
+        'bytes': identity['size'],
+        'seconds': elapsed,
+    }
+
+
+def read_sidecar(path):
+    """Return the digest from a 'sha512sum' style sidecar, or None if it is unusable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as handle:
+            fields = handle.read().split()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not fields:
+        return None
+    digest = fields[0].strip().lower()
+    if len(digest) != 128 or any(c not in '0123456789abcdef' for c in digest):
+        return None
+    return digest
+
+
+class FirmwareHashPrecompute:
+    def __init__(self, firmware_path, manifest_path, sidecar_extension, workers, chunk_size,
+                 write_sidecars=False, force=False):
+        self.firmware_path = os.path.realpath(firmware_path)
+        self.manifest_path = manifest_path
+        self.sidecar_extension = sidecar_extension
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.write_sidecars = write_sidecars
+        self.force = force
+        self.worker_stats = {}
+        self.skipped = {}
+
+    def discover_images(self):
+        """Return real paths of all firmware images (sidecars, manifest and dotfiles skipped)"""
+        manifest_real = os.path.realpath(self.manifest_path)
+        images = []
+        for root, dirs, files in os.walk(self.firmware_path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or name.endswith('.' + self.sidecar_extension):
+                    continue
+                path = os.path.realpath(os.path.join(root, name))
+                if path != manifest_real and os.path.isfile(path):
+                    images.append(path)
+        return images
+
+    def load_manifest(self):
+        """Return the files section of an existing manifest, or {}"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != MANIFEST_FORMAT_VERSION:
+            return {}
+        return manifest.get('files', {})
+
+    def hash_images(self, images, previous):
+        """
+        Hash images whose identity is not already in the previous manifest
+
+        Images that vanish or change while being hashed are left out of the
+        result and recorded in self.skipped, so the rest still reach the manifest.
+        """
+        entries = {}
+        pending = []
+        for path in images:
+            old = previous.get(path)
+            try:
+                identity = file_identity(path, ALGORITHM)
+            except OSError as e:
+                self.skipped[path] = str(e)
+                continue
+            if not self.force and old and old.get('identity') == identity:
+                entries[path] = {'identity': old['identity'], 'digest': old['digest'], 'reused': True}
+            else:
+                pending.append(path)
+
+        if not pending:
+            return entries
+
+        # Largest images first so the pool does not finish on one long straggler
+        pending.sort(key=lambda p: os.path.getsize(p) if os.path.exists(p) else 0, reverse=True)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(hash_worker, path, self.chunk_size): path for path in pending}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except (OSError, RuntimeError) as e:
+                    self.skipped[futures[future]] = str(e)
+                    continue
+                entries[futures[future]] = {'identity': result['identity'], 'digest': result['digest'],
+                                            'reused': False}
+                stats = self.worker_stats.setdefault(result['worker'], {'files': 0, 'bytes': 0, 'seconds': 0.0})
+                stats['files'] += 1
+                stats['bytes'] += result['bytes']
+                stats['seconds'] += result['seconds']
+        return entries
+
+    def check_sidecar(self, path, digest):
+        """Verify (or create) the sidecar of one image and return its status"""
+        sidecar = f"{path}.{self.sidecar_extension}"
+        if not os.path.exists(sidecar):
+            if self.write_sidecars:
+                with open(sidecar, 'w', encoding='utf-8') as handle:
+                    handle.write(f"{digest}  {os.path.basename(path)}\n")
+                return 'created'
+            return 'missing'
+        expected = read_sidecar(sidecar)
+        if expected is None:
+            return 'invalid'
+        return 'verified' if expected == digest else 'mismatch'
+
+    def write_manifest(self, entries):
+        """Atomically write the manifest consumed by the firmware_hash module"""
+        manifest = {
+            'version': MANIFEST_FORMAT_VERSION,
+            'algorithm': ALGORITHM,
+            'base_path': self.firmware_path,
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'files': {
+                path: {
+                    'identity': entry['identity'],
+                    'digest': entry['digest'],
+                    'sidecar': entry['sidecar'],
+                }
+                for path, entry in sorted(entries.items())
+            },
+        }
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.manifest-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                json.dump(manifest, handle, indent=2)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return manifest
+
+    def run(self):
+        """Hash, verify and write the manifest; return a summary dict"""
+        start = time.perf_counter()
+        images = self.discover_images()
+        entries = self.hash_images(images, self.load_manifest())
+        for path, entry in entries.items():
+            entry['sidecar'] = self.check_sidecar(path, entry['digest'])
+        self.write_manifest(entries)
+        wall_seconds = time.perf_counter() - start
+
+        hashed_bytes = sum(stats['bytes'] for stats in self.worker_stats.values())
+        sidecar_counts = {}
+        for entry in entries.values():
+            sidecar_counts[entry['sidecar']] = sidecar_counts.get(entry['sidecar'], 0) + 1
+        return {
+            'images': len(entries),
+            'hashed': sum(1 for entry in entries.values() if not entry['reused']),
+            'reused': sum(1 for entry in entries.values() if entry['reused']),
+            'hashed_bytes': hashed_bytes,
+            'wall_seconds': wall_seconds,
+            'aggregate_mb_per_second': hashed_bytes / (1024 * 1024) / wall_seconds if wall_seconds else 0.0,
+            'workers': {
+                str(pid): dict(stats, mb_per_second=stats['bytes'] / (1024 * 1024) / stats['seconds']
+                               if stats['seconds'] else 0.0)
+                for pid, stats in sorted(self.worker_stats.items())
+            },
+            'sidecars': sidecar_counts,
+            'problems': {
+                path: entry['sidecar'] for path, entry in sorted(entries.items())
+                if entry['sidecar'] in ('mismatch', 'invalid')
+            },
+            'skipped': dict(sorted(self.skipped.items())),
+        }
+
+
+def print_report(summary, manifest_path):
+    """Print a human readable summary with per-worker throughput"""
+    print(f"Images: {summary['images']} (hashed {summary['hashed']}, reused {summary['reused']})")
+    print(f"Hashed: {summary['hashed_bytes'] / (1024 * 1024):.1f} MB in {summary['wall_seconds']:.2f}s "
+          f"({summary['aggregate_mb_per_second']:.1f} MB/s aggregate)")
+    if summary['workers']:
+        print(f"{'worker':>10} {'files':>6} {'MB':>10} {'seconds':>9} {'MB/s':>8}")
+        for pid, stats in summary['workers'].items():
+            print(f"{pid:>10} {stats['files']:>6} {stats['bytes'] / (1024 * 1024):>10.1f} "
+                  f"{stats['seconds']:>9.2f} {stats['mb_per_second']:>8.1f}")
+    print("Sidecars: " + ", ".join(f"{status}={count}" for status, count in sorted(summary['sidecars'].items())))
+    for path, status in summary['problems'].items():
+        print(f"❌ {status.upper()}: {path}")
+    for path, reason in summary['skipped'].items():
+        print(f"⚠️  SKIPPED (not in manifest, re-run to hash): {path}: {reason}")
+    print(f"Manifest written to: {manifest_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-compute SHA512 digests for the firmware repository')
+    parser.add_argument('--firmware-path', default=DEFAULT_FIRMWARE_PATH,
+                        help=f'Firmware repository to scan (default: {DEFAULT_FIRMWARE_PATH})')
+    parser.add_argument('--manifest',
+                        help=f'Manifest output path (default: <firmware-path>/{DEFAULT_MANIFEST_NAME})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Hashing processes (default: CPU count)')
+    parser.add_argument('--chunk-size-mb', type=int, default=8,
+                        help='Bytes hashed per update call, in MB (default: 8)')
+    parser.add_argument('--sidecar-extension', default=DEFAULT_SIDECAR_EXTENSION,
+                        help=f'Hash sidecar extension (default: {DEFAULT_SIDECAR_EXTENSION})')
+    parser.add_argument('--write-sidecars', action='store_true',
+                        help='Create missing sidecars from the computed digest')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-hash images even if the existing manifest entry is current')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.firmware_path):
+        print(f"Firmware path not found: {args.firmware_path}", file=sys.stderr)
+        return 2
+
+    manifest_path = args.manifest or os.path.join(args.firmware_path, DEFAULT_MANIFEST_NAME)
+    precompute = FirmwareHashPrecompute(
+        firmware_path=args.firmware_path,
+        manifest_path=manifest_path,
+        sidecar_extension=args.sidecar_extension,
+        workers=max(1, args.workers),
+        chunk_size=max(1, args.chunk_size_mb) * 1024 * 1024,
+        write_sidecars=args.write_sidecars,
+        force=args.force,
+    )
+    summary = precompute.run()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary, manifest_path)
+
+    return 1 if summary['problems'] or summary['skipped'] else 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\nHash pre-computation interrupted by user")
+        sys.exit(1)
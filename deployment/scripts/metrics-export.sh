@@ -0,0 +1,28 @@
+#!/bin/bash
+
+# Metrics Export for Network Upgrade System
+# Incrementally exports result files under /var/lib/network-upgrade/{metrics,validation,compliance}
+# to InfluxDB v2 in gzip batches (see metrics_export.py for the checkpoint/tail logic)
+#
+# Usage:
+#   metrics-export.sh                 # one export pass (cron / systemd timer)
+#   metrics-export.sh --follow        # keep running, export every 30s
+#   metrics-export.sh --output stdout # print line protocol instead of writing
+#
+# InfluxDB settings come from the environment (INFLUX_URL, INFLUX_ORG, INFLUX_BUCKET,
+# INFLUX_TOKEN) or from /etc/network-upgrade/metrics-export.env when present.
+
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+ENV_FILE="${METRICS_EXPORT_ENV_FILE:-/etc/network-upgrade/metrics-export.env}"
+PYTHON="${PYTHON:-python3}"
+
+if [[ -r "${ENV_FILE}" ]]; then
+    set -a
+    # shellcheck source=/dev/null
+    source "${ENV_FILE}"
+    set +a
+fi
+
+exec "${PYTHON}" "${SCRIPT_DIR}/metrics_export.py" "$@"
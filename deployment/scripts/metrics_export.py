@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Incremental bulk exporter for network upgrade result files
+Tails JSON results under /var/lib/network-upgrade/{metrics,validation,compliance},
+converts them to InfluxDB line protocol and writes them in large gzip batches.
+
+A checkpoint records each file's inode, size, mtime_ns and read offset, so a
+pass only reads files that are new or changed since the last export:
+  - *.json documents are emitted once per version (new inode, size or mtime)
+  - *.jsonl / *.ndjson files are tailed from the last complete line
+The checkpoint only advances after InfluxDB accepted the batch (at-least-once).
+A batch InfluxDB rejects as invalid (HTTP 400/422) cannot succeed on retry; it
+is appended to a rejected-points file and the checkpoint moves past it.
+"""
+
+import os
+import sys
+import json
+import gzip
+import math
+import time
+import argparse
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+
+DEFAULT_BASE_PATH = "/var/lib/network-upgrade"
+DEFAULT_CHECKPOINT = "cache/metrics-export-checkpoint.json"
+DEFAULT_REJECTED = "cache/metrics-export-rejected.lp"
+
+# Result directory -> measurement (same names the Telegraf file inputs used)
+SOURCES = {
+    'metrics': 'device_metrics',
+    'validation': 'validation_metrics',
+    'compliance': 'compliance_metrics',
+}
+
+# Top-level string fields promoted to tags; all other strings are skipped
+TAG_KEYS = ('device_id', 'device_name', 'hostname', 'platform', 'site', 'phase', 'status', 'metric_type')
+TIMESTAMP_KEYS = ('timestamp', 'audit_timestamp', 'validation_timestamp')
+DOCUMENT_SUFFIXES = ('.json',)
+LINE_SUFFIXES = ('.jsonl', '.ndjson')
+CHECKPOINT_VERSION = 1
+# InfluxDB responses for batches that are refused as invalid rather than failed
+REJECTED_STATUSES = (400, 422)
+
+
+def escape_key(value):
+    """Escape a measurement, tag key, tag value or field key for line protocol."""
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+
+def parse_timestamp_ns(value):
+    """Parse an ISO-8601 timestamp into epoch nanoseconds, or None."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return int(parsed.timestamp() * 1_000_000_000)
+
+
+def flatten_fields(value, prefix, fields):
+    """
+    Flatten nested numeric/boolean leaves into fields joined with '_' (Telegraf json style).
+
+    NaN and infinity have no line-protocol representation and are skipped.
+    """
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flatten_fields(child, f"{prefix}_{key}" if prefix else str(key), fields)
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            flatten_fields(child, f"{prefix}_{index}" if prefix else str(index), fields)
+    elif isinstance(value, bool):
+        fields[prefix] = 'true' if value else 'false'
+    elif isinstance(value, (int, float)) and math.isfinite(value):
+        fields[prefix] = repr(float(value))
+
+
+def document_to_points(document, measurement, default_tags, default_timestamp_ns):
+    """
+    Convert one JSON result (object, or array of objects) into line-protocol points.
+
+    Returns:
+        List of line-protocol strings (records without numeric fields are skipped)
+    """
+    records = document if isinstance(document, list) else [document]
+    points = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        tags = dict(default_tags)
+        timestamp_ns = default_timestamp_ns
+        for key in TAG_KEYS:
+            if isinstance(record.get(key), str) and record[key]:
+                tags[key] = record[key]
+        for key in TIMESTAMP_KEYS:
+            parsed = parse_timestamp_ns(record.get(key))
+            if parsed is not None:
+                timestamp_ns = parsed
+                break
+        fields = {}
+        flatten_fields(record, '', fields)
+        if not fields:
+            continue
+        series = escape_key(measurement) + ''.join(
+            f",{escape_key(k)}={escape_key(v)}" for k, v in sorted(tags.items()))
+        field_set = ','.join(f"{escape_key(k)}={v}" for k, v in fields.items())
+        points.append(f"{series} {field_set} {timestamp_ns}")
+    return points
+
+
+class Checkpoint:
+    """Per-file read state persisted atomically as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as handle:
+                data = json.load(handle)
+            if data.get('version') == CHECKPOINT_VERSION:
+                self.files = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            json.dump({'version': CHECKPOINT_VERSION, 'files': self.files}, handle)
+        os.replace(tmp_path, self.path)
+
+
+class ResultTailer:
+    """Find new or changed result files and read only their unread content."""
+
+    def __init__(self, base_path, sources, checkpoint):
+        self.base_path = base_path
+        self.sources = sources
+        self.checkpoint = checkpoint
+
+    def iter_files(self):
+        """Yield (path, source directory name) for every result file."""
+        for source in self.sources:
+            root_dir = os.path.join(self.base_path, source)
+            for root, dirs, files in os.walk(root_dir):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(files):
+                    if name.endswith(DOCUMENT_SUFFIXES + LINE_SUFFIXES) and not name.startswith('.'):
+                        yield os.path.join(root, name), source
+
+    def source_for(self, path):
+        """Return the source directory name a result path belongs to, or None."""
+        for source in self.sources:
+            root_dir = os.path.join(self.base_path, source) + os.sep
+            if path.startswith(root_dir):
+                name = os.path.basename(path)
+                if name.endswith(DOCUMENT_SUFFIXES + LINE_SUFFIXES) and not name.startswith('.'):
+                    return source
+        return None
+
+    def default_tags(self, path, source):
+        # Results are written per host: <source>/<inventory_hostname>/<file>.json
+        relative = os.path.relpath(path, os.path.join(self.base_path, source))
+        parts = relative.split(os.sep)
+        return {'device_id': parts[0]} if len(parts) > 1 else {}
+
+    def read_changes(self, path, source):
+        """
+        Read a file's unread content.
+
+        Returns:
+            (points, new_state) or None when the file is unchanged
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        state = self.checkpoint.files.get(path)
+        identity = {'inode': st.st_ino, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        if state and all(state.get(k) == v for k, v in identity.items()):
+            return None
+
+        measurement = SOURCES.get(source, f"{source}_metrics")
+        tags = self.default_tags(path, source)
+
+        if path.endswith(LINE_SUFFIXES):
+            offset = state['offset'] if state and state.get('inode') == st.st_ino and \
+                state.get('offset', 0) <= st.st_size else 0
+            with open(path, 'rb') as handle:
+                handle.seek(offset)
+                data = handle.read(st.st_size - offset)
+            complete = data[:data.rfind(b'\n') + 1]
+            points = []
+            for raw in complete.splitlines():
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                points.extend(document_to_points(record, measurement, tags, st.st_mtime_ns))
+            # Only the complete lines count as read; a partial last line is re-read next pass
+            return points, dict(identity, offset=offset + len(complete))
+
+        try:
+            with open(path, 'r', encoding='utf-8') as handle:
+                document = json.load(handle)
+        except ValueError:
+            # Probably still being written; retry once it is complete and valid
+            if time.time_ns() - st.st_mtime_ns < 60 * 1_000_000_000:
+                return None
+            return [], dict(identity, offset=st.st_size, error='invalid JSON')
+        return document_to_points(document, measurement, tags, st.st_mtime_ns), dict(identity, offset=st.st_size)
+
+    def prune(self, seen):
+        """Drop checkpoint entries for files that no longer exist."""
+        for path in [p for p in self.checkpoint.files if p not in seen]:
+            del self.checkpoint.files[path]
+
+
+class InfluxWriter:
+    """Write line protocol to InfluxDB v2 in gzip-compressed batches."""
+
+    def __init__(self, url, token, org, bucket, rejected_path, timeout=30):
+        self.write_url = f"{url.rstrip('/')}/api/v2/write?" + urllib.parse.urlencode(
+            {'org': org, 'bucket': bucket, 'precision': 'ns'})
+        self.headers = {
+            'Authorization': f"Token {token}",
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Encoding': 'gzip',
+        }
+        self.timeout = timeout
+        self.rejected_path = rejected_path
+        self.rejected = 0
+
+    def write(self, points):
+        body = gzip.compress(('\n'.join(points) + '\n').encode('utf-8'), compresslevel=5)
+        request = urllib.request.Request(self.write_url, data=body, headers=self.headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            if e.code not in REJECTED_STATUSES:
+                raise
+            detail = e.read().decode('utf-8', 'replace').strip()
+            self.quarantine(points)
+            print(f"InfluxDB rejected {len(points)} points (HTTP {e.code}: {detail}); "
+                  f"saved to {self.rejected_path}", file=sys.stderr)
+            return e.code
+
+    def quarantine(self, points):
+        """Append a rejected batch to the rejected-points file for inspection or replay."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.rejected_path)), exist_ok=True)
+        with open(self.rejected_path, 'a', encoding='utf-8') as handle:
+            handle.write('\n'.join(points) + '\n')
+        self.rejected += len(points)
+
+
+class StdoutWriter:
+    """Print line protocol (for Telegraf exec/execd inputs or inspection)."""
+
+    def write(self, points):
+        sys.stdout.write('\n'.join(points) + '\n')
+        sys.stdout.flush()
+
+
+def export_files(tailer, writer, files, batch_size):
+    """
+    Export the unread content of the given (path, source) files.
+
+    Points are written in batches of up to batch_size; the checkpoint is
+    saved after each accepted batch for the files it completed.
+
+    Returns:
+        dict with files, points and batches counts
+    """
+    stats = {'files': 0, 'points': 0, 'batches': 0}
+    batch = []
+    batch_states = {}
+
+    def flush():
+        if batch:
+            writer.write(batch)
+            stats['batches'] += 1
+            stats['points'] += len(batch)
+            batch.clear()
+        if batch_states:
+            tailer.checkpoint.files.update(batch_states)
+            batch_states.clear()
+            tailer.checkpoint.save()
+
+    for path, source in files:
+        change = tailer.read_changes(path, source)
+        if change is None:
+            continue
+        points, state = change
+        stats['files'] += 1
+        batch.extend(points)
+        batch_states[path] = state
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+def export_pass(tailer, writer, batch_size):
+    """
+    Export all unread results once and forget files that were deleted.
+
+    Returns:
+        dict with files, points and batches counts
+    """
+    files = list(tailer.iter_files())
+    stats = export_files(tailer, writer, files, batch_size)
+
+    before = len(tailer.checkpoint.files)
+    tailer.prune({path for path, _ in files})
+    if len(tailer.checkpoint.files) != before:
+        tailer.checkpoint.save()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export network upgrade result files to InfluxDB')
+    parser.add_argument('--base-path', default=DEFAULT_BASE_PATH,
+                        help=f'Result root directory (default: {DEFAULT_BASE_PATH})')
+    parser.add_argument('--sources', nargs='+', default=list(SOURCES),
+                        help='Result subdirectories to export (default: metrics validation compliance)')
+    parser.add_argument('--checkpoint',
+                        help=f'Checkpoint file (default: <base-path>/{DEFAULT_CHECKPOINT})')
+    parser.add_argument('--rejected-path',
+                        help=f'File collecting points InfluxDB rejected (default: <base-path>/{DEFAULT_REJECTED})')
+    parser.add_argument('--output', choices=['influxdb', 'stdout'], default='influxdb',
+                        help='Write to InfluxDB or print line protocol (default: influxdb)')
+    parser.add_argument('--influx-url', default=os.environ.get('INFLUX_URL', 'http://localhost:8086'),
+                        help='InfluxDB URL (default: $INFLUX_URL or http://localhost:8086)')
+    parser.add_argument('--influx-org', default=os.environ.get('INFLUX_ORG', 'network-upgrade-system'),
+                        help='InfluxDB organization (default: $INFLUX_ORG)')
+    parser.add_argument('--influx-bucket', default=os.environ.get('INFLUX_BUCKET', 'network-metrics'),
+                        help='InfluxDB bucket (default: $INFLUX_BUCKET)')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Points per write request (default: 5000)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep running and export new results every --interval seconds')
+    parser.add_argument('--interval', type=float, default=30.0,
+                        help='Seconds between passes with --follow (default: 30)')
+
+    args = parser.parse_args()
+
+    if args.output == 'influxdb':
+        token = os.environ.get('INFLUX_TOKEN')
+        if not token:
+            print("INFLUX_TOKEN environment variable is required for --output influxdb", file=sys.stderr)
+            return 2
+        writer = InfluxWriter(args.influx_url, token, args.influx_org, args.influx_bucket,
+                              args.rejected_path or os.path.join(args.base_path, DEFAULT_REJECTED))
+    else:
+        writer = StdoutWriter()
+
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.base_path, DEFAULT_CHECKPOINT))
+    tailer = ResultTailer(args.base_path, args.sources, checkpoint)
+
+    while True:
+        start = time.perf_counter()
+        try:
+            stats = export_pass(tailer, writer, max(1, args.batch_size))
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Export failed, will retry from checkpoint: {e}", file=sys.stderr)
+            if not args.follow:
+                return 1
+        else:
+            if stats['files'] or not args.follow:
+                print(f"Exported {stats['points']} points from {stats['files']} files in "
+                      f"{stats['batches']} batches ({time.perf_counter() - start:.2f}s)", file=sys.stderr)
+        if not args.follow:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(0)
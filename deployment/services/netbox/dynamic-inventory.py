@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+NetBox dynamic inventory for the network upgrade system
+Builds the same hosts, host variables and groups as
+ansible-content/inventory/netbox_dynamic.yml without nb_inventory's cost:
+
+  - devices, sites, platforms and device custom field definitions are fetched
+    with concurrent paged requests (every page after the first in parallel)
+  - compose and keyed_groups are the compiled rules of netbox_inventory_rules.py,
+    evaluated over all devices at once instead of as Jinja per host
+  - objects are kept in an on-disk cache; a refresh only fetches objects whose
+    last_updated changed since the previous sync, plus a brief ID listing to
+    drop deleted devices and devices that no longer match the filters
+  - config contexts are synced too; a device's rendered config_context changes
+    without its last_updated, so any config context change refetches every device
+  - a cache younger than --max-age is served without contacting NetBox
+
+Usage (Ansible inventory script protocol):
+  dynamic-inventory.py --list
+  dynamic-inventory.py --host <name>
+
+Environment: NETBOX_URL, NETBOX_TOKEN, NETBOX_VALIDATE_CERTS (default false)
+"""
+
+import os
+import ssl
+import sys
+import json
+import time
+import fcntl
+import argparse
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+# Installed next to netbox_inventory_rules.py, or run from the repository checkout
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from netbox_inventory_rules import as_bool, build_inventory  # noqa: E402
+
+
+DEFAULT_CACHE_PATH = "/var/lib/network-upgrade/cache/netbox-inventory.json"
+DEFAULT_NETBOX_URL = "http://netbox:8000"
+CACHE_VERSION = 2
+# last_updated filters reach back this far to tolerate clock skew with NetBox
+CLOCK_SKEW_SECONDS = 300
+# IDs per request when fetching objects missing from the cache
+ID_BATCH_SIZE = 200
+
+# Device selection of inventory/netbox_dynamic.yml (query_filters)
+DEVICE_ROLES = ('switch', 'router', 'firewall', 'load-balancer', 'network-device', 'console-server', 'pdu')
+DEVICE_PLATFORMS = ('cisco-nxos', 'cisco-iosxe', 'fortios', 'opengear')
+DEVICE_FILTERS = (
+    [('status', 'active')]
+    + [('role', role) for role in DEVICE_ROLES]
+    + [('platform', platform) for platform in DEVICE_PLATFORMS]
+)
+
+# name -> (API path, filters)
+ENDPOINTS = {
+    'devices': ('dcim/devices/', DEVICE_FILTERS),
+    'sites': ('dcim/sites/', []),
+    'platforms': ('dcim/platforms/', []),
+    'custom_fields': ('extras/custom-fields/', []),
+    'config_contexts': ('extras/config-contexts/', []),
+}
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class NetBoxClient:
+    """Paged NetBox REST reads with concurrent page requests."""
+
+    def __init__(self, url, token, validate_certs=False, timeout=30, page_size=1000, workers=8, retries=3):
+        self.api_url = url.rstrip('/') + '/api/'
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f"Token {token}"
+        self.context = None if validate_certs else ssl._create_unverified_context()
+        self.timeout = timeout
+        self.page_size = page_size
+        self.retries = retries
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.requests = 0
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def get(self, path, params):
+        url = self.api_url + path + '?' + urllib.parse.urlencode(params)
+        request = urllib.request.Request(url, headers=self.headers)
+        for attempt in range(self.retries):
+            try:
+                self.requests += 1
+                with urllib.request.urlopen(request, timeout=self.timeout, context=self.context) as response:
+                    return json.load(response)
+            except urllib.error.HTTPError as e:
+                if e.code != 429 and e.code < 500 or attempt == self.retries - 1:
+                    raise
+            except (urllib.error.URLError, OSError):
+                if attempt == self.retries - 1:
+                    raise
+            time.sleep(2 ** attempt)
+        return None
+
+    def fetch_all(self, path, params):
+        """
+        Fetch every page of a list endpoint.
+
+        The first page gives the total count; the remaining pages are requested
+        in parallel. Results are ordered by ID so concurrent pages do not overlap.
+
+        Returns:
+            List of objects
+        """
+        params = list(params) + [('ordering', 'id')]
+        page = self.get(path, params + [('limit', self.page_size), ('offset', 0)])
+        results = list(page.get('results', []))
+        count = page.get('count', len(results))
+        # NetBox caps limit at MAX_PAGE_SIZE; page by what the server actually returned
+        step = len(results) or self.page_size
+        offsets = range(len(results), count, step) if results else []
+        pages = self.pool.map(lambda offset: self.get(path, params + [('limit', step), ('offset', offset)]), offsets)
+        for page in pages:
+            results.extend(page.get('results', []))
+        return results
+
+
+class InventoryCache:
+    """NetBox objects and the built inventory, persisted atomically as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != CACHE_VERSION:
+            return False
+        self.data = data
+        return True
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.netbox-inventory-', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            # json.dumps uses the C encoder; json.dump to a stream encodes in Python
+            handle.write(json.dumps(self.data, separators=(',', ':')))
+        os.replace(tmp_path, self.path)
+
+    def lock(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        handle = open(self.path + '.lock', 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+
+def sync_endpoint(client, path, filters, cached, since):
+    """
+    Bring one endpoint's objects up to date.
+
+    Without a previous sync (since is None) every object is fetched. Otherwise
+    only objects changed since then are fetched, and a brief ID listing decides
+    which cached objects still exist and match the filters.
+
+    Returns:
+        (dict of ID -> object, number of objects fetched)
+    """
+    if since is None:
+        objects = {str(obj['id']): obj for obj in client.fetch_all(path, filters)}
+        return objects, len(objects)
+
+    # An object updated after the changed listing keeps its cached copy until the
+    # next sync, whose last_updated filter starts before this sync did
+    changed = {str(obj['id']): obj for obj in client.fetch_all(path, list(filters) + [('last_updated__gte', since)])}
+    ids = [str(obj['id']) for obj in client.fetch_all(path, list(filters) + [('brief', 'true')])]
+
+    objects = {}
+    missing = []
+    for object_id in ids:
+        obj = changed.get(object_id) or cached.get(object_id)
+        if obj is None:
+            missing.append(object_id)
+        else:
+            objects[object_id] = obj
+    # Objects created between the two listings, or never cached
+    for start in range(0, len(missing), ID_BATCH_SIZE):
+        batch = missing[start:start + ID_BATCH_SIZE]
+        for obj in client.fetch_all(path, list(filters) + [('id', object_id) for object_id in batch]):
+            objects[str(obj['id'])] = obj
+    return objects, len(changed) + len(missing)
+
+
+def refresh(cache, client, url, full_refresh_interval, force_full):
+    """
+    Sync the cached NetBox objects and rebuild the inventory.
+
+    Returns:
+        dict with mode, fetched object count and request count
+    """
+    started = time.time()
+    data = cache.data
+    full = (force_full or data.get('netbox_url') != url
+            or started - data.get('full_sync_at', 0) > full_refresh_interval)
+    since = None if full else timestamp(data['synced_at'] - CLOCK_SKEW_SECONDS)
+
+    cached_objects = {} if full else data.get('objects', {})
+    with ThreadPoolExecutor(max_workers=len(ENDPOINTS)) as endpoint_pool:
+        futures = {
+            name: endpoint_pool.submit(sync_endpoint, client, path, filters, cached_objects.get(name, {}), since)
+            for name, (path, filters) in ENDPOINTS.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    # Config context changes do not touch the devices' last_updated, so the changed
+    # listing misses the devices whose rendered config_context they alter
+    contexts_changed = not full and results['config_contexts'][0] != cached_objects.get('config_contexts', {})
+    if contexts_changed:
+        path, filters = ENDPOINTS['devices']
+        devices = sync_endpoint(client, path, filters, {}, None)
+        results['devices'] = (devices[0], results['devices'][1] + devices[1])
+
+    objects = {name: result[0] for name, result in results.items()}
+    cache.data = {
+        'version': CACHE_VERSION,
+        'netbox_url': url,
+        'synced_at': started,
+        'full_sync_at': started if full else data['full_sync_at'],
+        'objects': objects,
+        'inventory': build_inventory(objects),
+    }
+    cache.save()
+    return {
+        'mode': 'full' if full else 'incremental (config contexts changed)' if contexts_changed else 'incremental',
+        'fetched': sum(result[1] for result in results.values()),
+        'requests': client.requests,
+    }
+
+
+def load_inventory(args):
+    """Return the inventory, refreshing the cache from NetBox when it is older than --max-age."""
+    url = os.environ.get('NETBOX_URL', DEFAULT_NETBOX_URL).strip()
+    cache = InventoryCache(args.cache_path)
+    if not args.refresh_cache and cache.load() and cache.data.get('netbox_url') == url \
+            and time.time() - cache.data.get('synced_at', 0) < args.max_age:
+        return cache.data['inventory']
+
+    with cache.lock():
+        # Another run may have refreshed the cache while this one waited for the lock
+        if cache.load() and not args.refresh_cache and cache.data.get('netbox_url') == url \
+                and time.time() - cache.data.get('synced_at', 0) < args.max_age:
+            return cache.data['inventory']
+
+        client = NetBoxClient(
+            url, os.environ.get('NETBOX_TOKEN', ''),
+            validate_certs=as_bool(os.environ.get('NETBOX_VALIDATE_CERTS', 'false')),
+            timeout=args.timeout, page_size=args.page_size, workers=args.workers)
+        start = time.perf_counter()
+        try:
+            stats = refresh(cache, client, url, args.full_refresh_interval, args.refresh_cache)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            if 'inventory' not in cache.data:
+                raise
+            log(f"NetBox refresh failed, serving cached inventory from "
+                f"{timestamp(cache.data['synced_at'])}: {e}")
+            return cache.data['inventory']
+        finally:
+            client.close()
+        log(f"NetBox inventory {stats['mode']} sync: {len(cache.data['inventory']['_meta']['hostvars'])} hosts, "
+            f"{stats['fetched']} objects fetched in {stats['requests']} requests "
+            f"({time.perf_counter() - start:.2f}s)")
+        return cache.data['inventory']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NetBox dynamic inventory for the network upgrade system')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--list', action='store_true', help='Print the whole inventory')
+    mode.add_argument('--host', help='Print the variables of one host')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='Fetch every object from NetBox instead of only changed ones')
+    parser.add_argument('--cache-path', default=os.environ.get('NETBOX_INVENTORY_CACHE', DEFAULT_CACHE_PATH),
+                        help=f'Cache file (default: $NETBOX_INVENTORY_CACHE or {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--max-age', type=float, default=300,
+                        help='Serve the cache without contacting NetBox when younger than this (default: 300s)')
+    parser.add_argument('--full-refresh-interval', type=float, default=86400,
+                        help='Seconds between full syncs; incremental syncs in between (default: 86400)')
+    parser.add_argument('--page-size', type=int, default=1000,
+                        help='Objects per request (default: 1000, NetBox MAX_PAGE_SIZE)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Concurrent page requests (default: 8)')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='Request timeout in seconds (default: 30)')
+
+    args = parser.parse_args()
+
+    try:
+        inventory = load_inventory(args)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        log(f"Cannot load NetBox inventory: {e}")
+        return 1
+
+    if args.list:
+        sys.stdout.write(json.dumps(inventory, separators=(',', ':')) + '\n')
+    else:
+        sys.stdout.write(json.dumps(inventory['_meta']['hostvars'].get(args.host, {}), indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
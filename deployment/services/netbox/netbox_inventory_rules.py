@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Compiled host variable and group rules of the NetBox inventory
+The compose and keyed_groups of ansible-content/inventory/netbox_dynamic.yml,
+written once as rule tables instead of per-device Jinja templates:
+
+  - a compose rule names the device fields it reads (the first one that is set
+    wins, like a default() chain), a fallback value and an optional transform
+  - a group rule is the same with a group prefix; the value becomes the group key
+  - the env_ and network_tier_ classifications are substring tables
+
+compile_rules() turns the tables into plain Python callables once, and
+build_inventory() evaluates each rule over the whole device list in one pass
+instead of rendering one template per rule and device.
+"""
+
+import os
+import re
+
+
+# NetBox platform slug -> platform identifier and group of ansible-content/inventory/group_vars
+PLATFORMS = {
+    'cisco-nxos': ('nxos', 'cisco_nxos'),
+    'cisco-iosxe': ('ios', 'cisco_iosxe'),
+    'fortios': ('fortios', 'fortios'),
+    'opengear': ('opengear', 'opengear'),
+}
+
+# First matching substring of the lower-cased name wins
+ENVIRONMENTS = (
+    ('production', ('prod',)),
+    ('staging', ('stage', 'stg')),
+    ('development', ('dev',)),
+    ('test', ('test', 'lab')),
+)
+NETWORK_TIERS = (
+    ('core', ('core',)),
+    ('distribution', ('distribution', 'dist')),
+    ('access', ('access',)),
+    ('edge', ('edge', 'border')),
+    ('management', ('mgmt', 'oob')),
+)
+
+INVALID_GROUP_CHARS = re.compile(r'[^a-z0-9]')
+
+# Dicts flattened into the host variables (flatten_config_context and friends)
+FLATTENED_FIELDS = ('config_context', 'custom_fields', 'local_context_data')
+
+
+def as_bool(value):
+    """Ansible bool filter semantics."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on', 'y', 't')
+    return bool(value)
+
+
+def classifier(table, fallback):
+    """Compile a (value, substrings) table into a function of a name."""
+    def classify(name):
+        name = (name or '').lower()
+        for value, substrings in table:
+            for substring in substrings:
+                if substring in name:
+                    return value
+        return fallback
+    return classify
+
+
+def platform_id(slug):
+    return PLATFORMS.get(slug, (slug,))[0]
+
+
+def platform_group(slug):
+    return PLATFORMS[slug][1] if slug in PLATFORMS else None
+
+
+def address_country(address):
+    return address.split(',')[-1].strip()
+
+
+def strip_prefix_length(address):
+    return address.split('/')[0]
+
+
+def routing_protocol(custom_fields):
+    if as_bool(custom_fields.get('bgp_enabled', True)):
+        return 'bgp'
+    if as_bool(custom_fields.get('ospf_enabled', False)):
+        return 'ospf'
+    return 'static'
+
+
+# (variable, device fields, fallback, transform, empty values count as unset)
+# A variable whose value ends up None is not set. Connection settings and
+# credentials come from group_vars via the platform group; the config context
+# may override the credentials per device.
+COMPOSE = (
+    ('ansible_host', ('primary_ip4.address', 'primary_ip6.address', 'name'), None, strip_prefix_length, True),
+    ('ansible_user', ('config_context.ansible_user',), None, None, True),
+    ('ansible_password', ('config_context.ansible_password',), None, None, True),
+    ('ansible_ssh_private_key_file', ('config_context.ssh_key_file',), None, None, True),
+    ('ansible_command_timeout', ('config_context.command_timeout',), 60, None, False),
+    ('ansible_connect_timeout', ('config_context.connect_timeout',), 30, None, False),
+    ('ansible_persistent_connect_timeout', ('config_context.persistent_timeout',), 300, None, False),
+    ('ansible_persistent_command_timeout', ('config_context.persistent_command_timeout',), 300, None, False),
+
+    ('device_id', ('name',), None, None, False),
+    ('device_role', ('role.name', 'device_role.name'), None, None, False),
+    ('device_type', ('device_type.slug',), None, None, False),
+    ('device_model', ('device_type.model',), None, None, False),
+    ('site_name', ('site.name',), None, None, False),
+    ('site_slug', ('site.slug',), None, None, False),
+    ('rack_name', ('rack.name',), 'unknown', None, True),
+    ('rack_position', ('position',), 0, None, True),
+    ('vendor', ('device_type.manufacturer.name', 'platform.manufacturer.name'), None, None, False),
+    ('vendor_slug', ('device_type.manufacturer.slug', 'platform.manufacturer.slug'), None, None, False),
+    ('platform', ('platform.slug',), 'unknown', platform_id, False),
+    ('serial_number', ('serial',), 'unknown', None, True),
+
+    ('memory_mb', ('config_context.memory_mb', 'device_type.memory_mb'), 0, None, False),
+    ('cpu_cores', ('config_context.cpu_cores', 'device_type.cpu_cores'), 1, None, False),
+
+    ('firmware_directory', ('config_context.firmware_directory',), 'bootflash:', None, False),
+    ('minimum_free_space_mb', ('config_context.min_storage_mb',), 4096, None, False),
+    ('backup_directory', ('config_context.backup_directory',), 'bootflash:backup/', None, False),
+
+    ('multicast_enabled', ('custom_fields.multicast_enabled',), True, as_bool, False),
+    ('bfd_enabled', ('custom_fields.bfd_enabled',), False, as_bool, False),
+    ('vpc_enabled', ('custom_fields.vpc_enabled',), False, as_bool, False),
+    ('vpc_domain_id', ('custom_fields.vpc_domain_id',), '', None, True),
+    ('bgp_enabled', ('custom_fields.bgp_enabled',), True, as_bool, False),
+    ('ospf_enabled', ('custom_fields.ospf_enabled',), False, as_bool, False),
+
+    ('ha_cluster_id', ('custom_fields.ha_cluster_id',), '', None, True),
+    ('ha_role', ('custom_fields.ha_role',), '', None, True),
+
+    ('current_firmware_version', ('custom_fields.current_firmware',), 'unknown', None, False),
+    ('last_upgrade_date', ('custom_fields.last_upgrade_date',), 'never', None, False),
+    ('upgrade_status', ('custom_fields.upgrade_status',), 'unknown', None, False),
+    ('maintenance_window', ('config_context.maintenance_window',), 'TBD', None, False),
+    ('change_window', ('config_context.change_window',), 'standard', None, False),
+
+    ('compliance_profile', ('config_context.compliance_profile',), 'standard', None, False),
+    ('security_zone', ('config_context.security_zone',), 'internal', None, False),
+    ('criticality', ('custom_fields.criticality',), 'medium', None, False),
+
+    ('snmp_community', ('config_context.snmp_community',), os.environ.get('SNMP_COMMUNITY', ''), None, False),
+    ('snmp_version', ('config_context.snmp_version',), '2c', None, False),
+    ('monitoring_enabled', ('config_context.monitoring_enabled',), True, as_bool, False),
+
+    ('region', ('site.region.name',), None, None, False),
+    ('country', ('site.physical_address',), 'unknown', address_country, True),
+    ('timezone', ('site.time_zone',), 'UTC', None, False),
+)
+
+# (group prefix, device fields, fallback, transform, empty values count as unset)
+# The group is <prefix>_<value> with invalid characters replaced, or the value
+# itself without a prefix; no group is added for an empty value. Each prefix
+# appears once, so a host is added to a group at most once.
+GROUPS = (
+    # Platform groups carry the connection settings in group_vars
+    ('', ('platform.slug',), None, platform_group, False),
+    # group_by
+    ('role', ('role.slug', 'device_role.slug'), None, None, False),
+    ('device_type', ('device_type.slug',), None, None, False),
+    ('site', ('site.slug',), None, None, False),
+    ('region', ('site.region.slug',), None, None, False),
+    ('status', ('status.value', 'status'), None, None, False),
+    # keyed_groups (platform_ also covers group_by platform)
+    ('vendor', ('device_type.manufacturer.name', 'platform.manufacturer.name'), None, None, False),
+    ('platform', ('platform.slug',), 'unknown', None, False),
+    ('model', ('device_type.slug',), None, None, False),
+    ('upgrade_status', ('custom_fields.upgrade_status',), 'unknown', None, False),
+    ('criticality', ('custom_fields.criticality',), 'medium', None, False),
+    ('maintenance', ('config_context.maintenance_window',), 'tbd', None, False),
+    ('env', ('site.name',), '', classifier(ENVIRONMENTS, 'unknown'), False),
+    ('network_tier', ('role.name', 'device_role.name'), '', classifier(NETWORK_TIERS, 'other'), False),
+    ('routing_protocol', ('custom_fields',), {}, routing_protocol, False),
+)
+
+
+def compile_path(path):
+    """Compile a dotted field path into a lookup that returns None for any missing level."""
+    keys = tuple(path.split('.'))
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda data: data.get(key)
+
+    def lookup(data):
+        for key in keys:
+            if not isinstance(data, dict):
+                return None
+            data = data.get(key)
+        return data
+    return lookup
+
+
+def compile_rule(sources, fallback, transform, empty_is_unset):
+    """Compile one rule into a function of a device."""
+    lookups = tuple(compile_path(path) for path in sources)
+
+    def evaluate(device):
+        for lookup in lookups:
+            value = lookup(device)
+            if value or (value is not None and not empty_is_unset):
+                break
+        else:
+            value = fallback
+        if transform is not None and value is not None:
+            value = transform(value)
+        return value
+    return evaluate
+
+
+def group_name(prefix, key):
+    return f"{prefix}_{INVALID_GROUP_CHARS.sub('_', str(key).lower())}" if prefix else key
+
+
+def compile_rules(compose=COMPOSE, groups=GROUPS):
+    """
+    Compile the rule tables.
+
+    Returns:
+        (list of (variable, function), list of (prefix, function))
+    """
+    return (
+        [(name, compile_rule(*rule)) for name, *rule in compose],
+        [(prefix, compile_rule(*rule)) for prefix, *rule in groups],
+    )
+
+
+def custom_field_defaults(custom_fields):
+    """Default values of the custom fields defined for devices."""
+    defaults = {}
+    for field in custom_fields.values():
+        types = field.get('object_types') or field.get('content_types') or []
+        if 'dcim.device' in types and field.get('default') is not None:
+            defaults[field['name']] = field['default']
+    return defaults
+
+
+def resolve_devices(objects):
+    """
+    Devices with their site and platform references replaced by the full objects
+    and unset custom fields replaced by the field defaults.
+
+    Returns:
+        List of devices sorted by name
+    """
+    sites = objects.get('sites', {})
+    platforms = objects.get('platforms', {})
+    cf_defaults = custom_field_defaults(objects.get('custom_fields', {}))
+
+    devices = []
+    for device in sorted(objects.get('devices', {}).values(), key=lambda d: d.get('name') or ''):
+        if not device.get('name'):
+            continue
+        site_ref = device.get('site') or {}
+        platform_ref = device.get('platform') or {}
+        custom_fields = dict(cf_defaults)
+        custom_fields.update({k: v for k, v in (device.get('custom_fields') or {}).items() if v is not None})
+        devices.append(dict(
+            device,
+            site=sites.get(str(site_ref.get('id')), site_ref),
+            platform=platforms.get(str(platform_ref.get('id')), platform_ref),
+            custom_fields=custom_fields,
+        ))
+    return devices
+
+
+def build_inventory(objects, rules=None):
+    """
+    Ansible inventory JSON (with _meta.hostvars) from NetBox objects.
+
+    Args:
+        objects: dict of endpoint name -> dict of ID -> object (devices, sites,
+                 platforms, custom_fields)
+        rules: result of compile_rules(), compiled here if not given
+
+    Returns:
+        Inventory dict
+    """
+    compose, groups = rules or compile_rules()
+    devices = resolve_devices(objects)
+    names = [device['name'] for device in devices]
+
+    hostvars = []
+    for device in devices:
+        variables = {}
+        for field in FLATTENED_FIELDS:
+            variables.update(device.get(field) or {})
+        hostvars.append(variables)
+
+    # One rule at a time over all devices
+    for name, evaluate in compose:
+        for variables, value in zip(hostvars, map(evaluate, devices)):
+            if value is not None:
+                variables[name] = value
+
+    inventory = {'_meta': {'hostvars': dict(zip(names, hostvars))}}
+    group_names = {}
+    for prefix, evaluate in groups:
+        for host, key in zip(names, map(evaluate, devices)):
+            if key is None or key == '':
+                continue
+            group = group_names.get((prefix, key))
+            if group is None:
+                group = group_names[(prefix, key)] = group_name(prefix, key)
+            inventory.setdefault(group, {'hosts': []})['hosts'].append(host)
+
+    inventory['all'] = {'children': sorted(group for group in inventory if group != '_meta')}
+    return inventory
@@ -469,6 +469,10 @@ if __name__ == "__main__":
     get_validation_metrics()
 EOF
 
+    # Result file watcher (execd input in telegraf.conf) and the exporter module it shares
+    install -m 0755 "${SCRIPT_DIR}/result-watcher.py" /usr/local/bin/telegraf-scripts/result-watcher.py
+    install -m 0644 "${SCRIPT_DIR}/../../scripts/metrics_export.py" /usr/local/bin/telegraf-scripts/metrics_export.py
+
     # Make scripts executable
     chmod +x /usr/local/bin/telegraf-scripts/*.py
     chown -R telegraf:telegraf /usr/local/bin/telegraf-scripts/
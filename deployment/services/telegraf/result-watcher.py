@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Telegraf execd input for network upgrade result files
+Watches /var/lib/network-upgrade/{metrics,validation,compliance} with inotify and
+prints InfluxDB line protocol for new or changed result files only, once.
+
+Replaces the [[inputs.file]] globs that re-read and re-emitted every historical
+file on each interval. File read state is kept in a checkpoint (the same format
+metrics_export.py uses), so a Telegraf restart does not replay history:
+  - on start, one catch-up pass emits whatever changed while it was stopped
+  - afterwards only files named by inotify events are read
+  - a periodic rescan covers queue overflows and directories created later
+Without inotify (non-Linux, watch limit reached) it falls back to polling.
+
+Telegraf configuration:
+  [[inputs.execd]]
+    command = ["/usr/local/bin/telegraf-scripts/result-watcher.py"]
+    signal = "none"
+    data_format = "influx"
+"""
+
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import signal
+import struct
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Installed next to metrics_export.py, or run from the repository checkout
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(1, os.path.join(SCRIPT_DIR, '..', '..', 'scripts'))
+
+from metrics_export import (  # noqa: E402
+    DEFAULT_BASE_PATH,
+    SOURCES,
+    Checkpoint,
+    ResultTailer,
+    StdoutWriter,
+    export_files,
+    export_pass,
+)
+
+
+DEFAULT_CHECKPOINT = "/var/lib/telegraf/result-watcher-checkpoint.json"
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyUnavailable(OSError):
+    """Raised when inotify cannot be used and the watcher must poll instead."""
+
+
+class InotifyWatcher:
+    """Recursive inotify watch over the result directories, using libc through ctypes."""
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise InotifyUnavailable(errno.ENOSYS, "inotify is only available on Linux")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = set(roots)
+        self.paths = {}
+        self.watches = {}
+        # Parents of the roots are watched (non-recursively) only to see a root being created
+        self.parents = set()
+
+    def close(self):
+        os.close(self.fd)
+
+    def add_watch(self, directory):
+        """Watch one directory; return False if it does not exist."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return False
+            raise InotifyUnavailable(err, f"inotify_add_watch failed for {directory}")
+        self.paths[wd] = directory
+        self.watches[directory] = wd
+        return True
+
+    def add_roots(self):
+        """
+        Watch every root tree, or the parent of a root that does not exist yet.
+
+        Returns:
+            Files found in newly watched directories
+        """
+        found = []
+        for root in sorted(self.roots):
+            if os.path.isdir(root):
+                found.extend(self.add_tree(root))
+            else:
+                parent = os.path.dirname(root)
+                if parent not in self.watches and self.add_watch(parent):
+                    self.parents.add(parent)
+        return found
+
+    def add_tree(self, root):
+        """
+        Watch root and every subdirectory not yet watched.
+
+        Returns:
+            Files found in newly watched directories (they may predate the watch)
+        """
+        found = []
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            if directory in self.watches and directory not in self.parents:
+                continue
+            if not self.add_watch(directory):
+                continue
+            self.parents.discard(directory)
+            found.extend(os.path.join(directory, name) for name in files)
+        return found
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            (changed file paths, deleted file paths, overflowed)
+        """
+        changed, deleted, overflowed = set(), set(), False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, deleted, overflowed
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                directory = self.paths.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # Watched directory was removed; drop the stale mapping
+                    del self.paths[wd]
+                    self.watches.pop(directory, None)
+                    self.parents.discard(directory)
+                    continue
+                if not name:
+                    continue
+                path = os.path.join(directory, name)
+                if directory in self.parents:
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and path in self.roots:
+                        changed.update(self.add_tree(path))
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.'):
+                        changed.update(self.add_tree(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    deleted.add(path)
+                else:
+                    changed.add(path)
+                    deleted.discard(path)
+        return changed, deleted, overflowed
+
+
+class ResultWatcher:
+    """Emit line protocol for result files as inotify reports them."""
+
+    def __init__(self, tailer, writer, batch_size, rescan_interval, settle):
+        self.tailer = tailer
+        self.writer = writer
+        self.batch_size = batch_size
+        self.rescan_interval = rescan_interval
+        self.settle = settle
+
+    def export(self, paths):
+        files = []
+        for path in sorted(paths):
+            source = self.tailer.source_for(path)
+            if source:
+                files.append((path, source))
+        if files:
+            export_files(self.tailer, self.writer, files, self.batch_size)
+
+    def forget(self, paths):
+        removed = [path for path in paths if path in self.tailer.checkpoint.files and not os.path.exists(path)]
+        for path in removed:
+            del self.tailer.checkpoint.files[path]
+        if removed:
+            self.tailer.checkpoint.save()
+
+    def poll(self):
+        """Fallback without inotify: a full (checkpointed) pass every rescan interval."""
+        while True:
+            export_pass(self.tailer, self.writer, self.batch_size)
+            time.sleep(self.rescan_interval)
+
+    def watch(self, inotify):
+        # Watches go in before the catch-up pass so nothing written in between is lost
+        inotify.add_roots()
+        export_pass(self.tailer, self.writer, self.batch_size)
+        next_rescan = time.monotonic() + self.rescan_interval
+
+        while True:
+            changed, deleted, overflowed = inotify.read_events(max(0.0, next_rescan - time.monotonic()))
+            if changed or deleted:
+                # Let a burst of writes to the same files settle into one read
+                while True:
+                    more_changed, more_deleted, more_overflow = inotify.read_events(self.settle)
+                    if not (more_changed or more_deleted or more_overflow):
+                        break
+                    changed |= more_changed
+                    deleted = (deleted | more_deleted) - more_changed
+                    changed -= more_deleted
+                    overflowed |= more_overflow
+            self.forget(deleted)
+            self.export(changed)
+
+            if overflowed or time.monotonic() >= next_rescan:
+                inotify.add_roots()
+                export_pass(self.tailer, self.writer, self.batch_size)
+                next_rescan = time.monotonic() + self.rescan_interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Telegraf execd input for network upgrade result files')
+    parser.add_argument('--base-path', default=DEFAULT_BASE_PATH,
+                        help=f'Result root directory (default: {DEFAULT_BASE_PATH})')
+    parser.add_argument('--sources', nargs='+', default=list(SOURCES),
+                        help='Result subdirectories to watch (default: metrics validation compliance)')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                        help=f'Checkpoint file (default: {DEFAULT_CHECKPOINT})')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Points per write to Telegraf (default: 5000)')
+    parser.add_argument('--rescan-interval', type=float, default=300.0,
+                        help='Seconds between safety rescans; poll interval without inotify (default: 300)')
+    parser.add_argument('--settle', type=float, default=0.5,
+                        help='Seconds of quiet before reading files named by events (default: 0.5)')
+    parser.add_argument('--poll', action='store_true', help='Poll instead of using inotify')
+
+    args = parser.parse_args()
+
+    # Telegraf stops execd inputs with SIGTERM; the checkpoint is saved after every write
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    base_path = os.path.abspath(args.base_path)
+    tailer = ResultTailer(base_path, args.sources, Checkpoint(args.checkpoint))
+    watcher = ResultWatcher(tailer, StdoutWriter(), max(1, args.batch_size),
+                            max(1.0, args.rescan_interval), max(0.0, args.settle))
+
+    if not args.poll:
+        try:
+            inotify = InotifyWatcher(os.path.join(base_path, source) for source in args.sources)
+        except InotifyUnavailable as e:
+            print(f"inotify unavailable, polling every {watcher.rescan_interval:.0f}s: {e}", file=sys.stderr)
+        else:
+            try:
+                watcher.watch(inotify)
+            except InotifyUnavailable as e:
+                print(f"inotify watch failed, polling every {watcher.rescan_interval:.0f}s: {e}", file=sys.stderr)
+            finally:
+                inotify.close()
+    watcher.poll()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except (KeyboardInterrupt, BrokenPipeError):
+        sys.exit(0)
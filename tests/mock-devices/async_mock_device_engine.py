@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Asyncio Mock Device Engine for Network Device Upgrade Testing
+The devices of mock_device_engine.py driven by coroutines on one event loop:
+command latency is awaited instead of slept in the calling thread, and an
+upgrade runs as an asyncio task instead of a thread. Without a thread per
+device or per upgrade, one process hosts 10k+ concurrent mock devices for
+load tests of the controller-side scheduling and metrics paths.
+
+Behaviors, error injection and state persistence are shared with the threaded
+engine. Use RealClock, or ScaledClock to run upgrades faster than real time.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from mock_clock import RealClock
+from mock_device_engine import MockDeviceConfig, MockDeviceEngine, MockDeviceManager, NetworkError, DeviceError
+
+
+class AsyncMockDeviceEngine(MockDeviceEngine):
+    """Mock device whose commands and upgrade are coroutines"""
+
+    def __init__(self, config: MockDeviceConfig, clock: Optional[RealClock] = None):
+        self._deferred_pause = 0.0
+        self.upgrade_task: Optional[asyncio.Task] = None
+        super().__init__(config, clock)
+
+    def pause(self, seconds: float):
+        """Behaviors run synchronously on the event loop; their processing time is awaited afterwards"""
+        self._deferred_pause += seconds
+
+    def _take_deferred_pause(self) -> float:
+        seconds, self._deferred_pause = self._deferred_pause, 0.0
+        return seconds
+
+    async def process_command(self, command: str, **kwargs) -> Dict[str, Any]:
+        """Process a command and return realistic response"""
+        await self.clock.async_sleep(self._response_delay())
+        response = self._respond(command, **kwargs)
+        deferred = self._take_deferred_pause()
+        if deferred:
+            await self.clock.async_sleep(deferred)
+        return response
+
+    def _launch_upgrade(self):
+        """Run the upgrade simulation as a task on the running event loop"""
+        self.upgrade_task = asyncio.get_running_loop().create_task(
+            self._simulate_upgrade_process(), name=f"upgrade-{self.config.device_id}")
+
+    async def _simulate_upgrade_process(self):
+        """Simulate realistic upgrade process"""
+        for seconds in self._upgrade_timeline():
+            seconds += self._take_deferred_pause()
+            if seconds:
+                await self.clock.async_sleep(seconds)
+
+    async def wait_upgrade(self):
+        """Wait until the running upgrade (if any) has completed or failed"""
+        while self.upgrade_task is not None and not self.upgrade_task.done():
+            # A multi-step upgrade replaces the task before the current one ends
+            await asyncio.shield(self.upgrade_task)
+
+
+class AsyncMockDeviceManager(MockDeviceManager):
+    """Manager for many asyncio mock devices on one event loop"""
+
+    device_class = AsyncMockDeviceEngine
+
+    async def _run_device_commands(self, device: AsyncMockDeviceEngine, commands: List[str],
+                                   limit: Optional[asyncio.Semaphore]) -> List[Dict[str, Any]]:
+        responses = []
+        for command in commands:
+            try:
+                if limit is None:
+                    responses.append(await device.process_command(command))
+                else:
+                    async with limit:
+                        responses.append(await device.process_command(command))
+            except (NetworkError, DeviceError) as e:
+                responses.append({'status': 'error', 'error': str(e)})
+        return responses
+
+    async def run_commands(self, commands: List[str], device_ids: Optional[List[str]] = None,
+                           max_concurrent: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Send the commands, in order, to every device concurrently
+
+        Args:
+            commands: commands sent to each device
+            device_ids: devices to use (default: all)
+            max_concurrent: maximum commands in flight across all devices (default: unlimited)
+
+        Returns:
+            dict of device ID -> responses (injected network/device errors as status 'error')
+        """
+        device_ids = list(self.devices) if device_ids is None else device_ids
+        limit = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        results = await asyncio.gather(*(
+            self._run_device_commands(self.devices[device_id], commands, limit) for device_id in device_ids))
+        return dict(zip(device_ids, results))
+
+    async def upgrade_all(self, target_version: str, device_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Upgrade every device concurrently and wait for all upgrades to end
+
+        Returns:
+            dict of device ID -> final upgrade phase ('complete' or 'failed'), or the
+            error of a device that could not start
+        """
+        device_ids = list(self.devices) if device_ids is None else device_ids
+        outcomes = {}
+        for device_id in device_ids:
+            try:
+                self.devices[device_id].start_upgrade(target_version)
+            except DeviceError as e:
+                outcomes[device_id] = str(e)
+        started = [device_id for device_id in device_ids if device_id not in outcomes]
+        await asyncio.gather(*(self.devices[device_id].wait_upgrade() for device_id in started))
+        outcomes.update({device_id: self.devices[device_id].upgrade_phase.value for device_id in started})
+        return outcomes
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Clocks for the mock device engine
+Every sleep, timestamp and error expiry of MockDeviceEngine and the device
+behaviors goes through one of these, so an upgrade timeline can run in real,
+accelerated or discrete-event (virtual) time with the same phase ordering:
+
+  RealClock     wall-clock time (default)
+  ScaledClock   wall-clock time running `speed` times faster
+  VirtualClock  discrete-event time: time jumps to the next wake-up as soon as
+                every simulation thread is asleep, so thousands of 325 s upgrade
+                timelines finish in seconds
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+
+class RealClock:
+    """Wall-clock time"""
+
+    def time(self) -> float:
+        """Seconds since the epoch"""
+        return time.time()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def async_sleep(self, seconds: float):
+        """Sleep for the asyncio engine (async_mock_device_engine.py)"""
+        await asyncio.sleep(max(0.0, seconds))
+
+    def start_thread(self, target: Callable, *args, name: Optional[str] = None) -> threading.Thread:
+        """Start a daemon thread that takes part in the simulation"""
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        return thread
+
+
+class ScaledClock(RealClock):
+    """Wall-clock time running `speed` times faster (sleeps are shortened, timestamps stretched)"""
+
+    def __init__(self, speed: float, start: Optional[float] = None):
+        if speed <= 0:
+            raise ValueError("Clock speed must be positive")
+        self.speed = speed
+        self._start = time.time() if start is None else start
+        self._origin = time.monotonic()
+
+    def time(self) -> float:
+        return self._start + (time.monotonic() - self._origin) * self.speed
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    async def async_sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, seconds) / self.speed)
+
+
+class VirtualClock(RealClock):
+    """
+    Discrete-event time shared by the simulation threads
+
+    Threads started with start_thread() take part in the simulation. A sleep
+    queues a wake-up at now + seconds and blocks; once every simulation thread
+    is asleep, the clock jumps to the earliest wake-up and resumes that thread
+    alone, so timelines interleave in time order and no real time is spent.
+    Sleepers that wake at the same instant resume in the order they slept.
+
+    Time does not wait for threads outside the simulation; set up devices and
+    start their upgrades inside paused() so that every timeline starts at the
+    same instant. With auto_advance=False time only moves when a thread
+    outside the simulation calls advance() (or sleep()), which lets a test
+    step through a timeline and inspect it in between.
+    """
+
+    def __init__(self, start: Optional[float] = None, auto_advance: bool = True):
+        self._now = time.time() if start is None else start
+        self.auto_advance = auto_advance
+        self._cond = threading.Condition()
+        self._sleepers: List[Tuple[float, int, threading.Event, bool]] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._participants = threading.local()
+
+    def time(self) -> float:
+        with self._cond:
+            return self._now
+
+    def _is_participant(self) -> bool:
+        return getattr(self._participants, 'active', False)
+
+    def start_thread(self, target: Callable, *args, name: Optional[str] = None) -> threading.Thread:
+        def run():
+            self._participants.active = True
+            try:
+                target(*args)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._wake_next()
+                    self._cond.notify_all()
+
+        with self._cond:
+            self._running += 1
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    @contextmanager
+    def paused(self):
+        """Hold time still while the calling thread (outside the simulation) runs the block"""
+        with self._cond:
+            self._running += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._wake_next()
+                self._cond.notify_all()
+
+    def _wake_next(self):
+        """Resume sleepers in time order while no simulation thread is running (lock held)"""
+        if not self.auto_advance:
+            return
+        while self._running == 0 and self._sleepers:
+            wake_time, _, event, participant = heapq.heappop(self._sleepers)
+            self._now = max(self._now, wake_time)
+            event.set()
+            if participant:
+                self._running += 1
+
+    def sleep(self, seconds: float):
+        participant = self._is_participant()
+        if not participant and not self.auto_advance:
+            self.advance(seconds)
+            return
+        event = threading.Event()
+        with self._cond:
+            heapq.heappush(self._sleepers, (self._now + max(0.0, seconds), next(self._sequence), event, participant))
+            if participant:
+                self._running -= 1
+            self._wake_next()
+            self._cond.notify_all()
+        event.wait()
+
+    async def async_sleep(self, seconds: float):
+        raise TypeError("VirtualClock drives simulation threads; use RealClock or ScaledClock with asyncio")
+
+    def advance(self, seconds: float):
+        """
+        Move time forward by seconds (from a thread outside the simulation),
+        resuming every sleeper due by then in time order
+        """
+        if self._is_participant():
+            raise RuntimeError("advance() must be called from outside the simulation threads")
+        with self._cond:
+            target = self._now + max(0.0, seconds)
+            while True:
+                self._cond.wait_for(lambda: self._running == 0)
+                if not self._sleepers or self._sleepers[0][0] > target:
+                    break
+                wake_time, _, event, participant = heapq.heappop(self._sleepers)
+                self._now = max(self._now, wake_time)
+                if participant:
+                    self._running += 1
+                event.set()
+            self._now = max(self._now, target)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait (in real time) until no simulation thread is running or due to run;
+        with auto_advance that is when every simulation thread has finished
+
+        Returns:
+            False on timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._running == 0 and (not self.auto_advance or not any(s[3] for s in self._sleepers)),
+                timeout)
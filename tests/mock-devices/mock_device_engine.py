@@ -4,17 +4,23 @@ Mock Device Engine for Network Device Upgrade Testing
 Simulates realistic network appliance behavior without physical hardware
 """
 
+import os
+import re
 import json
-import time
+import queue
+import atexit
 import random
 import sqlite3
+import tempfile
 import threading
 from abc import ABC, abstractmethod
 from enum import Enum
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass, field
 
+from mock_clock import RealClock
+
 
 class DeviceState(Enum):
     """Device operational states"""
@@ -54,6 +60,9 @@ class MockDeviceConfig:
     upgrade_duration_seconds: int = 300
     reboot_duration_seconds: int = 60
     custom_behaviors: Dict[str, Any] = field(default_factory=dict)
+    # 'shared': one WAL database for all devices, written in batches (default)
+    # 'per_device': one database file per device, written synchronously (debugging)
+    state_mode: str = field(default_factory=lambda: os.environ.get('MOCK_DEVICE_STATE_MODE', 'shared'))
 
 
 class NetworkError(Exception):
@@ -66,15 +75,183 @@ class DeviceError(Exception):
     pass
 
 
+STATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS device_state (
+        timestamp TEXT,
+        state TEXT,
+        upgrade_phase TEXT,
+        progress INTEGER,
+        firmware_version TEXT,
+        error_conditions TEXT
+    )
+"""
+SHARED_STATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS device_state (
+        device_id TEXT,
+        timestamp TEXT,
+        state TEXT,
+        upgrade_phase TEXT,
+        progress INTEGER,
+        firmware_version TEXT,
+        error_conditions TEXT
+    )
+"""
+SHARED_STATE_DB = "mock_devices.db"
+
+
+def _state_dir() -> str:
+    """State directory for the mock device databases (temp directory if it cannot be created)"""
+    state_dir = "tests/mock-devices/state"
+    try:
+        os.makedirs(state_dir, exist_ok=True)
+        return state_dir
+    except (OSError, PermissionError):
+        # Fall back to temp directory for CI environments
+        return tempfile.gettempdir()
+
+
+class StateStore:
+    """
+    Device state history shared by all mock devices of a process
+
+    One SQLite database in WAL mode, owned by a background writer thread.
+    record() only queues the row; the writer inserts whatever has queued up
+    in one transaction, so 1,000+ devices cost one commit per batch instead
+    of an open, insert, fsync and close per command.
+    """
+
+    BATCH_SIZE = 1000
+
+    _stores: Dict[str, 'StateStore'] = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._queue: queue.Queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._writer = threading.Thread(target=self._run, name=f"state-store-{os.path.basename(db_path)}",
+                                        daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    @classmethod
+    def shared(cls, db_path: Optional[str] = None) -> 'StateStore':
+        """The process-wide store for db_path (default: mock_devices.db in the state directory)"""
+        db_path = os.path.abspath(db_path or os.path.join(_state_dir(), SHARED_STATE_DB))
+        with cls._stores_lock:
+            store = cls._stores.get(db_path)
+            if store is None or not store._writer.is_alive():
+                store = cls._stores[db_path] = cls(db_path)
+            return store
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SHARED_STATE_TABLE_SQL)
+            conn.execute("CREATE INDEX IF NOT EXISTS device_state_device ON device_state (device_id)")
+            conn.commit()
+        except sqlite3.Error as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        while True:
+            rows = [self._queue.get()]
+            while len(rows) < self.BATCH_SIZE:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in rows
+            batch = [row for row in rows if row is not None]
+            try:
+                if batch:
+                    conn.executemany("""
+                        INSERT INTO device_state
+                        (device_id, timestamp, state, upgrade_phase, progress, firmware_version, error_conditions)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, batch)
+                    conn.commit()
+            except sqlite3.Error as e:
+                # State history is diagnostic only; never fail the simulation
+                self._error = e
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def record(self, device_id: str, row: tuple):
+        """Queue one state row (timestamp, state, phase, progress, firmware, errors) for a device"""
+        self._queue.put((device_id,) + tuple(row))
+
+    def flush(self):
+        """Wait until every queued row is committed"""
+        if self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Commit queued rows and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._stores_lock:
+            if self._stores.get(self.db_path) is self:
+                del self._stores[self.db_path]
+
+    def history(self, device_id: str) -> List[Dict[str, Any]]:
+        """Committed state rows of a device, oldest first"""
+        self.flush()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute("""
+                SELECT timestamp, state, upgrade_phase, progress, firmware_version, error_conditions
+                FROM device_state WHERE device_id = ? ORDER BY rowid
+            """, (device_id,))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    @classmethod
+    def close_all(cls):
+        for store in list(cls._stores.values()):
+            store.close()
+
+
+atexit.register(StateStore.close_all)
+
+
+# Upgrade phases and their length in one-second ticks
+UPGRADE_PHASES = [
+    (UpgradePhase.PRE_VALIDATION, 10),
+    (UpgradePhase.IMAGE_DOWNLOAD, 60),
+    (UpgradePhase.IMAGE_VERIFICATION, 15),
+    (UpgradePhase.BACKUP, 30),
+    (UpgradePhase.INSTALLATION, 120),
+    (UpgradePhase.REBOOT, 60),
+    (UpgradePhase.POST_VALIDATION, 30)
+]
+
+
 class MockDeviceEngine:
     """Core engine for mock device simulation"""
     
-    def __init__(self, config: MockDeviceConfig):
+    def __init__(self, config: MockDeviceConfig, clock: Optional[RealClock] = None):
         self.config = config
+        # Every sleep, timestamp and error expiry goes through the clock (mock_clock.py)
+        self.clock = clock or RealClock()
         self.state = DeviceState.ONLINE
         self.upgrade_phase = UpgradePhase.IDLE
         self.upgrade_progress = 0
-        self.last_command_time = datetime.now()
+        self.last_command_time = self.clock.now()
         self.error_conditions: List[str] = []
         self.session_data: Dict[str, Any] = {}
 
@@ -82,6 +259,9 @@ class MockDeviceEngine:
         self.current_phase = UpgradePhase.IDLE.value
         self.current_firmware = config.firmware_version
 
+        # Directory holding files uploaded to the device over SCP/SFTP (mock_ssh_server.py)
+        self.bootflash_dir: Optional[str] = None
+
         # Initialize database for state persistence
         self._init_database()
 
@@ -89,34 +269,21 @@ class MockDeviceEngine:
         self.behavior = self._load_device_behavior()
     
     def _init_database(self):
-        """Initialize SQLite database for state persistence"""
-        import os
-        import tempfile
-        
-        # Create state directory if it doesn't exist or use temp directory for CI
-        state_dir = "tests/mock-devices/state"
-        if not os.path.exists(state_dir):
-            try:
-                os.makedirs(state_dir, exist_ok=True)
-                self.db_path = f"{state_dir}/{self.config.device_id}.db"
-            except (OSError, PermissionError):
-                # Fall back to temp directory for CI environments
-                temp_dir = tempfile.gettempdir()
-                self.db_path = f"{temp_dir}/mock_device_{self.config.device_id}.db"
+        """Initialize SQLite state persistence (shared store, or a database file per device)"""
+        if self.config.state_mode != 'per_device':
+            self.state_store = StateStore.shared()
+            self.db_path = self.state_store.db_path
+            return
+
+        self.state_store = None
+        state_dir = _state_dir()
+        if state_dir == tempfile.gettempdir():
+            self.db_path = f"{state_dir}/mock_device_{self.config.device_id}.db"
         else:
             self.db_path = f"{state_dir}/{self.config.device_id}.db"
-        
+
         conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS device_state (
-                timestamp TEXT,
-                state TEXT,
-                upgrade_phase TEXT,
-                progress INTEGER,
-                firmware_version TEXT,
-                error_conditions TEXT
-            )
-        """)
+        conn.execute(STATE_TABLE_SQL)
         conn.commit()
         conn.close()
     
@@ -153,14 +320,32 @@ class MockDeviceEngine:
     def process_command(self, command: str, **kwargs) -> Dict[str, Any]:
         """Process a command and return realistic response"""
         # Simulate network delay
+        self.clock.sleep(self._response_delay())
+        return self._respond(command, **kwargs)
+
+    def bootflash_file(self, filename: str) -> Optional[str]:
+        """Path of an uploaded file in the virtual bootflash, or None if it was not uploaded"""
+        if not self.bootflash_dir or not filename:
+            return None
+        path = os.path.join(self.bootflash_dir, os.path.basename(filename.split(':')[-1]))
+        return path if os.path.isfile(path) else None
+
+    def _response_delay(self) -> float:
+        """Simulated command latency in seconds"""
         delay_ms = random.randint(*self.config.response_delay_ms)
-        time.sleep(delay_ms / 1000.0)
+        return delay_ms / 1000.0
+
+    def pause(self, seconds: float):
+        """Simulated processing time inside a command or upgrade phase"""
+        self.clock.sleep(seconds)
 
+    def _respond(self, command: str, **kwargs) -> Dict[str, Any]:
+        """Response to a command once its latency has passed"""
         # Check for injected errors
         self._check_error_conditions()
 
         # Update last command time
-        self.last_command_time = datetime.now()
+        self.last_command_time = self.clock.now()
 
         # Handle edge case commands directly
         response = self._handle_edge_case_commands(command)
@@ -217,7 +402,7 @@ class MockDeviceEngine:
             if self.upgrade_phase == UpgradePhase.FAILED:
                 self.upgrade_phase = UpgradePhase.ROLLBACK
                 # Simulate successful rollback
-                time.sleep(0.1)  # Brief delay for realism
+                self.pause(0.1)  # Brief delay for realism
                 self.upgrade_phase = UpgradePhase.IDLE
                 return {
                     'output': 'rollback completed successfully',
@@ -249,7 +434,7 @@ class MockDeviceEngine:
         """Inject an error condition"""
         self.error_conditions.append({
             'type': error_type,
-            'start_time': datetime.now(),
+            'start_time': self.clock.now(),
             'duration': duration_seconds
         })
         # Immediately set error state for concurrent scenario testing
@@ -262,7 +447,7 @@ class MockDeviceEngine:
     
     def _check_error_conditions(self):
         """Check and apply active error conditions"""
-        current_time = datetime.now()
+        current_time = self.clock.now()
         active_errors = []
         
         for error in self.error_conditions:
@@ -367,7 +552,7 @@ class MockDeviceEngine:
         self.upgrade_progress = 0
         
         # Start upgrade simulation in background
-        threading.Thread(target=self._simulate_upgrade_process, daemon=True).start()
+        self._launch_upgrade()
         
         return {
             "status": "started",
@@ -376,17 +561,24 @@ class MockDeviceEngine:
             "estimated_duration": self.config.upgrade_duration_seconds
         }
     
+    def _launch_upgrade(self):
+        """Run the upgrade simulation in a thread of the clock"""
+        self.clock.start_thread(self._simulate_upgrade_process, name=f"upgrade-{self.config.device_id}")
+
     def _simulate_upgrade_process(self):
         """Simulate realistic upgrade process"""
-        phases = [
-            (UpgradePhase.PRE_VALIDATION, 10),
-            (UpgradePhase.IMAGE_DOWNLOAD, 60),
-            (UpgradePhase.IMAGE_VERIFICATION, 15),
-            (UpgradePhase.BACKUP, 30),
-            (UpgradePhase.INSTALLATION, 120),
-            (UpgradePhase.REBOOT, 60),
-            (UpgradePhase.POST_VALIDATION, 30)
-        ]
+        for seconds in self._upgrade_timeline():
+            if seconds:
+                self.clock.sleep(seconds)
+
+    def _upgrade_timeline(self):
+        """
+        Upgrade simulation as a generator of the seconds to wait between steps,
+        so that threads and coroutines drive the same timeline
+        """
+        phases = UPGRADE_PHASES
+        total_ticks = sum(d for _, d in phases)
+        elapsed_ticks = 0
         
         try:
             for phase, duration in phases:
@@ -398,12 +590,14 @@ class MockDeviceEngine:
                         self._handle_upgrade_failure()
                         return
                     
-                    self.upgrade_progress = int((sum(d for _, d in phases[:phases.index((phase, duration))]) + i) / 
-                                              sum(d for _, d in phases) * 100)
-                    time.sleep(1)
+                    self.upgrade_progress = int((elapsed_ticks + i) / total_ticks * 100)
+                    yield 1
+                elapsed_ticks += duration
                 
                 # Platform-specific phase handling
                 self.behavior.handle_upgrade_phase(phase)
+                # Lets a driver that defers pause() wait before the next phase starts
+                yield 0
             
             # Upgrade complete
             self.upgrade_phase = UpgradePhase.COMPLETE
@@ -420,7 +614,7 @@ class MockDeviceEngine:
         self.state = DeviceState.ERROR
         self.session_data['last_error'] = {
             'message': error_msg,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.clock.now().isoformat(),
             'phase': self.upgrade_phase.value
         }
     
@@ -442,33 +636,90 @@ class MockDeviceEngine:
     
     def _save_state(self):
         """Save current state to database"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            INSERT INTO device_state 
-            (timestamp, state, upgrade_phase, progress, firmware_version, error_conditions)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            datetime.now().isoformat(),
+        row = (
+            self.clock.now().isoformat(),
             self.state.value,
             self.upgrade_phase.value,
             self.upgrade_progress,
             self.config.firmware_version,
             json.dumps([e['type'] for e in self.error_conditions])
-        ))
+        )
+        if self.state_store is not None:
+            self.state_store.record(self.config.device_id, row)
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT INTO device_state 
+            (timestamp, state, upgrade_phase, progress, firmware_version, error_conditions)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, row)
         conn.commit()
         conn.close()
 
 
+class CommandDispatcher:
+    """
+    Command patterns of a behavior class compiled into one matcher
+
+    A pattern matches a command that starts with it, and '*' matches any text.
+    Precedence is explicit instead of following the command map's order: an
+    exact command first, then the pattern with the most literal characters,
+    then the pattern declared first. So "show version epld" reaches its own
+    handler instead of "show version".
+    """
+
+    def __init__(self, command_map: Dict[str, Callable]):
+        self.exact = {pattern: handler for pattern, handler in command_map.items() if '*' not in pattern}
+        ordered = sorted(enumerate(command_map), key=lambda item: (-len(item[1].replace('*', '')), item[0]))
+        self.handlers = [command_map[pattern] for _, pattern in ordered]
+        # One group per pattern, in precedence order; the first alternative that matches wins
+        self.regex = re.compile('|'.join(
+            f"({'.*'.join(re.escape(part) for part in pattern.split('*'))})" for _, pattern in ordered))
+
+    def resolve(self, command: str) -> Tuple[Optional[Callable], bool]:
+        """
+        Handler for a command
+
+        Returns:
+            (handler or None, True for an exact command match)
+        """
+        handler = self.exact.get(command)
+        if handler is not None:
+            return handler, True
+        match = self.regex.match(command)
+        if match is None:
+            return None, False
+        return self.handlers[match.lastindex - 1], False
+
+
 class DeviceBehavior(ABC):
     """Abstract base class for device-specific behaviors"""
     
     def __init__(self, device_engine: MockDeviceEngine):
         self.device = device_engine
-        self.command_map = self._build_command_map()
+        self.dispatcher = self._class_dispatcher()
+
+    @classmethod
+    def _class_dispatcher(cls) -> CommandDispatcher:
+        """The behavior class's compiled dispatcher, built from its command map on first use"""
+        dispatcher = cls.__dict__.get('_dispatcher')
+        if dispatcher is None:
+            # Handlers are methods; compile them unbound so every device of the class shares one dispatcher
+            prototype = cls.__new__(cls)
+            command_map = {pattern: handler.__func__ for pattern, handler in prototype._build_command_map().items()}
+            dispatcher = CommandDispatcher(command_map)
+            cls._dispatcher = dispatcher
+        return dispatcher
+
+    @property
+    def command_map(self) -> Dict[str, Callable]:
+        """Mapping of commands to this device's handlers"""
+        return self._build_command_map()
     
     @abstractmethod
     def _build_command_map(self) -> Dict[str, Callable]:
-        """Build mapping of commands to handler functions"""
+        """Build mapping of commands to handler methods ('*' matches any text)"""
         pass
     
     @abstractmethod
@@ -478,22 +729,12 @@ class DeviceBehavior(ABC):
     
     def handle_command(self, command: str, **kwargs) -> Dict[str, Any]:
         """Handle command with platform-specific logic"""
-        # Check for exact command match
-        if command in self.command_map:
-            return self.command_map[command](**kwargs)
-        
-        # Check for pattern matches
-        for pattern, handler in self.command_map.items():
-            if self._command_matches_pattern(command, pattern):
-                return handler(command=command, **kwargs)
-        
-        # Unknown command
-        return self._handle_unknown_command(command)
-    
-    def _command_matches_pattern(self, command: str, pattern: str) -> bool:
-        """Check if command matches pattern"""
-        # Simple pattern matching - can be enhanced
-        return pattern in command or command.startswith(pattern.rstrip('*'))
+        handler, exact = self.dispatcher.resolve(command)
+        if handler is None:
+            return self._handle_unknown_command(command)
+        if exact:
+            return handler(self, **kwargs)
+        return handler(self, command=command, **kwargs)
     
     def _handle_unknown_command(self, command: str) -> Dict[str, Any]:
         """Handle unknown command"""
@@ -516,6 +757,7 @@ class CiscoNXOSBehavior(DeviceBehavior):
             "install all*": self._install_command,
             "show system resources": self._show_system_resources,
             "show module": self._show_module,
+            "show inventory": self._show_inventory,
             "dir bootflash:*": self._dir_bootflash,
             "show file * md5sum": self._show_file_md5,
             "copy * bootflash:*": self._copy_file,
@@ -629,7 +871,7 @@ Services impact:
         elif phase == UpgradePhase.COMPLETE:
             # Simulate EPLD upgrade if required
             if self.device.config.custom_behaviors.get('epld_upgrade_required'):
-                time.sleep(30)  # Additional time for EPLD
+                self.device.pause(30)  # Additional time for EPLD
     
     def _install_command(self, command: str = "", **kwargs) -> Dict[str, Any]:
         """Handle install all command"""
@@ -661,10 +903,20 @@ CPU states  :    2.0% user,   1.5% kernel,  96.5% idle
 --- ----- ------------------------------------- ------------------- ----------
 1    48   48x25G + 6x100G Ethernet Module       {self.device.config.model}  active"""
         }
+
+    def _show_inventory(self, **kwargs) -> Dict[str, Any]:
+        """Show chassis inventory (read by the cisco.nxos cliconf plugin on connect)"""
+        return {
+            "status": "success",
+            "output": f"""NAME: "Chassis",  DESCR: "Nexus 9000 Chassis"
+PID: {self.device.config.model}  ,  VID: V01 ,  SN: MOCK-{self.device.config.device_id}"""
+        }
     
     def _dir_bootflash(self, command: str = "", **kwargs) -> Dict[str, Any]:
         """Simulate directory listing of bootflash"""
         filename = command.split(':')[-1] if ':' in command else ""
+        if self.device.bootflash_dir:
+            return self._dir_uploaded_files(filename)
         if filename:
             # Simulate file exists check
             if self.device.upgrade_phase in [UpgradePhase.IMAGE_DOWNLOAD, UpgradePhase.IMAGE_VERIFICATION]:
@@ -688,11 +940,42 @@ Usage for bootflash://sup-local
   1234567890  Mar 15 10:30:15 2024  backup-config.cfg"""
         }
     
+    def _dir_uploaded_files(self, filename: str) -> Dict[str, Any]:
+        """Directory listing of the files uploaded to the virtual bootflash"""
+        names = sorted(os.listdir(self.device.bootflash_dir))
+        if filename:
+            names = [name for name in names if name == os.path.basename(filename)]
+            if not names:
+                return {"status": "error", "output": "No such file or directory"}
+        lines = []
+        used = 0
+        for name in names:
+            stat = os.stat(os.path.join(self.device.bootflash_dir, name))
+            used += stat.st_size
+            modified = datetime.fromtimestamp(stat.st_mtime).strftime('%b %d %H:%M:%S %Y')
+            lines.append(f"{stat.st_size:>12}  {modified}  {name}")
+        total = 54533087890
+        lines.append(f"""
+Usage for bootflash://sup-local
+{used:>12} bytes used
+{total - used:>12} bytes free
+{total:>12} bytes total""")
+        return {"status": "success", "output": "\n".join(lines)}
+
     def _show_file_md5(self, command: str = "", **kwargs) -> Dict[str, Any]:
         """Simulate MD5 hash calculation"""
-        filename = command.split()[-1] if command else ""
-        # Simulate realistic MD5 hash
+        parts = command.split()
+        filename = parts[2] if len(parts) > 3 else (parts[-1] if parts else "")
         import hashlib
+        uploaded = self.device.bootflash_file(filename)
+        if uploaded:
+            # Real checksum of an uploaded image
+            hash_obj = hashlib.md5()
+            with open(uploaded, 'rb') as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b''):
+                    hash_obj.update(chunk)
+            return {"status": "success", "output": f"{hash_obj.hexdigest()}  {filename}"}
+        # Simulate realistic MD5 hash
         hash_obj = hashlib.md5(f"{filename}{self.device.config.device_id}".encode())
         mock_hash = hash_obj.hexdigest()
         
@@ -843,7 +1126,7 @@ Current {ha_role} unit operating normally."""
         """Handle FortiOS specific upgrade phase logic"""
         if phase == UpgradePhase.INSTALLATION and self.device.config.custom_behaviors.get('ha_enabled'):
             # Simulate HA synchronization delay
-            time.sleep(10)
+            self.device.pause(10)
         
         # Handle multi-step upgrade logic
         if phase == UpgradePhase.COMPLETE:
@@ -855,7 +1138,7 @@ Current {ha_role} unit operating normally."""
                 next_version = upgrade_path[current_step + 1]
                 self.device.config.custom_behaviors['current_step'] = current_step + 1
                 self.device.config.target_version = next_version
-                time.sleep(5)  # Brief pause between steps
+                self.device.pause(5)  # Brief pause between steps
                 self.device.start_upgrade(next_version)
     
     def _restore_image(self, command: str = "", **kwargs) -> Dict[str, Any]:
@@ -1065,9 +1348,13 @@ end"""
 class MockDeviceManager:
     """Manager for multiple mock devices"""
     
-    def __init__(self):
+    device_class = MockDeviceEngine
+
+    def __init__(self, state_mode: Optional[str] = None, clock: Optional[RealClock] = None):
         self.devices: Dict[str, MockDeviceEngine] = {}
         self.error_scenarios: List[Dict[str, Any]] = []
+        self.state_mode = state_mode
+        self.clock = clock or RealClock()
 
     def get_device(self, device_id: str) -> Optional[MockDeviceEngine]:
         """Get device by ID"""
@@ -1081,7 +1368,7 @@ class MockDeviceManager:
             'device_ids': device_ids,
             'error_type': error_type,
             'duration': duration,
-            'start_time': datetime.now()
+            'start_time': self.clock.now()
         }
         
         for device_id in device_ids:
@@ -1114,7 +1401,9 @@ class MockDeviceManager:
             firmware_version="1.0.0",
             target_version="2.0.0"
         )
-        device = MockDeviceEngine(device_config)
+        if self.state_mode:
+            device_config.state_mode = self.state_mode
+        device = self.device_class(device_config, clock=self.clock)
         self.devices[device_name] = device
         return device_name
     
@@ -1171,6 +1460,8 @@ class MockDeviceManager:
         """Clean up resources and close database connections."""
         if hasattr(self, 'db_connection') and self.db_connection:
             self.db_connection.close()
+        for store in {id(d.state_store): d.state_store for d in self.devices.values() if d.state_store}.values():
+            store.flush()
         print("Mock device manager cleanup completed")
 
 
@@ -1362,7 +1653,6 @@ class ConcurrentUpgradeSimulator:
 if __name__ == "__main__":
     import argparse
     import sys
-    import os
     import socket
     import threading
     
@@ -1378,9 +1668,11 @@ if __name__ == "__main__":
     parser.add_argument('--name', default=None,
                         help='Device name')
     parser.add_argument('--daemon', action='store_true',
-                        help='Run as daemon (for testing)')
+                        help='Run as daemon serving the device over SSH on --port (for testing)')
     parser.add_argument('--platform', default=None,
                         help='Platform type for daemon mode')
+    parser.add_argument('--state-mode', choices=['shared', 'per_device'], default=None,
+                        help='State persistence: one shared WAL database, or a database per device for debugging')
     
     args = parser.parse_args()
     
@@ -1388,18 +1680,34 @@ if __name__ == "__main__":
     os.makedirs("state", exist_ok=True)
     
     # Create mock device manager
-    manager = MockDeviceManager()
+    manager = MockDeviceManager(state_mode=args.state_mode)
     
     if args.daemon:
         print(f"Starting mock SSH daemon on port {args.port}...")
         platform = args.platform or args.test_platform
         device_name = args.name or f"test-{platform}-01"
         
+        # Serve the device over real SSH when asyncssh is available (mock_ssh_server.py)
+        import mock_ssh_server
+        if mock_ssh_server.asyncssh is not None:
+            import asyncio
+            fleet = mock_ssh_server.MockFleet(mock_ssh_server.AsyncMockDeviceManager(state_mode=args.state_mode),
+                                              tempfile.mkdtemp(prefix='mock-bootflash-'))
+            fleet.add_device(platform, device_name, args.port)
+            print(f"Created mock {platform} device: {device_name}")
+            try:
+                asyncio.run(mock_ssh_server.serve(fleet, 'localhost', None, None))
+            except KeyboardInterrupt:
+                print("Shutting down...")
+            sys.exit(0)
+
         # Create a device for the daemon
         device_id = manager.create_device(platform, device_name)
         print(f"Created mock {platform} device: {device_name}")
         
-        # Start a simple TCP server to simulate SSH daemon
+        # Without asyncssh, a TCP server with an SSH banner (port checks only)
+        print("asyncssh is not installed (pip install asyncssh); serving an SSH banner only, "
+              "SSH logins will fail", file=sys.stderr)
         def handle_client(conn, addr):
             try:
                 conn.send(b"SSH-2.0-MockDevice_1.0\r\n")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Mock InfluxDB v2 write API for metrics export testing
+Accepts gzip or plain line protocol on POST /api/v2/write and keeps the points.
+Like InfluxDB, a batch whose field changes type within a measurement (float vs
+boolean) is rejected with HTTP 400 and none of its points are written.
+
+Test control endpoints:
+  PUT  /_mock/status   {"status": 503} answer writes with this status (200 restores)
+  GET  /_mock/points   accepted points and request counts
+"""
+
+import gzip
+import json
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def split_unescaped(text, separator):
+    """Split line protocol on a separator that is not backslash-escaped."""
+    parts, current, escaped = [], '', False
+    for char in text:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == '\\':
+            current += char
+            escaped = True
+        elif char == separator:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def field_types(line):
+    """
+    Return (measurement, {field: type}) of one line-protocol point.
+
+    Raises:
+        ValueError: for a point that is not measurement[,tags] fields [timestamp]
+    """
+    parts = split_unescaped(line, ' ')
+    if len(parts) not in (2, 3):
+        raise ValueError(f"unable to parse '{line}'")
+    measurement = split_unescaped(parts[0], ',')[0]
+    types = {}
+    for field in split_unescaped(parts[1], ','):
+        key, _, value = field.partition('=')
+        if not key or not value:
+            raise ValueError(f"unable to parse '{line}': missing field value")
+        if value in ('true', 'false'):
+            types[key] = 'boolean'
+        else:
+            float(value)
+            types[key] = 'float'
+    return measurement, types
+
+
+class MockInfluxDB:
+    """In-memory point store shared by the request handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.points = []
+        self.schema = {}
+        self.status = 200
+        self.stats = {'writes': 0, 'rejected': 0}
+
+    def write(self, lines):
+        """Store a batch all-or-nothing; returns (HTTP status, error message or None)."""
+        with self.lock:
+            self.stats['writes'] += 1
+            if self.status != 200:
+                return self.status, 'service unavailable'
+            schema = dict(self.schema)
+            for line in lines:
+                try:
+                    measurement, types = field_types(line)
+                except ValueError as e:
+                    self.stats['rejected'] += 1
+                    return 400, str(e)
+                for key, kind in types.items():
+                    known = schema.setdefault((measurement, key), kind)
+                    if known != kind:
+                        self.stats['rejected'] += 1
+                        return 400, (f"partial write: field type conflict: input field \"{key}\" on measurement "
+                                     f"\"{measurement}\" is type {kind}, already exists as type {known}")
+            self.schema = schema
+            self.points.extend(lines)
+            return 204, None
+
+
+class Handler(BaseHTTPRequestHandler):
+    influxdb = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path.strip('/') == '_mock/points':
+            with self.influxdb.lock:
+                return self.send_json(200, dict(self.influxdb.stats, points=list(self.influxdb.points)))
+        return self.send_json(404, {'code': 'not found', 'message': 'path not found'})
+
+    def do_PUT(self):
+        if urllib.parse.urlparse(self.path).path.strip('/') == '_mock/status':
+            with self.influxdb.lock:
+                self.influxdb.status = int(json.loads(self.read_body() or b'{}').get('status', 200))
+            return self.send_json(200, {'status': self.influxdb.status})
+        return self.send_json(404, {'code': 'not found', 'message': 'path not found'})
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path.strip('/') != 'api/v2/write':
+            return self.send_json(404, {'code': 'not found', 'message': 'path not found'})
+        if not self.headers.get('Authorization', '').startswith('Token '):
+            return self.send_json(401, {'code': 'unauthorized', 'message': 'unauthorized access'})
+        lines = [line for line in self.read_body().decode('utf-8').splitlines() if line.strip()]
+        status, error = self.influxdb.write(lines)
+        if error:
+            return self.send_json(status, {'code': 'invalid' if status == 400 else 'unavailable', 'message': error})
+        return self.send_json(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock InfluxDB v2 write API')
+    parser.add_argument('--port', type=int, default=18086, help='Listen port (default: 18086)')
+    args = parser.parse_args()
+
+    Handler.influxdb = MockInfluxDB()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
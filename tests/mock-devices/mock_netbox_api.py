@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Mock NetBox REST API for inventory testing
+Serves generated devices, sites, platforms, custom fields and config contexts with NetBox list
+semantics (limit/offset paging capped at MAX_PAGE_SIZE, ordering, brief, id,
+name, status/role/platform and last_updated__gte filters) and bulk device
+PATCH (a list of objects with id, applied all-or-nothing; unknown custom
+fields are rejected with HTTP 400 like NetBox).
+
+Test control endpoints:
+  PATCH  /_mock/devices/<id>  update device fields (bumps last_updated)
+  DELETE /_mock/devices/<id>  delete a device
+  PATCH  /_mock/config-contexts/<id>  update config context data (re-renders the
+                              devices' config_context without bumping their last_updated)
+  GET    /_mock/stats         request counts per endpoint
+"""
+
+import json
+import argparse
+import threading
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+MAX_PAGE_SIZE = 1000
+INITIAL_LAST_UPDATED = "2024-01-01T00:00:00.000000Z"
+PLATFORMS = ['cisco-nxos', 'cisco-iosxe', 'fortios', 'opengear']
+ROLES = ['switch', 'router', 'firewall']
+
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def brief(obj):
+    return {key: obj[key] for key in ('id', 'url', 'display', 'name', 'slug') if key in obj}
+
+
+def generate(device_count, site_count):
+    """Deterministic NetBox objects; a few devices fall outside the inventory filters."""
+    regions = [{'id': 1, 'name': 'Europe', 'slug': 'europe'}, {'id': 2, 'name': 'Americas', 'slug': 'americas'}]
+    sites = {}
+    for i in range(1, site_count + 1):
+        kind = ['prod', 'stg', 'lab'][i % 3]
+        sites[i] = {
+            'id': i, 'name': f"{kind.upper()}-Site-{i:03d}", 'slug': f"{kind}-site-{i:03d}",
+            'display': f"{kind.upper()}-Site-{i:03d}", 'region': regions[i % 2],
+            'physical_address': f"{i} Main Street, Springfield, Country{i % 4}", 'time_zone': 'Europe/London',
+            'last_updated': INITIAL_LAST_UPDATED,
+        }
+    manufacturers = {
+        'cisco-nxos': {'id': 1, 'name': 'Cisco', 'slug': 'cisco'},
+        'cisco-iosxe': {'id': 1, 'name': 'Cisco', 'slug': 'cisco'},
+        'fortios': {'id': 2, 'name': 'Fortinet', 'slug': 'fortinet'},
+        'opengear': {'id': 3, 'name': 'Opengear', 'slug': 'opengear'},
+        'junos': {'id': 4, 'name': 'Juniper', 'slug': 'juniper'},
+    }
+    platforms = {}
+    for i, slug in enumerate(PLATFORMS + ['junos'], start=1):
+        platforms[i] = {'id': i, 'name': slug.upper(), 'slug': slug, 'display': slug.upper(),
+                        'manufacturer': manufacturers[slug], 'last_updated': INITIAL_LAST_UPDATED}
+    platform_ids = {p['slug']: p['id'] for p in platforms.values()}
+    custom_fields = {
+        1: {'id': 1, 'name': 'criticality', 'object_types': ['dcim.device'], 'default': 'medium',
+            'last_updated': INITIAL_LAST_UPDATED},
+        2: {'id': 2, 'name': 'upgrade_status', 'object_types': ['dcim.device'], 'default': 'pending',
+            'last_updated': INITIAL_LAST_UPDATED},
+    }
+    for i, name in enumerate(['current_firmware', 'last_upgrade_date', 'bgp_enabled', 'ospf_enabled',
+                              'ha_cluster_id'], start=3):
+        custom_fields[i] = {'id': i, 'name': name, 'object_types': ['dcim.device'], 'default': None,
+                            'last_updated': INITIAL_LAST_UPDATED}
+    config_contexts = {
+        1: {'id': 1, 'name': 'Platform defaults', 'weight': 1000, 'is_active': True,
+            'data': {'firmware_directory': 'bootflash:'}, 'last_updated': INITIAL_LAST_UPDATED},
+    }
+
+    devices = {}
+    for i in range(1, device_count + 1):
+        slug = 'junos' if i % 50 == 0 else PLATFORMS[i % len(PLATFORMS)]
+        role = 'patch-panel' if i % 60 == 0 else ROLES[i % len(ROLES)]
+        site = sites[1 + i % site_count]
+        device_type = {'id': 1 + i % 4, 'model': f"Model-{1 + i % 4}", 'slug': f"model-{1 + i % 4}",
+                       'manufacturer': manufacturers[slug]}
+        devices[i] = {
+            'id': i,
+            'name': f"{site['slug']}-{role}-{i:05d}",
+            'display': f"{site['slug']}-{role}-{i:05d}",
+            'status': {'value': 'planned' if i % 40 == 0 else 'active',
+                       'label': 'Planned' if i % 40 == 0 else 'Active'},
+            'role': {'id': 1 + ROLES.index(role) if role in ROLES else 9, 'name': role.title(), 'slug': role},
+            'device_type': device_type,
+            'platform': brief(platforms[platform_ids[slug]]),
+            'site': brief(site),
+            'rack': {'id': i % 100, 'name': f"R{i % 100:02d}"} if i % 5 else None,
+            'position': i % 42 or None,
+            'serial': f"SN{i:08d}",
+            'primary_ip4': {'id': i, 'address': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}/24"} if i % 7 else None,
+            'primary_ip6': None,
+            'config_context': {'maintenance_window': f"sun-{i % 3:02d}00", 'firmware_directory': 'bootflash:'},
+            'local_context_data': None,
+            'custom_fields': {'criticality': ['high', 'medium', 'low', None][i % 4], 'upgrade_status': None,
+                              'bgp_enabled': i % 2 == 0, 'ospf_enabled': i % 3 == 0, 'ha_cluster_id': None},
+            'last_updated': INITIAL_LAST_UPDATED,
+        }
+    return {'devices': devices, 'sites': sites, 'platforms': platforms, 'custom_fields': custom_fields,
+            'config_contexts': config_contexts}
+
+
+class MockNetBox:
+    """In-memory object store shared by the request handler threads."""
+
+    ENDPOINTS = {
+        'dcim/devices': 'devices',
+        'dcim/sites': 'sites',
+        'dcim/platforms': 'platforms',
+        'extras/custom-fields': 'custom_fields',
+        'extras/config-contexts': 'config_contexts',
+    }
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def matches(self, name, obj, params):
+        if name != 'devices':
+            return True
+        if 'status' in params and obj['status']['value'] not in params['status']:
+            return False
+        if 'role' in params and obj['role']['slug'] not in params['role']:
+            return False
+        if 'platform' in params and obj['platform']['slug'] not in params['platform']:
+            return False
+        return True
+
+    def list(self, name, params):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+            objects = list(self.objects[name].values())
+        if 'id' in params:
+            ids = {int(value) for value in params['id']}
+            objects = [obj for obj in objects if obj['id'] in ids]
+        if 'name' in params:
+            names = set(params['name'])
+            objects = [obj for obj in objects if obj.get('name') in names]
+        if 'last_updated__gte' in params:
+            since = parse_time(params['last_updated__gte'][0])
+            objects = [obj for obj in objects if parse_time(obj['last_updated']) >= since]
+        objects = sorted((obj for obj in objects if self.matches(name, obj, params)), key=lambda o: o['id'])
+
+        limit = min(int(params.get('limit', ['50'])[0]) or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        offset = int(params.get('offset', ['0'])[0])
+        page = objects[offset:offset + limit]
+        if params.get('brief', ['false'])[0].lower() in ('true', '1'):
+            page = [brief(obj) for obj in page]
+        return {'count': len(objects), 'next': None, 'previous': None, 'results': page}
+
+    def update_device(self, device_id, fields):
+        with self.lock:
+            device = self.objects['devices'].get(device_id)
+            if device is None:
+                return False
+            for key, value in fields.items():
+                if isinstance(value, dict) and isinstance(device.get(key), dict):
+                    device[key].update(value)
+                else:
+                    device[key] = value
+            device['last_updated'] = now()
+            return True
+
+    def bulk_update_devices(self, updates):
+        """Apply a bulk PATCH list in one transaction; returns an error message or None."""
+        with self.lock:
+            self.stats['devices_bulk_patch'] = self.stats.get('devices_bulk_patch', 0) + 1
+            defined = {field['name'] for field in self.objects['custom_fields'].values()}
+            devices = self.objects['devices']
+            for update in updates:
+                if not isinstance(update, dict) or update.get('id') not in devices:
+                    return 'Bulk update objects must include the id of an existing object.'
+                unknown = set(update.get('custom_fields') or {}) - defined
+                if unknown:
+                    return 'Unknown field name %r in custom field data.' % sorted(unknown)[0]
+            stamp = now()
+            for update in updates:
+                device = devices[update['id']]
+                device['custom_fields'].update(update.get('custom_fields') or {})
+                device['last_updated'] = stamp
+            return None
+
+    def update_config_context(self, context_id, data):
+        """Change a config context; like NetBox, the devices it renders into keep their last_updated."""
+        with self.lock:
+            context = self.objects['config_contexts'].get(context_id)
+            if context is None:
+                return False
+            context['data'].update(data)
+            context['last_updated'] = now()
+            for device in self.objects['devices'].values():
+                device['config_context'].update(data)
+            return True
+
+    def delete_device(self, device_id):
+        with self.lock:
+            return self.objects['devices'].pop(device_id, None) is not None
+
+
+class Handler(BaseHTTPRequestHandler):
+    netbox = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def mock_object_id(self, kind='devices'):
+        parts = urllib.parse.urlparse(self.path).path.strip('/').split('/')
+        if len(parts) == 3 and parts[:2] == ['_mock', kind] and parts[2].isdigit():
+            return int(parts[2])
+        return None
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        path = url.path.strip('/')
+        if path == '_mock/stats':
+            return self.send_json(200, self.netbox.stats)
+        if path.startswith('api/') and path[4:] in MockNetBox.ENDPOINTS:
+            params = urllib.parse.parse_qs(url.query)
+            return self.send_json(200, self.netbox.list(MockNetBox.ENDPOINTS[path[4:]], params))
+        return self.send_json(404, {'detail': 'Not found.'})
+
+    def do_PATCH(self):
+        device_id = self.mock_object_id()
+        context_id = self.mock_object_id('config-contexts')
+        length = int(self.headers.get('Content-Length', 0))
+        fields = json.loads(self.rfile.read(length) or b'{}')
+        if urllib.parse.urlparse(self.path).path.strip('/') == 'api/dcim/devices' and isinstance(fields, list):
+            error = self.netbox.bulk_update_devices(fields)
+            if error:
+                return self.send_json(400, {'detail': error})
+            return self.send_json(200, [{'id': update['id']} for update in fields])
+        if device_id is not None and self.netbox.update_device(device_id, fields):
+            return self.send_json(200, {'id': device_id})
+        if context_id is not None and self.netbox.update_config_context(context_id, fields.get('data', {})):
+            return self.send_json(200, {'id': context_id})
+        return self.send_json(404, {'detail': 'Not found.'})
+
+    def do_DELETE(self):
+        device_id = self.mock_object_id()
+        if device_id is not None and self.netbox.delete_device(device_id):
+            return self.send_json(204, {})
+        return self.send_json(404, {'detail': 'Not found.'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock NetBox REST API')
+    parser.add_argument('--port', type=int, default=18000, help='Listen port (default: 18000)')
+    parser.add_argument('--devices', type=int, default=1000, help='Generated devices (default: 1000)')
+    parser.add_argument('--sites', type=int, default=25, help='Generated sites (default: 25)')
+    args = parser.parse_args()
+
+    Handler.netbox = MockNetBox(generate(args.devices, args.sites))
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Mock SSH Device Server
+Serves many AsyncMockDeviceEngine devices (async_mock_device_engine.py) over
+real SSH from one asyncio process, so Ansible network_cli, ssh and raw tasks
+and playbooks run end to end against mock devices:
+
+  - one port per device (--devices N from --base-port), and/or one shared
+    port (--port) where the login name selects the device
+  - interactive shells with the platform prompt, and exec requests; commands
+    go to the CiscoNXOSBehavior, CiscoIOSXEBehavior, FortiOSBehavior and
+    OpengearBehavior classes (with their simulated latency and upgrades)
+  - SCP and SFTP uploads land in the device's virtual bootflash, which the
+    NX-OS 'dir' and 'show file' commands read
+
+Any user name and password or key is accepted. Requires asyncssh
+(pip install asyncssh).
+
+Usage:
+  python3 mock_ssh_server.py --devices 500 --base-port 30000 --inventory /tmp/mock-inventory.yml
+  ANSIBLE_HOST_KEY_CHECKING=False ansible-playbook -i /tmp/mock-inventory.yml -f 500 ...
+"""
+
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+import resource
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+from async_mock_device_engine import AsyncMockDeviceEngine, AsyncMockDeviceManager
+from mock_device_engine import DeviceError, NetworkError
+
+
+# Prompt, error text and Ansible settings per platform (inventory/group_vars group names;
+# 'platform' is the host variable the group_vars and roles select on)
+PLATFORM_SHELLS = {
+    'cisco_nxos': {
+        'platform': 'nxos',
+        'prompt': '{name}# ',
+        'error': "% Invalid command at '^' marker.",
+        'network_os': 'cisco.nxos.nxos',
+        'connection': 'ansible.netcommon.network_cli',
+    },
+    'cisco_iosxe': {
+        'platform': 'ios',
+        'prompt': '{name}#',
+        'error': "% Invalid input detected at '^' marker.",
+        'network_os': 'cisco.ios.ios',
+        'connection': 'ansible.netcommon.network_cli',
+    },
+    'fortios': {
+        'platform': 'fortios',
+        'prompt': '{name} # ',
+        'error': 'Command fail. Return code -61',
+        'network_os': 'fortinet.fortios.fortios',
+        'connection': 'ansible.builtin.ssh',
+    },
+    'opengear': {
+        'platform': 'opengear',
+        'prompt': 'root@{name}:~# ',
+        'error': '-sh: {command}: not found',
+        'network_os': 'opengear',
+        'connection': 'ansible.builtin.ssh',
+    },
+}
+PLATFORMS = list(PLATFORM_SHELLS)
+
+# Session commands answered by the shell itself
+TERMINAL_COMMANDS = re.compile(r'^(terminal|term|screen-length|config system console|set output)\b', re.I)
+EXIT_COMMANDS = {'exit', 'quit', 'logout'}
+# Virtual file system prefixes of the platforms, all mapped to the bootflash
+FILE_SYSTEM_PREFIX = re.compile(rb'^(bootflash|flash|disk0|harddisk|usb1):/*')
+
+
+class MockFleet:
+    """Mock devices served over SSH, with the port or login name that selects each"""
+
+    def __init__(self, manager: AsyncMockDeviceManager, bootflash_root: str):
+        self.manager = manager
+        self.bootflash_root = bootflash_root
+        self.ports: Dict[int, str] = {}
+
+    def add_device(self, platform: str, name: str, port: Optional[int] = None) -> AsyncMockDeviceEngine:
+        self.manager.create_device(platform, name)
+        device = self.manager.devices[name]
+        device.bootflash_dir = os.path.join(self.bootflash_root, name)
+        os.makedirs(device.bootflash_dir, exist_ok=True)
+        if port is not None:
+            self.ports[port] = name
+        return device
+
+    def select(self, port: int, username: str) -> Optional[AsyncMockDeviceEngine]:
+        """The device of a dedicated port, or the device named by the login on a shared port"""
+        name = self.ports.get(port, username)
+        return self.manager.devices.get(name)
+
+    def inventory(self, host: str = '127.0.0.1') -> Dict:
+        """Ansible inventory of the devices with dedicated ports, in the platform groups of group_vars"""
+        groups = {}
+        for port, name in sorted(self.ports.items()):
+            device = self.manager.devices[name]
+            platform = platform_group(device.config.platform_type)
+            shell = PLATFORM_SHELLS[platform]
+            groups.setdefault(platform, {'hosts': {}})['hosts'][name] = {
+                'platform': shell['platform'],
+                'ansible_host': host,
+                'ansible_port': port,
+                'ansible_user': 'admin',
+                'ansible_password': 'admin',
+                # Password login; overrides the vault key lookup of group_vars/all.yml
+                'ansible_ssh_private_key_file': '',
+                'ansible_network_os': shell['network_os'],
+                'ansible_connection': shell['connection'],
+            }
+        return {'all': {'children': groups}}
+
+
+def platform_group(platform_type: str) -> str:
+    aliases = {'nxos': 'cisco_nxos', 'ios': 'cisco_iosxe', 'iosxe': 'cisco_iosxe'}
+    return aliases.get(platform_type, platform_type)
+
+
+def apply_pipe(output: str, pipe: str) -> str:
+    """Output filters after '|' (include/grep, exclude, begin); other filters are ignored"""
+    verb, _, pattern = pipe.strip().partition(' ')
+    verb = verb.lower()
+    if not pattern:
+        return output
+    try:
+        regex = re.compile(pattern.strip())
+    except re.error:
+        regex = re.compile(re.escape(pattern.strip()))
+    lines = output.splitlines()
+    if verb in ('include', 'inc', 'grep', 'i'):
+        lines = [line for line in lines if regex.search(line)]
+    elif verb in ('exclude', 'exc', 'e'):
+        lines = [line for line in lines if not regex.search(line)]
+    elif verb in ('begin', 'b'):
+        for index, line in enumerate(lines):
+            if regex.search(line):
+                lines = lines[index:]
+                break
+        else:
+            lines = []
+    return '\n'.join(lines)
+
+
+async def run_command(device: AsyncMockDeviceEngine, command: str) -> Tuple[str, bool]:
+    """
+    Run one CLI command on a device
+
+    Returns:
+        (output, success)
+
+    Raises:
+        NetworkError: injected connection loss or timeout; the session is dropped
+    """
+    shell = PLATFORM_SHELLS[platform_group(device.config.platform_type)]
+    if not command:
+        return '', True
+    if TERMINAL_COMMANDS.match(command):
+        return '', True
+    if command == 'show privilege':
+        return 'Current privilege level is 15', True
+
+    base, _, pipe = command.partition(' | ')
+    try:
+        response = await device.process_command(base.strip())
+    except DeviceError as e:
+        return f'% Error: {e}', False
+
+    if pipe.strip().startswith('json'):
+        if isinstance(response.get('data'), (dict, list)):
+            return json.dumps(response['data'], indent=2 if 'pretty' in pipe else None), True
+        return shell['error'].format(command=command), False
+
+    if response.get('output') is not None:
+        output = response['output']
+        return (apply_pipe(output, pipe) if pipe else output), response.get('status') != 'error'
+    return shell['error'].format(command=base.strip()), False
+
+
+if asyncssh is not None:
+
+    class DeviceSSHServer(asyncssh.SSHServer):
+        """One SSH connection; the login selects the device"""
+
+        def __init__(self, fleet: MockFleet, port: int):
+            self.fleet = fleet
+            self.port = port
+            self.conn = None
+
+        def connection_made(self, conn):
+            self.conn = conn
+
+        def begin_auth(self, username: str) -> bool:
+            device = self.fleet.select(self.port, username)
+            if device is None:
+                # Unknown device on the shared port: authentication cannot succeed
+                return True
+            self.conn.set_extra_info(device=device)
+            return True
+
+        def password_auth_supported(self) -> bool:
+            return True
+
+        def validate_password(self, username: str, password: str) -> bool:
+            return self.conn.get_extra_info('device') is not None
+
+        def public_key_auth_supported(self) -> bool:
+            return True
+
+        def validate_public_key(self, username: str, key) -> bool:
+            return self.conn.get_extra_info('device') is not None
+
+    class BootflashSFTPServer(asyncssh.SFTPServer):
+        """SFTP/SCP confined to the device's virtual bootflash; bootflash:, flash: etc. map to its root"""
+
+        def __init__(self, chan):
+            device = chan.get_extra_info('device')
+            super().__init__(chan, chroot=os.fsencode(device.bootflash_dir))
+
+        def map_path(self, path: bytes) -> bytes:
+            return super().map_path(FILE_SYSTEM_PREFIX.sub(b'/', path))
+
+
+async def handle_session(process):
+    """Interactive shell (with the platform prompt) or a single exec command"""
+    device = process.get_extra_info('device')
+    shell = PLATFORM_SHELLS[platform_group(device.config.platform_type)]
+
+    if process.command is not None:
+        try:
+            output, success = await run_command(device, process.command.strip())
+        except NetworkError as e:
+            process.stderr.write(f'{e}\n')
+            process.exit(255)
+            return
+        process.stdout.write(output + '\n' if output else '')
+        process.exit(0 if success else 1)
+        return
+
+    prompt = shell['prompt'].format(name=device.config.device_id)
+    process.stdout.write('\n' + prompt)
+    while True:
+        try:
+            line = await process.stdin.readline()
+        except (asyncssh.BreakReceived, asyncssh.SignalReceived, asyncssh.TerminalSizeChanged):
+            continue
+        if not line:
+            break
+        command = line.strip()
+        if command in EXIT_COMMANDS:
+            break
+        try:
+            output, _ = await run_command(device, command)
+        except NetworkError:
+            # Injected connection loss: drop the session without a reply
+            process.channel.get_connection().abort()
+            return
+        process.stdout.write((output + '\n' if output else '') + prompt)
+    process.exit(0)
+
+
+async def serve(fleet: MockFleet, host: str, shared_port: Optional[int], host_key_path: Optional[str]):
+    """Start a listener per device port (and the shared port) and serve until cancelled"""
+    if host_key_path and os.path.exists(host_key_path):
+        host_key = asyncssh.read_private_key(host_key_path)
+    else:
+        host_key = asyncssh.generate_private_key('ssh-ed25519')
+        if host_key_path:
+            host_key.write_private_key(host_key_path)
+
+    ports = sorted(fleet.ports) + ([shared_port] if shared_port else [])
+    servers = []
+    for port in ports:
+        servers.append(await asyncssh.create_server(
+            lambda port=port: DeviceSSHServer(fleet, port), host, port,
+            server_host_keys=[host_key],
+            process_factory=handle_session,
+            sftp_factory=BootflashSFTPServer,
+            allow_scp=True,
+            keepalive_interval=0,
+        ))
+    print(f"Mock SSH server: {len(fleet.manager.devices)} devices on {host}, "
+          f"{len(fleet.ports)} device ports" + (f", shared port {shared_port}" if shared_port else ""), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock network devices over SSH')
+    parser.add_argument('--devices', type=int, default=1, help='Devices to serve (default: 1)')
+    parser.add_argument('--platforms', nargs='+', default=PLATFORMS, choices=PLATFORMS,
+                        help='Platforms, assigned to the devices in turn (default: all)')
+    parser.add_argument('--name-prefix', default='mock', help='Device name prefix (default: mock)')
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address (default: 127.0.0.1)')
+    parser.add_argument('--base-port', type=int, default=None,
+                        help='First port of the one-port-per-device listeners (default: none)')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Shared port where the login name selects the device (default: none)')
+    parser.add_argument('--bootflash-dir', default=None,
+                        help='Directory of the virtual bootflash of each device (default: a temp directory)')
+    parser.add_argument('--host-key', default=None, help='Host key file, generated if missing (default: ephemeral)')
+    parser.add_argument('--inventory', default=None,
+                        help='Write an Ansible YAML inventory of the device ports to this file')
+    parser.add_argument('--firmware-version', default=None, help='Initial firmware version of every device')
+    args = parser.parse_args()
+
+    if asyncssh is None:
+        print("mock_ssh_server.py requires asyncssh (pip install asyncssh)", file=sys.stderr)
+        return 1
+    if args.base_port is None and args.port is None:
+        parser.error('--base-port and/or --port is required')
+
+    # A listener per device port plus a connection per Ansible fork
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = 4 * args.devices + 1024
+    if soft < wanted and soft != resource.RLIM_INFINITY:
+        limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+    fleet = MockFleet(AsyncMockDeviceManager(), args.bootflash_dir or tempfile.mkdtemp(prefix='mock-bootflash-'))
+    for i in range(args.devices):
+        platform = args.platforms[i % len(args.platforms)]
+        port = args.base_port + i if args.base_port is not None else None
+        device = fleet.add_device(platform, f"{args.name_prefix}-{platform.replace('_', '-')}-{i + 1:04d}", port)
+        if args.firmware_version:
+            device.config.firmware_version = args.firmware_version
+
+    if args.inventory:
+        with open(args.inventory, 'w', encoding='utf-8') as handle:
+            yaml.safe_dump(fleet.inventory(args.host), handle, default_flow_style=False, sort_keys=False)
+
+    try:
+        asyncio.run(serve(fleet, args.host, args.port, args.host_key))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
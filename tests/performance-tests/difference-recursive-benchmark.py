@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the difference_recursive filter plugin
+Measures list-of-dict diffing on ARP/MAC sized baselines (10k/100k/500k entries)
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'ansible-content', 'filter_plugins'))
+
+from platform_filters import difference_recursive  # noqa: E402
+
+
+DEFAULT_SIZES = [10000, 100000, 500000]
+
+
+def legacy_list_difference(data1, data2):
+    """Nested-loop list-of-dict difference used before hash indexing"""
+    result = []
+    for item1 in data1:
+        found = False
+        for item2 in data2:
+            if item1 == item2:
+                found = True
+                break
+        if not found:
+            result.append(item1)
+    return result
+
+
+def build_arp_table(entries, seed=42):
+    """Build NX-OS 'show ip arp vrf all' shaped data with the given entry count"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(entries):
+        rows.append({
+            'intf-out': f"Vlan{100 + (i % 400)}",
+            'ip-addr-out': f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}",
+            'mac': f"00{rng.randrange(16 ** 10):010x}",
+            'flags': rng.choice(['', '#', '*']),
+            'phy-intf': f"Ethernet1/{1 + (i % 48)}",
+        })
+    return {'TABLE_vrf': {'ROW_vrf': [{'vrf-name-out': 'default',
+                                       'TABLE_adj': {'ROW_adj': rows}}]}}
+
+
+def mutate_arp_table(table, change_ratio, seed=7):
+    """Return a copy of table with change_ratio of rows removed and replaced"""
+    rng = random.Random(seed)
+    rows = list(table['TABLE_vrf']['ROW_vrf'][0]['TABLE_adj']['ROW_adj'])
+    changes = max(1, int(len(rows) * change_ratio))
+    for index in rng.sample(range(len(rows)), changes):
+        row = dict(rows[index])
+        row['mac'] = f"02{rng.randrange(16 ** 10):010x}"
+        rows[index] = row
+    rng.shuffle(rows)
+    return {'TABLE_vrf': {'ROW_vrf': [{'vrf-name-out': 'default',
+                                       'TABLE_adj': {'ROW_adj': rows}}]}}
+
+
+def time_call(func, *args):
+    """Run func once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(sizes, change_ratio, legacy_max_entries):
+    """Benchmark difference_recursive for each size and print a summary table"""
+    print(f"{'entries':>10} {'added':>8} {'removed':>8} {'indexed_s':>10} "
+          f"{'legacy_s':>10} {'speedup':>8}")
+    results = []
+    for size in sizes:
+        pre = build_arp_table(size)
+        post = mutate_arp_table(pre, change_ratio)
+        pre_rows = pre['TABLE_vrf']['ROW_vrf'][0]['TABLE_adj']['ROW_adj']
+        post_rows = post['TABLE_vrf']['ROW_vrf'][0]['TABLE_adj']['ROW_adj']
+
+        added_rows, added_time = time_call(difference_recursive, post_rows, pre_rows)
+        removed_rows, removed_time = time_call(difference_recursive, pre_rows, post_rows)
+        indexed_time = added_time + removed_time
+
+        legacy_time = None
+        if size <= legacy_max_entries:
+            legacy_added, t1 = time_call(legacy_list_difference, post_rows, pre_rows)
+            legacy_removed, t2 = time_call(legacy_list_difference, pre_rows, post_rows)
+            legacy_time = t1 + t2
+            if legacy_added != added_rows or legacy_removed != removed_rows:
+                raise AssertionError(f"Indexed diff disagrees with legacy diff at {size} entries")
+
+        speedup = f"{legacy_time / indexed_time:.1f}x" if legacy_time else "-"
+        legacy_display = f"{legacy_time:.3f}" if legacy_time else "skipped"
+        print(f"{size:>10} {len(added_rows):>8} {len(removed_rows):>8} {indexed_time:>10.3f} "
+              f"{legacy_display:>10} {speedup:>8}")
+
+        results.append({
+            'entries': size,
+            'added': len(added_rows),
+            'removed': len(removed_rows),
+            'indexed_seconds': indexed_time,
+            'legacy_seconds': legacy_time,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark difference_recursive on large baselines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Entry counts to benchmark (default: 10000 100000 500000)')
+    parser.add_argument('--change-ratio', type=float, default=0.01,
+                        help='Fraction of entries changed between pre and post (default: 0.01)')
+    parser.add_argument('--legacy-max-entries', type=int, default=10000,
+                        help='Largest size to also time with the nested-loop diff (default: 10000)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.change_ratio, args.legacy_max_entries)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
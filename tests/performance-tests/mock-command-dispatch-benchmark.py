@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Command dispatch benchmark for the mock device behaviors
+Measures commands per second per platform through the compiled
+CommandDispatcher, against the previous linear scan of the command map
+(exact lookup, then a substring/startswith test per pattern in map order),
+and checks that commands reach the handler the precedence rules select
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock-devices'))
+
+from mock_device_engine import MockDeviceManager, StateStore  # noqa: E402
+
+
+DEFAULT_ITERATIONS = 200000
+# Commands the upgrade roles and the mock SSH server send, per platform
+WORKLOADS = {
+    'cisco_nxos': [
+        'show version', 'show version | include NXOS', 'show version epld', 'show module',
+        'dir bootflash:', 'dir bootflash:nxos64-cs.10.4.3.F.bin', 'show file bootflash:nxos64-cs.10.4.3.F.bin md5sum',
+        'show install all impact nxos bootflash:nxos64-cs.10.4.3.F.bin', 'show install all status',
+        'show system resources', 'show running-config', 'show inventory', 'show interface brief',
+    ],
+    'cisco_iosxe': [
+        'show version', 'show version | include Version', 'show install summary', 'show running-config',
+        'request platform software package install switch all file bootflash:packages.conf', 'show boot',
+    ],
+    'fortios': [
+        'get system status', 'get system ha status', 'get system performance status', 'show version',
+        'diagnose sys top 1 10', 'execute backup config tftp fgt.conf 10.0.0.1', 'get system interface physical',
+        'get router info routing-table all',
+    ],
+    'opengear': [
+        'config -g config.system.version', 'config -g config.system.model', 'show version',
+        'upgrade /tmp/opengear.flash', 'show running-config', 'uptime',
+    ],
+}
+# Handler selected by the precedence rules (exact, most literal characters, declaration order)
+EXPECTED_HANDLERS = {
+    'cisco_nxos': {
+        'show version | include NXOS': '_show_version',
+        'show version epld': '_show_epld_version',
+        'show file bootflash:nxos64-cs.10.4.3.F.bin md5sum': '_show_file_md5',
+        'show interface brief': None,
+    },
+    'fortios': {'diagnose sys top 1 10': '_diagnose_sys_top', 'get router info routing-table all': None},
+    'opengear': {'upgrade /tmp/opengear.flash': '_upgrade_firmware'},
+}
+
+
+def legacy_resolve(command_map, command):
+    """The previous DeviceBehavior.handle_command lookup"""
+    if command in command_map:
+        return command_map[command]
+    for pattern, handler in command_map.items():
+        if pattern in command or command.startswith(pattern.rstrip('*')):
+            return handler
+    return None
+
+
+def time_dispatch(resolve, commands, iterations):
+    """Commands resolved per second"""
+    rounds = max(1, iterations // len(commands))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for command in commands:
+            resolve(command)
+    return rounds * len(commands) / (time.perf_counter() - start)
+
+
+def check_handlers(platform, behavior):
+    """Validate the handler each expected command resolves to"""
+    for command, expected in EXPECTED_HANDLERS.get(platform, {}).items():
+        handler, _ = behavior.dispatcher.resolve(command)
+        name = handler.__name__ if handler else None
+        if name != expected:
+            raise AssertionError(f"{platform}: {command!r} resolved to {name}, expected {expected}")
+
+
+def run_benchmark(platforms, iterations):
+    """Benchmark command dispatch for each platform and print a summary table"""
+    print(f"{'platform':>12} {'patterns':>9} {'compiled_cps':>13} {'linear_cps':>11} {'speedup':>8} "
+          f"{'handled_cps':>12}")
+    results = []
+    # State databases outside the source tree
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            manager = MockDeviceManager()
+            for platform in platforms:
+                behavior = manager.devices[manager.create_device(platform, f"dispatch-{platform}")].behavior
+                check_handlers(platform, behavior)
+                commands = WORKLOADS[platform]
+                command_map = behavior.command_map
+
+                compiled = time_dispatch(behavior.dispatcher.resolve, commands, iterations)
+                linear = time_dispatch(lambda command: legacy_resolve(command_map, command), commands, iterations)
+                # Full handle_command, including building each response
+                handled = time_dispatch(behavior.handle_command, commands, iterations // 10)
+                print(f"{platform:>12} {len(command_map):>9} {compiled:>13.0f} {linear:>11.0f} "
+                      f"{compiled / linear:>7.1f}x {handled:>12.0f}")
+                results.append({
+                    'platform': platform,
+                    'compiled_cps': compiled,
+                    'linear_cps': linear,
+                    'handled_cps': handled,
+                })
+            StateStore.close_all()
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mock device command dispatch')
+    parser.add_argument('--platforms', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS),
+                        help='Platforms to benchmark (default: all)')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                        help=f'Commands resolved per platform and dispatcher (default: {DEFAULT_ITERATIONS})')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.platforms, args.iterations)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Fleet-scale benchmark for the asyncio mock device engine
+Sends commands (with the simulated 50-200 ms latency) to every device of a
+10k-device AsyncMockDeviceManager at once, against the threaded engine with a
+client thread per device, then runs concurrent upgrades on a scaled clock
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock-devices'))
+
+from mock_clock import ScaledClock  # noqa: E402
+from mock_device_engine import MockDeviceManager, StateStore  # noqa: E402
+from async_mock_device_engine import AsyncMockDeviceManager  # noqa: E402
+
+
+DEFAULT_DEVICES = [1000, 10000]
+PLATFORMS = ['cisco_nxos', 'cisco_iosxe', 'fortios', 'opengear']
+COMMANDS = ['show version', 'show running-config']
+
+
+def create_devices(manager, count):
+    for i in range(count):
+        manager.create_device(PLATFORMS[i % len(PLATFORMS)], f"fleet-{i:05d}")
+
+
+def time_async_commands(count):
+    """Seconds for every device of an asyncio fleet to answer COMMANDS"""
+    async def run():
+        manager = AsyncMockDeviceManager()
+        create_devices(manager, count)
+        start = time.perf_counter()
+        responses = await manager.run_commands(COMMANDS)
+        elapsed = time.perf_counter() - start
+        answered = sum(1 for device in responses.values() for response in device if response.get('output'))
+        if answered != count * len(COMMANDS):
+            raise AssertionError(f"{answered} of {count * len(COMMANDS)} async commands answered")
+        return elapsed
+    return asyncio.run(run())
+
+
+def time_threaded_commands(count):
+    """Seconds for every device of a threaded fleet to answer COMMANDS, one client thread per device"""
+    manager = MockDeviceManager()
+    create_devices(manager, count)
+
+    def client(device):
+        for command in COMMANDS:
+            device.process_command(command)
+
+    workers = [threading.Thread(target=client, args=(device,)) for device in manager.devices.values()]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def time_async_upgrades(count, speed, failure_probability):
+    """Wall-clock seconds and outcomes of concurrent upgrades on a clock running speed times faster"""
+    async def run():
+        manager = AsyncMockDeviceManager(clock=ScaledClock(speed))
+        create_devices(manager, count)
+        for device in manager.devices.values():
+            device.config.failure_probability = failure_probability
+        start = time.perf_counter()
+        outcomes = await manager.upgrade_all('2.0.0')
+        return time.perf_counter() - start, Counter(outcomes.values())
+    return asyncio.run(run())
+
+
+def run_benchmark(sizes, thread_max_devices, upgrade_devices, speed, seed):
+    """Benchmark the fleets for each device count and print summary tables"""
+    random.seed(seed)
+    print(f"{'devices':>8} {'commands':>9} {'async_s':>8} {'async_cps':>10} {'thread_s':>9} {'thread_cps':>11}")
+    results = []
+    # State databases outside the source tree
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                commands = size * len(COMMANDS)
+                async_time = time_async_commands(size)
+                thread_time = time_threaded_commands(size) if size <= thread_max_devices else None
+                thread_display = f"{thread_time:>9.2f} {commands / thread_time:>11.0f}" if thread_time else \
+                    f"{'skipped':>9} {'-':>11}"
+                print(f"{size:>8} {commands:>9} {async_time:>8.2f} {commands / async_time:>10.0f} {thread_display}")
+                results.append({
+                    'devices': size,
+                    'async_seconds': async_time,
+                    'thread_seconds': thread_time,
+                })
+
+            if upgrade_devices:
+                upgrade_time, outcomes = time_async_upgrades(upgrade_devices, speed, 0.0002)
+                if set(outcomes) - {'complete', 'failed'}:
+                    raise AssertionError(f"Unfinished async upgrades: {dict(outcomes)}")
+                print(f"\n{upgrade_devices} concurrent upgrades at {speed:g}x: {upgrade_time:.2f}s "
+                      f"({outcomes['complete']} complete, {outcomes['failed']} failed)")
+            StateStore.close_all()
+        finally:
+            os.chdir(cwd)
+
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the asyncio mock device fleet')
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES,
+                        help='Device counts to benchmark (default: 1000 10000)')
+    parser.add_argument('--thread-max-devices', type=int, default=1000,
+                        help='Largest device count to also time with a thread per device (default: 1000)')
+    parser.add_argument('--upgrade-devices', type=int, default=1000,
+                        help='Devices upgraded concurrently on the scaled clock, 0 to skip (default: 1000)')
+    parser.add_argument('--speed', type=float, default=100,
+                        help='Clock speed for the upgrades (default: 100)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.devices, args.thread_max_devices, args.upgrade_devices, args.speed, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+SSH fleet benchmark for the mock SSH device server
+Starts mock_ssh_server.py with one port per device, then connects to every
+device at once (as Ansible does with one fork per device), runs commands over
+exec channels and uploads an image to each virtual bootflash over SFTP.
+Requires asyncssh; set MOCK_SSH_REQUIRED=false to skip instead of failing without it
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock-devices', 'mock_ssh_server.py')
+DEFAULT_DEVICES = [100, 500]
+DEFAULT_BASE_PORT = 31000
+COMMANDS = {
+    'cisco_nxos': ['show version', 'show module', 'dir bootflash:'],
+    'cisco_iosxe': ['show version', 'show install summary'],
+    'fortios': ['get system status', 'get system ha status'],
+    'opengear': ['config -g config.system.version', 'config -g config.system.model'],
+}
+PLATFORMS = list(COMMANDS)
+
+
+def start_server(count, base_port, bootflash_dir):
+    """Start the server and wait until it listens"""
+    server = subprocess.Popen(
+        [sys.executable, SERVER, '--devices', str(count), '--base-port', str(base_port),
+         '--bootflash-dir', bootflash_dir], stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()
+    if not line.startswith('Mock SSH server'):
+        server.kill()
+        raise AssertionError(f"Mock SSH server did not start: {line!r}")
+    return server
+
+
+async def device_session(port, platform, image, timings):
+    """Connect, run the platform commands and upload the image; record seconds per step"""
+    start = time.perf_counter()
+    async with asyncssh.connect('127.0.0.1', port, username='admin', password='admin',
+                                known_hosts=None) as conn:
+        connected = time.perf_counter()
+        for command in COMMANDS[platform]:
+            result = await conn.run(command)
+            if result.exit_status != 0:
+                raise AssertionError(f"{command!r} failed on port {port}: {result.stdout!r}")
+        commanded = time.perf_counter()
+        async with conn.start_sftp_client() as sftp:
+            await sftp.put(image, f"bootflash:{os.path.basename(image)}")
+        uploaded = time.perf_counter()
+    timings.append((connected - start, commanded - connected, uploaded - commanded))
+
+
+async def run_fleet(count, base_port, image):
+    """Run every device session at once; returns (wall-clock seconds, per-session timings)"""
+    timings = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        device_session(base_port + i, PLATFORMS[i % len(PLATFORMS)], image, timings) for i in range(count)))
+    return time.perf_counter() - start, timings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_benchmark(sizes, base_port, image_kb):
+    """Benchmark the SSH fleet for each device count and print a summary table"""
+    print(f"{'devices':>8} {'wall_s':>7} {'connect_p95':>12} {'commands':>9} {'cmd/s':>7} "
+          f"{'upload_MB':>10} {'MB/s':>6}")
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            image = os.path.join(workdir, 'nxos64-cs.10.4.3.F.bin')
+            with open(image, 'wb') as handle:
+                handle.write(os.urandom(image_kb * 1024))
+            bootflash_dir = os.path.join(workdir, 'bootflash')
+            # State databases of the server outside the source tree
+            server = None
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                server = start_server(size, base_port, bootflash_dir)
+                wall_seconds, timings = asyncio.run(run_fleet(size, base_port, image))
+                uploads = sum(len(os.listdir(os.path.join(bootflash_dir, name))) for name in os.listdir(bootflash_dir))
+            finally:
+                os.chdir(cwd)
+                if server is not None:
+                    server.terminate()
+                    server.wait()
+
+        if len(timings) != size or uploads != size:
+            raise AssertionError(f"{len(timings)} sessions and {uploads} uploads for {size} devices")
+        commands = sum(len(COMMANDS[PLATFORMS[i % len(PLATFORMS)]]) for i in range(size))
+        upload_mb = size * image_kb / 1024
+        print(f"{size:>8} {wall_seconds:>7.2f} {percentile([t[0] for t in timings], 0.95):>12.3f} {commands:>9} "
+              f"{commands / wall_seconds:>7.0f} {upload_mb:>10.1f} {upload_mb / wall_seconds:>6.1f}")
+        results.append({
+            'devices': size,
+            'wall_seconds': wall_seconds,
+            'commands': commands,
+        })
+
+    print(f"Client peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent SSH sessions against the mock SSH server')
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES,
+                        help='Device counts to benchmark (default: 100 500)')
+    parser.add_argument('--base-port', type=int, default=DEFAULT_BASE_PORT,
+                        help=f'First device port (default: {DEFAULT_BASE_PORT})')
+    parser.add_argument('--image-kb', type=int, default=256,
+                        help='Size of the image uploaded to each device in KB (default: 256)')
+
+    args = parser.parse_args()
+
+    if asyncssh is None:
+        if os.environ.get('MOCK_SSH_REQUIRED', 'true').lower() in ('false', 'no', '0'):
+            print("asyncssh is not installed; mock SSH fleet benchmark skipped (MOCK_SSH_REQUIRED=false)")
+            return 0
+        print("asyncssh is not installed (pip install asyncssh); set MOCK_SSH_REQUIRED=false to skip",
+              file=sys.stderr)
+        return 1
+
+    run_benchmark(args.devices, args.base_port, args.image_kb)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+State persistence benchmark for the mock device engine
+Times commands across many MockDeviceEngine devices with the shared WAL state
+store against a database file per device (connect, insert, commit per command)
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock-devices'))
+
+from mock_device_engine import MockDeviceConfig, MockDeviceEngine, StateStore  # noqa: E402
+
+
+DEFAULT_DEVICES = [100, 1000]
+COMMANDS_PER_DEVICE = 5
+CLIENT_THREADS = 16
+
+
+def build_devices(count, state_mode):
+    """Mock NX-OS devices without simulated command latency"""
+    return [MockDeviceEngine(MockDeviceConfig(
+        device_id=f"bench-{state_mode}-{i:05d}",
+        platform_type='cisco_nxos',
+        model='N9K-C93180YC-EX',
+        firmware_version='9.3.10',
+        target_version='10.1.2',
+        response_delay_ms=(0, 0),
+        state_mode=state_mode,
+    )) for i in range(count)]
+
+
+def run_commands(devices, commands_per_device, threads):
+    """Send commands to every device from a pool of client threads, as concurrent forks would"""
+    def client(offset):
+        for device in devices[offset::threads]:
+            for _ in range(commands_per_device):
+                device.process_command('show version')
+
+    workers = [threading.Thread(target=client, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def count_rows(devices):
+    """Rows persisted for the devices"""
+    if devices[0].state_store is not None:
+        devices[0].state_store.flush()
+        conn = sqlite3.connect(devices[0].db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM device_state WHERE device_id LIKE 'bench-%'").fetchone()[0]
+        finally:
+            conn.close()
+    total = 0
+    for device in devices:
+        conn = sqlite3.connect(device.db_path)
+        try:
+            total += conn.execute("SELECT COUNT(*) FROM device_state").fetchone()[0]
+        finally:
+            conn.close()
+    return total
+
+
+def time_mode(count, state_mode, commands_per_device, threads):
+    """Seconds to run and persist the commands (including the final flush of the shared store)"""
+    devices = build_devices(count, state_mode)
+    start = time.perf_counter()
+    run_commands(devices, commands_per_device, threads)
+    if devices[0].state_store is not None:
+        devices[0].state_store.flush()
+    elapsed = time.perf_counter() - start
+
+    expected = count * commands_per_device
+    rows = count_rows(devices)
+    if rows != expected:
+        raise AssertionError(f"{state_mode} store persisted {rows} of {expected} state rows")
+    return elapsed
+
+
+def run_benchmark(sizes, commands_per_device, threads, per_device_max):
+    """Benchmark both state modes for each device count and print a summary table"""
+    print(f"{'devices':>8} {'commands':>9} {'shared_s':>9} {'per_dev_s':>10} {'speedup':>8}")
+    results = []
+    for size in sizes:
+        # Fresh databases for every size, outside the source tree
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                shared_time = time_mode(size, 'shared', commands_per_device, threads)
+                StateStore.close_all()
+                per_device_time = None
+                if size <= per_device_max:
+                    per_device_time = time_mode(size, 'per_device', commands_per_device, threads)
+            finally:
+                os.chdir(cwd)
+
+        speedup = f"{per_device_time / shared_time:.1f}x" if per_device_time else "-"
+        per_device_display = f"{per_device_time:.3f}" if per_device_time else "skipped"
+        print(f"{size:>8} {size * commands_per_device:>9} {shared_time:>9.3f} {per_device_display:>10} {speedup:>8}")
+
+        results.append({
+            'devices': size,
+            'shared_seconds': shared_time,
+            'per_device_seconds': per_device_time,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mock device state persistence')
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES,
+                        help='Device counts to benchmark (default: 100 1000)')
+    parser.add_argument('--commands', type=int, default=COMMANDS_PER_DEVICE,
+                        help=f'Commands per device (default: {COMMANDS_PER_DEVICE})')
+    parser.add_argument('--threads', type=int, default=CLIENT_THREADS,
+                        help=f'Concurrent client threads (default: {CLIENT_THREADS})')
+    parser.add_argument('--per-device-max', type=int, default=1000,
+                        help='Largest device count to also time with a database per device (default: 1000)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.devices, args.commands, args.threads, args.per_device_max)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
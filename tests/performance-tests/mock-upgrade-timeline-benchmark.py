@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Upgrade timeline benchmark for the mock device engine on the virtual clock
+Runs full MockDeviceEngine upgrade simulations (about 325 s each in real time)
+for many devices at once in discrete-event time, and checks that the timelines
+end when they would in real time and fail at the configured rate
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock-devices'))
+
+from mock_clock import VirtualClock  # noqa: E402
+from mock_device_engine import MockDeviceManager, StateStore  # noqa: E402
+
+
+DEFAULT_DEVICES = [100, 1000]
+PLATFORMS = ['cisco_nxos', 'cisco_iosxe', 'fortios', 'opengear']
+# Ticks of MockDeviceEngine._simulate_upgrade_process (one virtual second each)
+UPGRADE_TICKS = 325
+# FortiOS HA synchronization delay during installation
+FORTIOS_HA_DELAY = 10
+FAILURE_PROBABILITY = 0.0002
+
+
+def run_timelines(count, failure_probability, seed):
+    """
+    Start an upgrade on every device at virtual time 0 and wait for all of them
+
+    Returns:
+        (manager, virtual seconds until the last timeline ended, wall-clock seconds)
+    """
+    random.seed(seed)
+    clock = VirtualClock(start=0)
+    manager = MockDeviceManager(clock=clock)
+    with clock.paused():
+        for i in range(count):
+            platform = PLATFORMS[i % len(PLATFORMS)]
+            device = manager.devices[manager.create_device(platform, f"timeline-{i:05d}")]
+            device.config.failure_probability = failure_probability
+            if platform == 'fortios':
+                device.config.custom_behaviors['ha_enabled'] = True
+        start = time.perf_counter()
+        for device in manager.devices.values():
+            device.start_upgrade('2.0.0')
+    if not clock.wait_idle(timeout=600):
+        raise AssertionError(f"Upgrade timelines for {count} devices did not finish")
+    return manager, clock.time(), time.perf_counter() - start
+
+
+def check_timelines(manager, virtual_seconds, failure_probability):
+    """Validate phase outcomes, timeline length and failure rate"""
+    phases = Counter(device.upgrade_phase.value for device in manager.devices.values())
+    if set(phases) - {'complete', 'failed'}:
+        raise AssertionError(f"Unfinished upgrade timelines: {dict(phases)}")
+    if virtual_seconds != UPGRADE_TICKS + FORTIOS_HA_DELAY:
+        raise AssertionError(f"Last timeline ended at {virtual_seconds}s, expected {UPGRADE_TICKS + FORTIOS_HA_DELAY}s")
+    expected = len(manager.devices) * (1 - (1 - failure_probability) ** UPGRADE_TICKS)
+    # Five standard deviations of the binomial failure count
+    tolerance = 5 * (expected * (1 - expected / len(manager.devices))) ** 0.5 + 1
+    if abs(phases['failed'] - expected) > tolerance:
+        raise AssertionError(f"{phases['failed']} failed upgrades, expected {expected:.1f} +/- {tolerance:.1f}")
+    return phases
+
+
+def run_benchmark(sizes, failure_probability, seed):
+    """Benchmark upgrade timelines for each device count and print a summary table"""
+    print(f"{'devices':>8} {'virtual_s':>10} {'wall_s':>8} {'complete':>9} {'failed':>7} {'speedup':>8}")
+    results = []
+    for size in sizes:
+        # State databases outside the source tree
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                manager, virtual_seconds, wall_seconds = run_timelines(size, failure_probability, seed)
+                StateStore.close_all()
+            finally:
+                os.chdir(cwd)
+
+        phases = check_timelines(manager, virtual_seconds, failure_probability)
+        # Real time runs the timelines concurrently, so one timeline's length is the baseline
+        speedup = f"{virtual_seconds / wall_seconds:.0f}x"
+        print(f"{size:>8} {virtual_seconds:>10.0f} {wall_seconds:>8.2f} {phases['complete']:>9} "
+              f"{phases['failed']:>7} {speedup:>8}")
+
+        results.append({
+            'devices': size,
+            'virtual_seconds': virtual_seconds,
+            'wall_seconds': wall_seconds,
+            'completed': phases['complete'],
+            'failed': phases['failed'],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mock upgrade timelines on the virtual clock')
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES,
+                        help='Device counts to benchmark (default: 100 1000)')
+    parser.add_argument('--failure-probability', type=float, default=FAILURE_PROBABILITY,
+                        help=f'Failure probability per upgrade tick (default: {FAILURE_PROBABILITY})')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.devices, args.failure_probability, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Inventory-load benchmark for the compiled NetBox inventory rules
+Times build_inventory() (deployment/services/netbox/netbox_inventory_rules.py)
+against rendering the compose and keyed_groups templates of
+ansible-content/inventory/netbox_dynamic.yml per device, as nb_inventory does
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import yaml
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(BASE_DIR, 'deployment', 'services', 'netbox'))
+sys.path.insert(1, os.path.join(BASE_DIR, 'tests', 'mock-devices'))
+
+from netbox_inventory_rules import build_inventory, compile_rules, resolve_devices  # noqa: E402
+from mock_netbox_api import generate  # noqa: E402
+
+try:
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.template import Templar
+except ImportError:
+    Templar = None
+
+
+DEFAULT_DEVICES = [200, 10000]
+NETBOX_INVENTORY_CONFIG = os.path.join(BASE_DIR, 'ansible-content', 'inventory', 'netbox_dynamic.yml')
+
+
+def build_objects(device_count):
+    """Mock NetBox objects keyed like the inventory cache (endpoint -> ID string -> object)"""
+    objects = generate(device_count, max(1, device_count // 100))
+    return {name: {str(key): obj for key, obj in items.items()} for name, items in objects.items()}
+
+
+def render_templates(templar, config, devices):
+    """
+    Evaluate netbox_dynamic.yml compose and keyed_groups per device with Ansible's
+    templar, as Constructable does (strict: false skips expressions that fail)
+
+    Returns:
+        Number of host variables and group memberships produced
+    """
+    produced = 0
+    expressions = [str(expr).strip() for expr in config.get('compose', {}).values()]
+    keys = [(group['prefix'], group['key'].strip()) for group in config.get('keyed_groups', [])]
+    for device in devices:
+        templar.available_variables = device
+        for expr in expressions:
+            try:
+                templar.template('{{ %s }}' % expr, disable_lookups=True)
+                produced += 1
+            except Exception:
+                continue
+        for prefix, expr in keys:
+            try:
+                key = templar.template('{{ %s }}' % expr, disable_lookups=True)
+            except Exception:
+                continue
+            if key:
+                produced += 1
+    return produced
+
+
+def time_call(func, *args):
+    """Run func once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(sizes, jinja_max_devices):
+    """Benchmark inventory building for each device count and print a summary table"""
+    with open(NETBOX_INVENTORY_CONFIG, 'r', encoding='utf-8') as handle:
+        config = yaml.safe_load(handle)
+    templar = Templar(loader=DataLoader()) if Templar else None
+
+    print(f"{'devices':>8} {'hosts':>7} {'compile_s':>10} {'build_s':>9} {'jinja_s':>9} {'speedup':>8}")
+    results = []
+    for size in sizes:
+        objects = build_objects(size)
+        rules, compile_time = time_call(compile_rules)
+        inventory, build_time = time_call(build_inventory, objects, rules)
+
+        jinja_time = None
+        if templar and size <= jinja_max_devices:
+            _, jinja_time = time_call(render_templates, templar, config, resolve_devices(objects))
+
+        speedup = f"{jinja_time / build_time:.0f}x" if jinja_time else "-"
+        jinja_display = f"{jinja_time:.3f}" if jinja_time else "skipped"
+        hosts = len(inventory['_meta']['hostvars'])
+        print(f"{size:>8} {hosts:>7} {compile_time:>10.4f} {build_time:>9.3f} {jinja_display:>9} {speedup:>8}")
+
+        results.append({
+            'devices': size,
+            'hosts': hosts,
+            'compile_seconds': compile_time,
+            'build_seconds': build_time,
+            'jinja_seconds': jinja_time,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark NetBox inventory building with the compiled rules')
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES,
+                        help='Device counts to benchmark (default: 200 10000)')
+    parser.add_argument('--jinja-max-devices', type=int, default=200,
+                        help='Largest device count to also time with per-device templates (default: 200)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.devices, args.jinja_max_devices)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the remove_excluded_fields_recursive filter plugin
+Measures plain-name and path-qualified exclusion on NX-OS 'show ip route vrf all' JSON
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'ansible-content', 'filter_plugins'))
+
+from platform_filters import remove_excluded_fields_recursive  # noqa: E402
+
+
+DEFAULT_PREFIXES = [10000, 100000, 250000]
+RIB_EXCLUDED_FIELDS = ['uptime', 'time']
+RIB_EXCLUDED_PATHS = ['TABLE_vrf.ROW_vrf.*.TABLE_addrf.ROW_addrf.*.TABLE_prefix.ROW_prefix.*.'
+                      'TABLE_path.ROW_path.*.uptime', '**.time']
+
+
+def legacy_remove_excluded_fields(data, excluded_fields):
+    """Recursive, list-membership based implementation used before the compiled spec"""
+    if not isinstance(excluded_fields, (list, tuple)):
+        excluded_fields = [excluded_fields]
+
+    def _remove_recursive(obj):
+        if isinstance(obj, dict):
+            return {k: _remove_recursive(v) for k, v in obj.items() if k not in excluded_fields}
+        elif isinstance(obj, list):
+            return [_remove_recursive(item) for item in obj]
+        return obj
+
+    return _remove_recursive(data)
+
+
+def build_route_table(prefixes, vrfs=16, paths_per_prefix=2, seed=42):
+    """Build NX-OS 'show ip route vrf all | json' shaped data with the given prefix count"""
+    rng = random.Random(seed)
+    vrf_rows = []
+    per_vrf = max(1, prefixes // vrfs)
+    for vrf_index in range(vrfs):
+        prefix_rows = []
+        for i in range(per_vrf):
+            route_id = vrf_index * per_vrf + i
+            path_rows = []
+            for path_index in range(paths_per_prefix):
+                path_rows.append({
+                    'ipnexthop': f"192.0.{path_index}.{1 + (route_id % 250)}",
+                    'ifname': f"Ethernet1/{1 + (route_id + path_index) % 48}",
+                    'uptime': f"P{rng.randrange(400)}DT{rng.randrange(24)}H{rng.randrange(60)}M",
+                    'pref': '20',
+                    'metric': str(rng.randrange(1000)),
+                    'clientname': 'bgp-65000',
+                    'type': 'external',
+                    'tag': '65001',
+                    'ubest': 'true',
+                })
+            prefix_rows.append({
+                'ipprefix': f"10.{(route_id >> 16) & 0xff}.{(route_id >> 8) & 0xff}.{route_id & 0xff}/32",
+                'ucast-nhops': str(paths_per_prefix),
+                'mcast-nhops': '0',
+                'attached': 'false',
+                'TABLE_path': {'ROW_path': path_rows},
+            })
+        vrf_rows.append({
+            'vrf-name-out': 'default' if vrf_index == 0 else f"VRF_{vrf_index}",
+            'TABLE_addrf': {'ROW_addrf': [{
+                'addrf': 'ipv4',
+                'time': '2025-01-01T00:00:00',
+                'TABLE_prefix': {'ROW_prefix': prefix_rows},
+            }]},
+        })
+    return {'TABLE_vrf': {'ROW_vrf': vrf_rows}}
+
+
+def time_call(func, *args):
+    """Run func once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(sizes, legacy_max_prefixes):
+    """Benchmark remove_excluded_fields_recursive for each size and print a summary table"""
+    print(f"{'prefixes':>10} {'names_s':>9} {'paths_s':>9} {'legacy_s':>9} {'speedup':>8}")
+    results = []
+    for size in sizes:
+        table = build_route_table(size)
+
+        by_name, name_time = time_call(remove_excluded_fields_recursive, table, RIB_EXCLUDED_FIELDS)
+        by_path, path_time = time_call(remove_excluded_fields_recursive, table, RIB_EXCLUDED_PATHS)
+        if by_name != by_path:
+            raise AssertionError(f"Path-qualified exclusion disagrees with plain names at {size} prefixes")
+
+        legacy_time = None
+        if size <= legacy_max_prefixes:
+            legacy, legacy_time = time_call(legacy_remove_excluded_fields, table, RIB_EXCLUDED_FIELDS)
+            if legacy != by_name:
+                raise AssertionError(f"Compiled exclusion disagrees with legacy at {size} prefixes")
+
+        speedup = f"{legacy_time / name_time:.1f}x" if legacy_time else "-"
+        legacy_display = f"{legacy_time:.3f}" if legacy_time else "skipped"
+        print(f"{size:>10} {name_time:>9.3f} {path_time:>9.3f} {legacy_display:>9} {speedup:>8}")
+
+        results.append({
+            'prefixes': size,
+            'names_seconds': name_time,
+            'paths_seconds': path_time,
+            'legacy_seconds': legacy_time,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark remove_excluded_fields_recursive on NX-OS route tables')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_PREFIXES,
+                        help='Prefix counts to benchmark (default: 10000 100000 250000)')
+    parser.add_argument('--legacy-max-prefixes', type=int, default=100000,
+                        help='Largest size to also time with the recursive implementation (default: 100000)')
+
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.legacy_max_prefixes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
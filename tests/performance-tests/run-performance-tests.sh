@@ -103,6 +103,38 @@ main() {
     run_performance_test "Collection requirements processing" 10 \
         python3 -c "import yaml; import json; data=yaml.safe_load(open('ansible-content/collections/requirements.yml')); print('Loaded', len(data.get('collections', [])), 'collections')"
 
+    # Test 8: Baseline diff filter on large ARP/MAC tables
+    run_performance_test "difference_recursive 100k-entry baseline diff" 30 \
+        python3 tests/performance-tests/difference-recursive-benchmark.py --sizes 10000 100000
+
+    # Test 9: Excluded-field normalization on large route tables
+    run_performance_test "remove_excluded_fields_recursive 100k-prefix route table" 30 \
+        python3 tests/performance-tests/remove-excluded-fields-benchmark.py --sizes 10000 100000
+
+    # Test 10: NetBox inventory build with the compiled compose/keyed_groups rules
+    run_performance_test "NetBox inventory build for 10k devices" 60 \
+        python3 tests/performance-tests/netbox-inventory-benchmark.py --devices 200 10000
+
+    # Test 11: Mock device state persistence (shared WAL store vs a database per device)
+    run_performance_test "Mock device state store for 1,000 devices" 60 \
+        python3 tests/performance-tests/mock-state-store-benchmark.py --devices 100 1000
+
+    # Test 12: Mock upgrade timelines in discrete-event time (virtual clock)
+    run_performance_test "Mock upgrade timelines for 1,000 devices" 60 \
+        python3 tests/performance-tests/mock-upgrade-timeline-benchmark.py --devices 100 1000
+
+    # Test 13: 10k-device asyncio mock fleet (commands and concurrent upgrades)
+    run_performance_test "Asyncio mock fleet of 10,000 devices" 60 \
+        python3 tests/performance-tests/mock-fleet-async-benchmark.py --devices 1000 10000
+
+    # Test 14: 500 concurrent SSH sessions against the mock SSH server (requires asyncssh, MOCK_SSH_REQUIRED=false skips)
+    run_performance_test "Mock SSH server with 500 concurrent sessions" 60 \
+        python3 tests/performance-tests/mock-ssh-fleet-benchmark.py --devices 100 500
+
+    # Test 15: Mock device command dispatch per platform (compiled dispatcher vs linear scan)
+    run_performance_test "Mock device command dispatch" 30 \
+        python3 tests/performance-tests/mock-command-dispatch-benchmark.py
+
     # Summary
     echo ""
     echo -e "${BLUE}=== PERFORMANCE TEST SUMMARY ===${NC}"
@@ -235,7 +235,22 @@ main() {
 
         # Unit Tests (1)
         "Metrics_Export_Validation:../tests/unit-tests/metrics-export-validation.yml"
+        "Metrics_Exporter:../tests/unit-tests/metrics-exporter.yml"
+        "Result_Watcher:../tests/unit-tests/result-watcher.yml"
         "Workflow_Logic:../tests/unit-tests/workflow-logic.yml"
+        "Filter_Plugins:../tests/unit-tests/filter-plugins-validation.yml"
+        "Firmware_Hash_Cache:../tests/unit-tests/firmware-hash-cache.yml"
+        "Reboot_Detection:../tests/unit-tests/reboot-detection.yml"
+        "Rolling_Window_Strategy:../tests/unit-tests/rolling-window-strategy.yml"
+        "Upgrade_Wave_Planner:../tests/unit-tests/upgrade-wave-planner.yml"
+        "Transfer_Scheduler:../tests/unit-tests/transfer-scheduler.yml"
+        "Chunked_Transfer:../tests/unit-tests/chunked-transfer.yml"
+        "Verified_Image_Record:../tests/unit-tests/verified-image-record.yml"
+        "Site_Image_Staging:../tests/unit-tests/site-image-staging.yml"
+        "SQLite_Fact_Cache:../tests/unit-tests/sqlite-fact-cache.yml"
+        "NetBox_Dynamic_Inventory:../tests/unit-tests/netbox-dynamic-inventory.yml"
+        "NetBox_Bulk_Update:../tests/unit-tests/netbox-bulk-update.yml"
+        "Mock_SSH_Server:../tests/unit-tests/mock-ssh-server.yml"
 
         # Playbook Tests (4)
         "Playbook_Compliance_Audit:../tests/playbook-tests/compliance-audit/test-compliance-audit.yml"